@@ -4,6 +4,7 @@
 """GUI routines."""
 
 from .pynaception import scope
+from .datasource import DataSource, ArraySource, BinarySource, HDF5Source
 
 # from .qt import create_app
 
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+"""Headless benchmarks of the visuals and views.
+
+The benchmarks run offscreen, with the Qt `offscreen` platform and the Mesa `llvmpipe` software
+renderer unless the environment says otherwise. Every benchmark is run at increasing numbers of
+points, and the duration of each phase (for example `set_data` and `draw`) is written to a JSON
+file along with the peak memory usage, so that it can be compared to a baseline:
+
+    python -m pynaception.benchmark --sizes 1e4 1e6 --output results.json
+    python -m pynaception.benchmark --baseline results.json
+
+"""
+
+
+#------------------------------------------------------------------------------
+# Imports
+#------------------------------------------------------------------------------
+
+import argparse
+from collections import OrderedDict
+import gc
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import sys
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+#------------------------------------------------------------------------------
+# Utils
+#------------------------------------------------------------------------------
+
+# Numbers of points of every benchmark, by default.
+DEFAULT_SIZES = (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7, 10 ** 8)
+
+# A phase is a regression if it is slower than the baseline by more than this factor.
+DEFAULT_TOLERANCE = 1.25
+
+
+def _set_offscreen():
+    """Use the Qt offscreen platform and the Mesa software renderer, unless specified
+    otherwise in the environment. Must be called before Qt is imported."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+    os.environ.setdefault('GALLIUM_DRIVER', 'llvmpipe')
+
+
+class PeakMemory(object):
+    """Context manager sampling the memory usage of the process in a background thread.
+
+    The `peak` attribute is the maximum increase of the resident memory, in bytes, or None
+    if psutil is not installed.
+
+    """
+
+    interval = .005
+
+    def __init__(self):
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self, memory_usage, start):
+        while True:
+            self.peak = max(self.peak, memory_usage() - start)
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self):
+        from utils.profiling import _memory_usage
+        try:
+            start = _memory_usage()
+        except ImportError:  # pragma: no cover
+            return self
+        self.peak = 0
+        self._thread = threading.Thread(target=self._sample, args=(_memory_usage, start))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+
+class _Timer(object):
+    """Collect the durations of the phases of a benchmark, in milliseconds."""
+
+    def __init__(self):
+        self.durations = OrderedDict()
+
+    def _add(self, phase, duration):
+        self.durations.setdefault(phase, []).append(duration)
+
+    def __call__(self, phase):
+        """Context manager timing a phase of the benchmark."""
+        from utils.profiling import benchmark
+        return benchmark(phase, callback=self._add)
+
+
+#------------------------------------------------------------------------------
+# Benchmarks
+#------------------------------------------------------------------------------
+
+_BENCHMARKS = OrderedDict()
+
+
+def register(name, max_size=None, gl=False):
+    """Register a benchmark function `f(n, timer)`.
+
+    The function runs the benchmark with `n` points, and times each phase with
+    `with timer(phase):`. Set `gl` to True if the benchmark needs a Qt application and an
+    OpenGL context.
+
+    """
+    def wrap(f):
+        _BENCHMARKS[name] = (f, max_size, gl)
+        return f
+    return wrap
+
+
+def _show(canvas):
+    from .qt import _wait
+    canvas.show()
+    _wait(10)
+
+
+def _new_canvas():
+    """Create and show a canvas."""
+    from .plot.base import BaseCanvas
+    canvas = BaseCanvas()
+    _show(canvas)
+    return canvas
+
+
+def _draw(canvas):
+    """Draw a frame and wait for the GPU."""
+    canvas.grabFramebuffer()
+
+
+@register('transform_chain')
+def _bench_transform_chain(n, timer):
+    from .plot.transform import TransformChain, Range, Scale, Translate
+    pos = np.random.uniform(-10, 10, (n, 2))
+    out = np.empty_like(pos)
+    tc = TransformChain([
+        Range((-10, -10, 10, 10), (-1, -1, 1, 1)), Scale((.5, 2)), Translate((.1, .2))])
+    with timer('apply'):
+        tc.apply(pos)
+    with timer('apply_inplace'):
+        tc.apply(pos, out=out)
+
+
+@register('batch_accumulator', max_size=10 ** 7)
+def _bench_batch_accumulator(n, timer):
+    from .plot.visuals import ScatterVisual
+    n_batch = 1000
+    pos = np.random.uniform(-1, 1, (min(n, n_batch), 2))
+    visual = ScatterVisual()
+    with timer('add_batch_data'):
+        for _ in range(max(1, n // n_batch)):
+            visual.add_batch_data(pos=pos)
+    with timer('data'):
+        visual._acc.data
+
+
+@register('plot_visual', gl=True)
+def _bench_plot_visual(n, timer):
+    from .plot.visuals import PlotVisual
+    n_signals = max(1, n // 10 ** 5)
+    y = np.random.normal(size=(n_signals, n // n_signals))
+    visual = PlotVisual()
+    canvas = _new_canvas()
+    canvas.add_visual(visual)
+    with timer('set_data'):
+        visual.set_data(y=y)
+    with timer('draw'):
+        _draw(canvas)
+    canvas.close()
+
+
+@register('scatter_visual', gl=True)
+def _bench_scatter_visual(n, timer):
+    from .plot.visuals import ScatterVisual
+    pos = np.random.uniform(-1, 1, (n, 2))
+    visual = ScatterVisual()
+    canvas = _new_canvas()
+    canvas.add_visual(visual)
+    with timer('set_data'):
+        visual.set_data(pos=pos)
+    with timer('draw'):
+        _draw(canvas)
+    canvas.close()
+
+
+@register('text_visual', max_size=10 ** 7, gl=True)
+def _bench_text_visual(n, timer):
+    from .plot.visuals import TextVisual
+    # Strings of 10 characters: the number of points is the number of glyphs.
+    n_strings = max(1, n // 10)
+    pos = np.random.uniform(-1, 1, (n_strings, 2))
+    text = ['%010d' % i for i in range(n_strings)]
+    visual = TextVisual()
+    canvas = _new_canvas()
+    canvas.add_visual(visual)
+    with timer('set_data'):
+        visual.set_data(pos=pos, text=text)
+    with timer('move'):
+        visual.set_data(pos=pos[::-1], text=text)
+    with timer('draw'):
+        _draw(canvas)
+    canvas.close()
+
+
+@register('tsd_view', gl=True)
+def _bench_tsd_view(n, timer):
+    from .datasource import ArraySource
+    from .pynaviews import TsdView
+    t = np.arange(n) / 1e4
+    values = np.random.normal(size=n)
+    try:
+        import pynapple as nap
+        tsd = nap.Tsd(t=t, d=values)
+    except ImportError:
+        tsd = ArraySource(t, values)
+    with timer('init'):
+        view = TsdView(tsd)
+    _show(view.canvas)
+    with timer('plot'):
+        view.plot()
+    with timer('draw'):
+        _draw(view.canvas)
+    view.close()
+
+
+@register('tsgroup_view', gl=True)
+def _bench_tsgroup_view(n, timer):
+    from .pynaviews import TsGroupView
+    n_clusters = 100
+    spike_times = np.sort(np.random.uniform(0, n / 1e3, n))
+    spike_clusters = np.random.randint(0, n_clusters, n)
+    with timer('init'):
+        view = TsGroupView(spike_times, spike_clusters, np.arange(n_clusters))
+    _show(view.canvas)
+    with timer('plot'):
+        view.plot()
+    with timer('draw'):
+        _draw(view.canvas)
+    view.close()
+
+
+#------------------------------------------------------------------------------
+# Runner
+#------------------------------------------------------------------------------
+
+def _machine_info():
+    return OrderedDict(
+        platform=platform.platform(),
+        python=platform.python_version(),
+        numpy=np.__version__,
+    )
+
+
+def _gl_renderer():
+    from .plot.gloo import gl
+    canvas = _new_canvas()
+    try:
+        canvas.makeCurrent()
+        return gl.glGetString(gl.GL_RENDERER).decode()
+    except Exception as e:  # pragma: no cover
+        logger.debug("Unable to get the OpenGL renderer: %s", str(e))
+        return ''
+    finally:
+        canvas.close()
+
+
+def _run_one(name, n, repeats):
+    f = _BENCHMARKS[name][0]
+    timer = _Timer()
+    with PeakMemory() as memory:
+        for _ in range(repeats):
+            f(n, timer)
+            gc.collect()
+    return [OrderedDict(
+        name=name, phase=phase, n_points=n,
+        duration_ms=min(durations), durations_ms=durations,
+        peak_memory=memory.peak) for phase, durations in timer.durations.items()]
+
+
+def run_benchmarks(names=None, sizes=DEFAULT_SIZES, repeats=3, output=None):
+    """Run the benchmarks and return the results as a dictionary.
+
+    Parameters
+    ----------
+
+    names : list
+        The names of the benchmarks to run (all by default).
+    sizes : list
+        The numbers of points. A benchmark is skipped at sizes above its maximum size.
+    repeats : int
+        Number of runs of every benchmark. The reported duration is the fastest run.
+    output : str or Path
+        If set, path to the JSON file where the results are written.
+
+    """
+    names = names or list(_BENCHMARKS)
+    unknown = set(names) - set(_BENCHMARKS)
+    if unknown:
+        raise ValueError("Unknown benchmarks: %s." % ', '.join(sorted(unknown)))
+    info = _machine_info()
+    if any(_BENCHMARKS[name][2] for name in names):
+        _set_offscreen()
+        from .qt import create_app
+        create_app()
+        info['qt_platform'] = os.environ['QT_QPA_PLATFORM']
+        info['gl_renderer'] = _gl_renderer()
+    results = []
+    for name in names:
+        max_size = _BENCHMARKS[name][1]
+        for n in sizes:
+            n = int(n)
+            if max_size and n > max_size:
+                logger.info("Skip %s with %d points.", name, n)
+                continue
+            for r in _run_one(name, n, repeats):
+                logger.info(
+                    "%s.%s with %d points took %.3fms.", r['name'], r['phase'], n,
+                    r['duration_ms'])
+                results.append(r)
+    out = OrderedDict(machine=info, results=results)
+    if output is not None:
+        Path(output).write_text(json.dumps(out, indent=2))
+    return out
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the phases that are slower than in a baseline by more than a given factor.
+
+    Return a list of `(name, phase, n_points, baseline_ms, duration_ms)` tuples.
+
+    """
+    old = {
+        (r['name'], r['phase'], r['n_points']): r['duration_ms']
+        for r in baseline['results']}
+    out = []
+    for r in results['results']:
+        key = (r['name'], r['phase'], r['n_points'])
+        if key in old and r['duration_ms'] > tolerance * old[key]:
+            out.append(key + (old[key], r['duration_ms']))
+    return out
+
+
+def main(args=None):
+    """Run the benchmarks from the command line. Return 1 if there are regressions."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=list(_BENCHMARKS), help="benchmarks to run")
+    parser.add_argument(
+        '--sizes', nargs='+', type=float, default=DEFAULT_SIZES, help="numbers of points")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help="JSON file with the results")
+    parser.add_argument('--baseline', help="JSON file with the results to compare to")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    results = run_benchmarks(
+        names=args.only, sizes=args.sizes, repeats=args.repeats, output=args.output)
+    if not args.baseline:
+        return 0
+    regressions = compare(
+        results, json.loads(Path(args.baseline).read_text()), tolerance=args.tolerance)
+    for name, phase, n, old, new in regressions:
+        logger.warning(
+            "Regression: %s.%s with %d points took %.3fms instead of %.3fms.",
+            name, phase, n, new, old)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -9,7 +9,9 @@ from .qt import QWidget, QDockWidget, Qt, QSize, QHBoxLayout, QLabel, QVBoxLayou
 from PyQt5.QtWidgets import QListWidget
 import pynapple as nap
 
-from .pynaviews import TsGroupView, TsdView
+from .event import connect
+from .pynaviews import TsGroupView, TsdView, TsdFrameView, TimeSync
+from .datasource import DataSource
 
 import numpy as np
 
@@ -85,6 +87,9 @@ class Controller(QDockWidget):
         self.pynavar = pynavar
         self.gui = gui
         self.views = {}
+        # The views show the same time window.
+        self.time_sync = TimeSync()
+        connect(self.on_close_view)
 
         self.setObjectName('Variables')
         self.setWindowTitle('Variables')
@@ -116,19 +121,27 @@ class Controller(QDockWidget):
             self.add_tsd_view(var, item.text())
         elif isinstance(var, nap.TsdFrame):
             self.add_tsdframe_view(var, item.text())
+        elif isinstance(var, DataSource):
+            if var.n_channels:
+                self.add_tsdframe_view(var, item.text())
+            else:
+                self.add_tsd_view(var, item.text())
             
         return
 
-    def add_raster_view(self, tsgroup, name):
-        group_times = np.hstack([tsgroup[k].index.values for k in tsgroup.keys()])
-        group_clusters = np.hstack([
-            np.ones(len(tsgroup[k]), dtype='int')*k for k in tsgroup.keys()
-            ])
-        cluster_ids = np.unique(group_clusters)
+    def on_close_view(self, view, gui):
+        """Stop synchronizing a view once its dock is closed."""
+        if gui is not self.gui:
+            return
+        self.time_sync.remove_view(view)
+        self.views = {name: v for name, v in self.views.items() if v is not view}
+        view.close()
 
-        view = TsGroupView(group_times, group_clusters, cluster_ids=cluster_ids)
+    def add_raster_view(self, tsgroup, name):
+        view = TsGroupView.from_tsgroup(tsgroup)
         view.plot()
         view.attach(self.gui)
+        self.time_sync.add_view(view)
         self.views[name] = view
         return
 
@@ -136,11 +149,16 @@ class Controller(QDockWidget):
         view = TsdView(tsd)
         view.plot()
         view.attach(self.gui)
+        self.time_sync.add_view(view)
         self.views[name] = view
         return
 
     def add_tsdframe_view(self, tsdframe, name):
-        print("TODO")
+        view = TsdFrameView(tsdframe)
+        view.plot()
+        view.attach(self.gui)
+        self.time_sync.add_view(view)
+        self.views[name] = view
         return
 
 
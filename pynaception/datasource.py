@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+
+"""Data sources for the views.
+
+A data source gives access to a time series without loading it in memory: the views only read
+the samples of the time window they show. Sources can wrap in-memory arrays, flat binary files
+(e.g. neurosuite `.dat` / `.lfp` files) through `np.memmap`, or HDF5/NWB datasets through h5py.
+
+"""
+
+
+#------------------------------------------------------------------------------
+# Imports
+#------------------------------------------------------------------------------
+
+import logging
+from pathlib import Path
+import weakref
+
+import numpy as np
+from phylib.utils import Bunch
+
+from .plot.utils import _reduce_bins
+
+logger = logging.getLogger(__name__)
+
+
+#------------------------------------------------------------------------------
+# Data sources
+#------------------------------------------------------------------------------
+
+class DataSource(object):
+    """Base class for time series data sources.
+
+    Subclasses must define `n_samples`, `n_channels` (0 for a 1D signal), `get_times()`,
+    `get_values()` and `searchsorted()`.
+
+    """
+
+    n_samples = 0
+    n_channels = 0
+
+    def __len__(self):
+        return self.n_samples
+
+    @property
+    def shape(self):
+        """Shape of the values, `(n_samples,)` or `(n_samples, n_channels)`."""
+        return (self.n_samples, self.n_channels) if self.n_channels else (self.n_samples,)
+
+    @property
+    def t_start(self):
+        """Time of the first sample."""
+        return float(self.get_times(0, 1)[0])
+
+    @property
+    def t_end(self):
+        """Time of the last sample."""
+        return float(self.get_times(self.n_samples - 1, self.n_samples)[0])
+
+    def get_times(self, start, stop, step=1):
+        """Return the times of the samples `start:stop:step`, as a float64 array."""
+        raise NotImplementedError()
+
+    def get_values(self, start, stop):
+        """Return the values of the samples `start:stop`."""
+        raise NotImplementedError()
+
+    def searchsorted(self, t, side='left'):
+        """Return the index where a time would be inserted to keep the times sorted."""
+        raise NotImplementedError()
+
+
+class ArraySource(DataSource):
+    """In-memory time series.
+
+    Constructor
+    -----------
+
+    t : array-like
+        An `(n_samples,)` array with the sorted sample times.
+    values : array-like
+        An `(n_samples,)` or `(n_samples, n_channels)` array.
+
+    """
+
+    def __init__(self, t, values):
+        assert len(t) == len(values)
+        self.t = t
+        self.values = values
+        self.n_samples = len(t)
+        self.n_channels = values.shape[1] if values.ndim == 2 else 0
+
+    @classmethod
+    def from_tsd(cls, tsd):
+        """Wrap a pynapple `Tsd` or `TsdFrame` without copying it."""
+        return cls(tsd.index.values, tsd.values)
+
+    def get_times(self, start, stop, step=1):
+        return self.t[start:stop:step]
+
+    def get_values(self, start, stop):
+        return self.values[start:stop]
+
+    def searchsorted(self, t, side='left'):
+        return int(np.searchsorted(self.t, t, side=side))
+
+
+class _RegularSource(DataSource):
+    """Source of regularly-sampled data, where the sample times are never stored."""
+
+    sampling_rate = 1.
+    _t_start = 0.
+
+    @property
+    def t_start(self):
+        return self._t_start
+
+    @property
+    def t_end(self):
+        return self._t_start + (self.n_samples - 1) / self.sampling_rate
+
+    def get_times(self, start, stop, step=1):
+        return self._t_start + np.arange(start, min(stop, self.n_samples), step) / self.sampling_rate
+
+    def searchsorted(self, t, side='left'):
+        # Index of the last sample before `t`, up to the rounding errors of the sample times,
+        # which are then compared to `t` around that index.
+        i = int(np.clip(np.floor((t - self._t_start) * self.sampling_rate), -1, self.n_samples))
+        start = max(i - 1, 0)
+        return start + int(np.searchsorted(self.get_times(start, i + 3), t, side=side))
+
+    def _select_channels(self, values):
+        return values if self.channels is None else values[:, self.channels]
+
+
+class BinarySource(_RegularSource):
+    """Flat binary file with interleaved channels, memory-mapped with `np.memmap`.
+
+    Constructor
+    -----------
+
+    path : str or Path
+        Path to the binary file, for example a neurosuite `.dat` or `.lfp` file.
+    n_channels : int
+        Total number of channels in the file.
+    sampling_rate : float
+        Sampling rate, in Hz.
+    dtype : str or dtype
+        Data type of the samples.
+    channels : int or list
+        A channel index (the source is then 1D) or a list of channels to keep. All channels
+        are kept by default.
+    t_start : float
+        Time of the first sample, in seconds.
+    offset : int
+        Size of the header in bytes.
+
+    """
+
+    def __init__(
+            self, path, n_channels, sampling_rate, dtype=np.int16, channels=None,
+            t_start=0., offset=0):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.sampling_rate = float(sampling_rate)
+        self._t_start = float(t_start)
+        n_bytes = self.path.stat().st_size - offset
+        n_samples = n_bytes // (self.dtype.itemsize * n_channels)
+        self._data = np.memmap(
+            self.path, dtype=self.dtype, mode='r', offset=offset, shape=(n_samples, n_channels))
+        self.n_samples = n_samples
+        self.channels = channels
+        if channels is None:
+            self.n_channels = n_channels
+        elif isinstance(channels, (int, np.integer)):
+            self.n_channels = 0
+        else:
+            self.n_channels = len(channels)
+
+    def get_values(self, start, stop):
+        # Only the pages spanned by the slice are read from disk.
+        return self._select_channels(self._data[start:stop])
+
+
+class HDF5Source(_RegularSource):
+    """HDF5 dataset read with h5py, for example the data of an NWB `TimeSeries`.
+
+    Constructor
+    -----------
+
+    dataset : h5py.Dataset
+        An `(n_samples,)` or `(n_samples, n_channels)` dataset.
+    timestamps : h5py.Dataset
+        An `(n_samples,)` dataset with the sorted sample times. If not set, the data is
+        assumed to be regularly sampled at `sampling_rate`, starting at `t_start`.
+    sampling_rate : float
+        Sampling rate, in Hz.
+    channels : int or list
+        A channel index (the source is then 1D) or a list of channels to keep.
+    t_start : float
+        Time of the first sample, in seconds.
+
+    The sources opened with `from_file()` or `from_nwb()` own their HDF5 file, which is closed
+    by `close()` or at the end of a `with` block.
+
+    """
+
+    def __init__(
+            self, dataset, timestamps=None, sampling_rate=None, channels=None, t_start=0.):
+        # HDF5 file opened by the source, if any.
+        self.file = None
+        self.dataset = dataset
+        self.timestamps = timestamps
+        assert timestamps is not None or sampling_rate is not None
+        self.sampling_rate = float(sampling_rate or 1.)
+        self._t_start = float(t_start)
+        self.n_samples = dataset.shape[0]
+        self.channels = channels
+        if dataset.ndim == 1 or isinstance(channels, (int, np.integer)):
+            self.n_channels = 0
+        elif channels is None:
+            self.n_channels = dataset.shape[1]
+        else:
+            self.n_channels = len(channels)
+
+    @classmethod
+    def from_file(cls, path, key, **kwargs):
+        """Open a dataset in an HDF5 file."""
+        import h5py
+        f = h5py.File(path, 'r')
+        try:
+            source = cls(f[key], **kwargs)
+        except Exception:
+            f.close()
+            raise
+        source.file = f
+        return source
+
+    @classmethod
+    def from_nwb(cls, path, key, **kwargs):
+        """Open an NWB `TimeSeries` group, e.g. `acquisition/ElectricalSeries`."""
+        import h5py
+        f = h5py.File(path, 'r')
+        try:
+            group = f[key]
+            if 'timestamps' in group:
+                source = cls(group['data'], timestamps=group['timestamps'], **kwargs)
+            else:
+                starting_time = group['starting_time']
+                source = cls(
+                    group['data'], sampling_rate=starting_time.attrs['rate'],
+                    t_start=starting_time[()], **kwargs)
+        except Exception:
+            f.close()
+            raise
+        source.file = f
+        return source
+
+    def close(self):
+        """Close the HDF5 file opened by the source, if any."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def t_start(self):
+        if self.timestamps is None:
+            return self._t_start
+        return float(self.timestamps[0])
+
+    @property
+    def t_end(self):
+        if self.timestamps is None:
+            return super(HDF5Source, self).t_end
+        return float(self.timestamps[self.n_samples - 1])
+
+    def get_times(self, start, stop, step=1):
+        if self.timestamps is None:
+            return super(HDF5Source, self).get_times(start, stop, step=step)
+        return np.asarray(self.timestamps[start:stop:step], dtype=np.float64)
+
+    def get_values(self, start, stop):
+        values = self.dataset[start:stop]
+        if self.channels is None or values.ndim == 1:
+            return values
+        return values[:, self.channels]
+
+    def searchsorted(self, t, side='left'):
+        if self.timestamps is None:
+            return super(HDF5Source, self).searchsorted(t, side=side)
+        # Binary search reading a single timestamp at a time.
+        lo, hi = 0, self.n_samples
+        while lo < hi:
+            mid = (lo + hi) // 2
+            tm = self.timestamps[mid]
+            if tm < t or (side == 'right' and tm == t):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+#------------------------------------------------------------------------------
+# Decimation
+#------------------------------------------------------------------------------
+
+class ChunkedEnvelope(object):
+    """Min/max envelope of a data source, computed on the fly from the samples of the
+    requested window only.
+
+    This has the same interface as `MinMaxPyramid`, without requiring a pass over the whole
+    data. When a window spans more than `max_read` values, only a block of samples at the
+    start of every bin is read, so that the envelope is approximate at very low zoom levels.
+
+    Constructor
+    -----------
+
+    source : DataSource
+        The data source.
+    base : int
+        Number of samples per bin in the finest level.
+    factor : int
+        Decimation factor between two consecutive levels.
+    max_read : int
+        Maximum number of values (samples times channels) read to compute an envelope.
+
+    """
+
+    def __init__(self, source, base=16, factor=4, max_read=10000000):
+        self.source = source
+        self.n_samples = source.n_samples
+        self.base = base
+        self.factor = factor
+        self.max_read = max_read
+        self.bin_sizes = [base]
+        while self.bin_sizes[-1] < self.n_samples:
+            self.bin_sizes.append(self.bin_sizes[-1] * factor)
+
+    @property
+    def n_levels(self):
+        return len(self.bin_sizes)
+
+    def _get_subsample(self, n_samples=100000):
+        step = max(1, self.n_samples // max(1, n_samples // 100))
+        return np.concatenate([
+            self.source.get_values(i, i + 100) for i in range(0, self.n_samples, step)])
+
+    def get_bounds(self):
+        """Return the data bounds `(t0, ymin, t1, ymax)`, with the value range estimated from
+        a regular subsample of the data."""
+        values = self._get_subsample()
+        return (self.source.t_start, values.min(), self.source.t_end, values.max())
+
+    def get_channel_bounds(self):
+        """Return the estimated `(ymin, ymax)` arrays of every channel."""
+        values = self._get_subsample()
+        return values.min(axis=0), values.max(axis=0)
+
+    def get_level(self, n_samples, n_points):
+        if n_samples <= n_points:
+            return -1
+        n_bins = max(1, n_points // 2)
+        for level, size in enumerate(self.bin_sizes):
+            if n_samples <= size * n_bins:
+                return level
+        return self.n_levels - 1
+
+    def get_range(self, t0, t1):
+        i0 = max(0, self.source.searchsorted(t0, side='left') - 1)
+        i1 = min(self.n_samples, self.source.searchsorted(t1, side='right') + 1)
+        return i0, i1
+
+    def get_n_vertices(self, t0, t1, level):
+        i0, i1 = self.get_range(t0, t1)
+        if level < 0:
+            return i1 - i0
+        size = self.bin_sizes[level]
+        return 2 * (-(-i1 // size) - i0 // size)
+
+    def _read(self, start, stop, channels):
+        values = self.source.get_values(start, stop)
+        return values if channels is None else values[:, channels]
+
+    def get(self, t0, t1, n_points=None, level=None, channels=None):
+        i0, i1 = self.get_range(t0, t1)
+        if level is None:
+            level = self.get_level(i1 - i0, n_points)
+        if level < 0:
+            return Bunch(
+                x=self.source.get_times(i0, i1), y=self._read(i0, i1, channels),
+                level=level, start=i0, stop=i1)
+        size = self.bin_sizes[level]
+        j0, j1 = i0 // size, -(-i1 // size)
+        start, stop = j0 * size, min(j1 * size, self.n_samples)
+        # The read budget is in values, so that it does not depend on the number of channels.
+        n_channels = max(1, self.source.n_channels) if channels is None else len(channels)
+        max_read = max(1, self.max_read // n_channels)
+        if stop - start <= max_read:
+            values = self._read(start, stop, channels)
+            ymin = _reduce_bins(values, size, np.minimum)
+            ymax = _reduce_bins(values, size, np.maximum)
+        else:
+            # Only read a block of samples at the start of every bin.
+            block = max(1, max_read // (j1 - j0))
+            blocks = [
+                self._read(i, min(i + block, stop), channels) for i in range(start, stop, size)]
+            ymin = np.stack([b.min(axis=0) for b in blocks])
+            ymax = np.stack([b.max(axis=0) for b in blocks])
+        x = np.repeat(self.source.get_times(start, stop, size), 2)
+        y = np.empty((2 * len(ymin),) + ymin.shape[1:], dtype=ymin.dtype)
+        y[0::2] = ymin
+        y[1::2] = ymax
+        return Bunch(x=x, y=y, level=level, start=start, stop=stop)
+
+
+#------------------------------------------------------------------------------
+# Spike trains
+#------------------------------------------------------------------------------
+
+_FLAT_CACHE = {}
+
+
+def _label_dtype(cluster_ids):
+    """Smallest signed integer type holding the cluster ids."""
+    if not len(cluster_ids):
+        return np.int16
+    info = np.iinfo(np.int16)
+    if info.min <= np.min(cluster_ids) and np.max(cluster_ids) <= info.max:
+        return np.int16
+    return np.int32
+
+
+def flatten_tsgroup(tsgroup):
+    """Flatten a pynapple `TsGroup` into spike times and spike clusters.
+
+    The arrays are allocated once from the unit counts and filled in a single pass. Spikes are
+    sorted by cluster, then by time. The result is cached as long as the `TsGroup` lives, so
+    that flattening the same object again is free.
+
+    Return a Bunch with `spike_times` (float64), `spike_clusters` (int16, or int32 for large
+    cluster ids) and `cluster_ids`.
+
+    """
+    key = id(tsgroup)
+    b = _FLAT_CACHE.get(key, None)
+    if b is not None and b.n_units == len(tsgroup):
+        return b
+
+    cluster_ids = np.sort(np.asarray(list(tsgroup.keys())))
+    # Each unit is indexed once.
+    units = [tsgroup[k].index.values for k in cluster_ids]
+    counts = np.array([len(u) for u in units], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    spike_times = np.empty(offsets[-1], dtype=np.float64)
+    spike_clusters = np.empty(offsets[-1], dtype=_label_dtype(cluster_ids))
+    for k, unit, i0, i1 in zip(cluster_ids, units, offsets[:-1], offsets[1:]):
+        spike_times[i0:i1] = unit
+        spike_clusters[i0:i1] = k
+
+    b = Bunch(
+        spike_times=spike_times, spike_clusters=spike_clusters,
+        cluster_ids=cluster_ids, n_units=len(tsgroup))
+    try:
+        weakref.finalize(tsgroup, _FLAT_CACHE.pop, key, None)
+    except TypeError:  # pragma: no cover
+        # Objects that cannot be weakly referenced are not cached, as their id may be reused.
+        return b
+    _FLAT_CACHE[key] = b
+    return b
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+"""Event system."""
+
+
+# -----------------------------------------------------------------------------
+# Imports
+# -----------------------------------------------------------------------------
+
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import partial
+import re
+import weakref
+
+
+# -----------------------------------------------------------------------------
+# Event emitter
+# -----------------------------------------------------------------------------
+
+class _Callback(object):
+    """Callback function registered to an event, with weak references to its sender and, for
+    bound methods, to its instance."""
+
+    def __init__(self, event, sender, func, kwargs, order, on_dead=None):
+        self.event = event
+        self.key = _sender_key(sender)
+        self.kwargs = kwargs
+        self.last = bool(kwargs.get('last', None))
+        self.order = order
+        self.sender = _weak(sender, on_dead)
+        if hasattr(func, '__self__') and hasattr(func, '__func__'):
+            self.func = weakref.WeakMethod(func, on_dead)
+        else:
+            self.func = lambda: func
+
+    def matches(self, items):
+        """Whether the callback function, its instance, or its sender is in a list."""
+        f = self.func()
+        return (
+            f in items or getattr(f, '__self__', None) in items or
+            (self.key is not None and self.sender() in items))
+
+
+def _sender_key(sender):
+    return None if sender is None else id(sender)
+
+
+def _weak(obj, callback=None):
+    """Return a weak reference to an object, or a function returning the object if it does not
+    support weak references."""
+    if obj is None:
+        return lambda: None
+    try:
+        return weakref.ref(obj, callback)
+    except TypeError:
+        return lambda: obj
+
+
+class EventEmitter(object):
+    """Singleton class that emits events and accepts registered callbacks.
+
+    The callbacks are indexed by event and sender, so that the cost of `emit()` only depends
+    on the number of callbacks to call. The senders are matched by identity, not equality. The
+    senders, and the instances of bound methods, are weakly referenced: their callbacks are
+    removed once they are garbage collected.
+
+    Example
+    -------
+
+    ```python
+    class MyClass(EventEmitter):
+        def f(self):
+            self.emit('my_event', 1, key=2)
+
+    o = MyClass()
+
+    # The following function will be called when `o.f()` is called.
+    @o.connect
+    def on_my_event(arg, key=None):
+        print(arg, key)
+
+    ```
+
+    """
+
+    def __init__(self):
+        self.reset()
+        self.is_silent = False
+
+    def set_silent(self, silent):
+        """Set whether to silence the events."""
+        self.is_silent = silent
+
+    def reset(self):
+        """Remove all registered callbacks."""
+        # Registered callbacks, by event and by sender id (None for all senders).
+        self._callbacks = defaultdict(lambda: defaultdict(list))
+        # Callbacks to call, by event and sender id, in the order of the calls.
+        self._dispatch = {}
+        self._order = 0
+        # Whether a sender or an instance has been garbage collected since the last emit().
+        self._has_dead = False
+
+    def _get_on_name(self, func):
+        """Return `eventname` when the function name is `on_<eventname>()`."""
+        r = re.match("^on_(.+)$", func.__name__)
+        if r:
+            event = r.group(1)
+        else:
+            raise ValueError("The function name should be "
+                             "`on_<eventname>`().")
+        return event
+
+    @contextmanager
+    def silent(self):
+        """Prevent all callbacks to be called if events are raised
+        in the context manager.
+        """
+        self.is_silent = not(self.is_silent)
+        yield
+        self.is_silent = not(self.is_silent)
+
+    def connect(self, func=None, event=None, sender=None, **kwargs):
+        """Register a callback function to a given event.
+
+        To register a callback function to the `spam` event, where `obj` is
+        an instance of a class deriving from `EventEmitter`:
+
+        ```python
+        @obj.connect(sender=sender)
+        def on_spam(sender, arg1, arg2):
+            pass
+        ```
+
+        This is called when `obj.emit('spam', sender, arg1, arg2)` is called.
+
+        Several callback functions can be registered for a given event.
+
+        The registration order is conserved and may matter in applications.
+
+        """
+        if func is None:
+            return partial(self.connect, event=event, sender=sender, **kwargs)
+
+        # Get the event name from the function.
+        if event is None:
+            event = self._get_on_name(func)
+
+        # We register the callback function.
+        self._order += 1
+        callback = _Callback(
+            event, sender, func, kwargs, self._order, on_dead=self._on_dead)
+        self._callbacks[event][callback.key].append(callback)
+        self._invalidate(event)
+
+        return func
+
+    def _invalidate(self, event):
+        """Recompute the callbacks of an event at the next emit()."""
+        for key in [key for key in self._dispatch if key[0] == event]:
+            del self._dispatch[key]
+
+    def _remove(self, should_remove):
+        """Remove the registered callbacks for which a function returns True."""
+        for event, by_sender in list(self._callbacks.items()):
+            for key, callbacks in list(by_sender.items()):
+                kept = [c for c in callbacks if not should_remove(c)]
+                if len(kept) == len(callbacks):
+                    continue
+                if kept:
+                    by_sender[key] = kept
+                else:
+                    del by_sender[key]
+                self._invalidate(event)
+            if not by_sender:
+                del self._callbacks[event]
+
+    def _on_dead(self, ref):
+        # This may be called by the garbage collector at any time, so the callbacks are only
+        # removed at the next emit().
+        self._has_dead = True
+
+    def _remove_dead(self):
+        """Remove the callbacks whose sender or instance has been garbage collected."""
+        self._has_dead = False
+        self._remove(lambda c: c.func() is None or (c.key is not None and c.sender() is None))
+
+    def unconnect(self, *items):
+        """Unconnect specified callback functions or senders."""
+        self._remove(lambda c: c.matches(items))
+
+    def _get_callbacks(self, event, sender):
+        """Return the callbacks to call when a sender emits an event, with the `last=True`
+        callbacks at the end."""
+        by_sender = self._callbacks.get(event, {})
+        callbacks = list(by_sender.get(None, ()))
+        if sender is not None:
+            callbacks += by_sender.get(id(sender), ())
+        return sorted(callbacks, key=lambda c: (c.last, c.order))
+
+    def emit(self, event, sender, *args, **kwargs):
+        """Call all callback functions registered with an event.
+
+        Any positional and keyword arguments can be passed here, and they will
+        be forwarded to the callback functions.
+
+        Return the list of callback return results.
+
+        """
+        if self.is_silent:
+            return
+        # Call the last callback if this is a single event.
+        single = kwargs.pop('single', None)
+        if self._has_dead:
+            self._remove_dead()
+        key = (event, _sender_key(sender))
+        callbacks = self._dispatch.get(key)
+        if callbacks is None:
+            callbacks = self._dispatch[key] = self._get_callbacks(event, sender)
+        res = []
+        for c in callbacks:
+            f = c.func()
+            if f is None:
+                continue
+            res.append(f(sender, *args, **kwargs))
+            if single:
+                return res[-1]
+        return res
+
+
+# Global event emitter, shared by the GUI, the canvases and the views.
+_EVENT = EventEmitter()
+
+emit = _EVENT.emit
+connect = _EVENT.connect
+unconnect = _EVENT.unconnect
+silent = _EVENT.silent
+set_silent = _EVENT.set_silent
+reset = _EVENT.reset
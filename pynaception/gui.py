@@ -15,139 +15,11 @@ from .qt import (
     QMenu, QToolBar, QStatusBar, QMainWindow, QMessageBox, Qt, QPoint, QSize, _load_font,
     _wait, prompt, show_box, screenshot as make_screenshot)
 
-from contextlib import contextmanager
 import string
-import re
-from functools import partial
 
+from .event import EventEmitter, emit, connect, unconnect, silent, set_silent, reset
 
-class EventEmitter(object):
-    """Singleton class that emits events and accepts registered callbacks.
 
-    Example
-    -------
-
-    ```python
-    class MyClass(EventEmitter):
-        def f(self):
-            self.emit('my_event', 1, key=2)
-
-    o = MyClass()
-
-    # The following function will be called when `o.f()` is called.
-    @o.connect
-    def on_my_event(arg, key=None):
-        print(arg, key)
-
-    ```
-
-    """
-
-    def __init__(self):
-        self.reset()
-        self.is_silent = False
-
-    def set_silent(self, silent):
-        """Set whether to silence the events."""
-        self.is_silent = silent
-
-    def reset(self):
-        """Remove all registered callbacks."""
-        self._callbacks = []
-
-    def _get_on_name(self, func):
-        """Return `eventname` when the function name is `on_<eventname>()`."""
-        r = re.match("^on_(.+)$", func.__name__)
-        if r:
-            event = r.group(1)
-        else:
-            raise ValueError("The function name should be "
-                             "`on_<eventname>`().")
-        return event
-
-    @contextmanager
-    def silent(self):
-        """Prevent all callbacks to be called if events are raised
-        in the context manager.
-        """
-        self.is_silent = not(self.is_silent)
-        yield
-        self.is_silent = not(self.is_silent)
-
-    def connect(self, func=None, event=None, sender=None, **kwargs):
-        """Register a callback function to a given event.
-
-        To register a callback function to the `spam` event, where `obj` is
-        an instance of a class deriving from `EventEmitter`:
-
-        ```python
-        @obj.connect(sender=sender)
-        def on_spam(sender, arg1, arg2):
-            pass
-        ```
-
-        This is called when `obj.emit('spam', sender, arg1, arg2)` is called.
-
-        Several callback functions can be registered for a given event.
-
-        The registration order is conserved and may matter in applications.
-
-        """        
-        if func is None:
-            return partial(self.connect, event=event, sender=sender, **kwargs)
-
-        # Get the event name from the function.
-        if event is None:
-            event = self._get_on_name(func)
-
-        # We register the callback function.
-        self._callbacks.append((event, sender, func, kwargs))
-
-        return func
-
-    def unconnect(self, *items):
-        """Unconnect specified callback functions or senders."""
-        self._callbacks = [
-            (event, sender, f, kwargs)
-            for (event, sender, f, kwargs) in self._callbacks
-            if f not in items and sender not in items and
-            getattr(f, '__self__', None) not in items]
-
-    def emit(self, event, sender, *args, **kwargs):
-        """Call all callback functions registered with an event.
-
-        Any positional and keyword arguments can be passed here, and they will
-        be forwarded to the callback functions.
-
-        Return the list of callback return results.
-
-        """
-        if self.is_silent:
-            return
-        sender_name = sender.__class__.__name__
-        # Call the last callback if this is a single event.
-        single = kwargs.pop('single', None)
-        res = []
-        # Put `last=True` callbacks at the end.
-        callbacks = [c for c in self._callbacks if not c[-1].get('last', None)]
-        callbacks += [c for c in self._callbacks if c[-1].get('last', None)]
-        for e, s, f, k in callbacks:
-            if e == event and (s is None or s == sender):
-                f_name = getattr(f, '__qualname__', getattr(f, '__name__', str(f)))
-                s_name = s.__class__.__name__                
-                res.append(f(sender, *args, **kwargs))
-                if single:
-                    return res[-1]
-        return res
-
-_EVENT = EventEmitter()
-
-emit = _EVENT.emit
-connect = _EVENT.connect
-unconnect = _EVENT.unconnect
-silent = _EVENT.silent
-set_silent = _EVENT.set_silent
-reset = _EVENT.reset
 
 # -----------------------------------------------------------------------------
 # Dock widget
@@ -223,6 +95,18 @@ class DockWidget(QDockWidget):
         emit('close_dock_widget', self)
         super(DockWidget, self).closeEvent(e)
 
+    @property
+    def status(self):
+        """Current status text of the dock."""
+        return self._status.text()
+
+    def set_status(self, text):
+        """Set the status text of the dock."""
+        n = self.max_status_length
+        if len(text) >= n:
+            text = text[:n // 2] + ' ... ' + text[-n // 2:]
+        self._status.setText(text)
+
     def _create_status_bar(self):
         # Dock has requested widget and status bar.
         widget_container = QWidget(self)
@@ -320,6 +204,8 @@ class GUI(QMainWindow):
         # Emit the close_view event when the dock widget is closed.
         @connect(sender=dock)
         def on_close_dock_widget(sender):
+            # This closure holds a reference to the view.
+            unconnect(on_close_dock_widget)
             self._views.remove(view)
             emit('close_view', view, self)
 
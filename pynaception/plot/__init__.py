@@ -12,15 +12,35 @@ For advanced users!
 # Imports
 #------------------------------------------------------------------------------
 
+from importlib import import_module
 import os.path as op
 
-from .base import BaseVisual, GLSLInserter, BaseCanvas, BaseLayout
-from .plot import PlotCanvas
-from .transform import Translate, Scale, Range, Subplot, NDC, TransformChain, extend_bounds
-from .panzoom import PanZoom
-from .axes import AxisLocator, Axes
-from .utils import get_linear_x, BatchAccumulator
-from .interact import Grid, Boxed, Lasso
-from .visuals import (
-    ScatterVisual, UniformScatterVisual, PlotVisual, UniformPlotVisual, HistogramVisual,
-    TextVisual, LineVisual, ImageVisual, PolygonVisual)
+
+# The submodules are only imported on first access to one of their public names, since they
+# import Qt, OpenGL and matplotlib, which are slow to load.
+_LAZY_NAMES = {
+    'base': ('BaseVisual', 'GLSLInserter', 'BaseCanvas', 'BaseLayout', 'program_cache'),
+    'plot': ('PlotCanvas',),
+    'transform': (
+        'Translate', 'Scale', 'Range', 'Subplot', 'NDC', 'TransformChain', 'extend_bounds'),
+    'panzoom': ('PanZoom',),
+    'axes': ('AxisLocator', 'Axes'),
+    'utils': ('get_linear_x', 'BatchAccumulator', 'MinMaxPyramid'),
+    'interact': ('Grid', 'Boxed', 'Lasso'),
+    'visuals': (
+        'ScatterVisual', 'UniformScatterVisual', 'PlotVisual', 'UniformPlotVisual',
+        'HistogramVisual', 'TextVisual', 'LineVisual', 'ImageVisual', 'PolygonVisual'),
+}
+_LAZY_MODULES = {name: module for module, names in _LAZY_NAMES.items() for name in names}
+
+
+def __getattr__(name):
+    if name not in _LAZY_MODULES:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(import_module('.' + _LAZY_MODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_MODULES))
@@ -8,14 +8,13 @@
 #------------------------------------------------------------------------------
 
 import numpy as np
-from matplotlib.ticker import MaxNLocator
 
 
 from .transform import NDC, Range, _fix_coordinate_in_visual
 from .visuals import LineVisual, TextVisual
-from phylib import connect
+from ..event import connect
 from phylib.utils._types import _is_integer
-from gui.qt import is_high_dpi
+from ..qt import is_high_dpi, Debouncer
 
 
 #------------------------------------------------------------------------------
@@ -54,6 +53,8 @@ class AxisLocator(object):
 
     def set_nbins(self, nbinsx=None, nbinsy=None):
         """Change the number of bins on the x and y axes."""
+        # NOTE: matplotlib is slow to import, only import it when the axes are created.
+        from matplotlib.ticker import MaxNLocator
         nbinsx = self._bins_margin * nbinsx if _is_integer(nbinsx) else self._default_nbinsx
         nbinsy = self._bins_margin * nbinsy if _is_integer(nbinsy) else self._default_nbinsy
         self.locx = MaxNLocator(nbins=nbinsx, steps=self._default_steps)
@@ -146,6 +147,9 @@ class Axes(object):
     """
     default_color = (1, 1, 1, .25)
 
+    # Minimum delay between two tick updates while panning or zooming, in milliseconds.
+    tick_update_delay = 100
+
     def __init__(self, data_bounds=None, color=None, show_x=True, show_y=True):
         self.show_x = show_x
         self.show_y = show_y
@@ -153,6 +157,8 @@ class Axes(object):
         self._create_visuals()
         self.color = color or self.default_color
         self._attached = None
+        # Last tick labels and positions uploaded on the x and y axes.
+        self._last_ticks = {}
 
     def reset_data_bounds(self, data_bounds, do_update=True):
         """Reset the bounds of the view in data coordinates.
@@ -191,15 +197,23 @@ class Axes(object):
         # Position of the text in view coordinates.
         xpos, ypos = xdata[:, :2], ydata[:, 2:]
 
-        # Set the visuals data.
-        if self.show_x:
+        # Set the visuals data, only if the ticks have changed.
+        if self.show_x and self._ticks_changed('x', xtext, xdata):
             self.xvisual.set_data(xdata, color=self.color)
             self.txvisual.set_data(pos=xpos, text=xtext, anchor=(0, +1))
 
-        if self.show_y:
+        if self.show_y and self._ticks_changed('y', ytext, ydata):
             self.yvisual.set_data(ydata, color=self.color)
             self.tyvisual.set_data(pos=ypos, text=ytext, anchor=(-1, 0))
 
+    def _ticks_changed(self, axis, text, data):
+        """Return whether the tick labels or positions have changed since the last update."""
+        ticks = (tuple(text), data.tobytes())
+        if self._last_ticks.get(axis) == ticks:
+            return False
+        self._last_ticks[axis] = ticks
+        return True
+
     def attach(self, canvas):
         """Add the axes to a canvas.
 
@@ -229,20 +243,26 @@ class Axes(object):
         self.locator.set_view_bounds(NDC)
         self.update_visuals()
 
-        @connect(sender=canvas)
-        def on_resize(sender, w, h):
-            nbinsx, nbinsy = get_nbins(w, h)
-            self.locator.set_nbins(nbinsx, nbinsy)
-            self.locator.set_view_bounds(canvas.panzoom.get_range())
-            self.update_visuals()
+        # The ticks follow the pan and zoom on the GPU. They are only recomputed, and their
+        # text uploaded, at the start of a gesture and once it pauses or ends.
+        self._debouncer = Debouncer(delay=self.tick_update_delay)
+
+        # Bound methods do not keep the canvas alive, unlike closures.
+        connect(self._on_canvas_resize, event='resize', sender=canvas)
+        connect(self._on_zoom, event='zoom', sender=canvas.panzoom)
+        connect(self._on_pan, event='pan', sender=canvas.panzoom)
+
+    def _on_canvas_resize(self, sender, w, h):
+        nbinsx, nbinsy = get_nbins(w, h)
+        self.locator.set_nbins(nbinsx, nbinsy)
+        self.locator.set_view_bounds(self._attached.panzoom.get_range())
+        self.update_visuals()
 
-        @connect(sender=canvas.panzoom)
-        def on_zoom(sender, zoom):
-            return self._update_zoom(zoom)
+    def _on_zoom(self, sender, zoom):
+        self._debouncer.submit(self._update_zoom, zoom, key='zoom')
 
-        @connect(sender=canvas.panzoom)
-        def on_pan(sender, pan):
-            return self._update_pan(pan)
+    def _on_pan(self, sender, pan):
+        self._debouncer.submit(self._update_pan, pan, key='pan')
 
     def _update_zoom(self, zoom, force=False):
         zx, zy = zoom
@@ -8,19 +8,26 @@
 #------------------------------------------------------------------------------
 
 from contextlib import contextmanager
+import copy
 import gc
+import hashlib
 import logging
 import re
+from threading import Lock
 from timeit import default_timer
+import weakref
 
 import numpy as np
 
-from phylib.utils import connect, emit, Bunch
-from gui.qt import Qt, QEvent, QOpenGLWindow
+from phylib.utils import Bunch
+from ..event import connect, emit
+from ..qt import Qt, QEvent, QOpenGLWindow
 from . import gloo
-from .gloo import gl
-from .transform import TransformChain, Clip, pixels_to_ndc, Range
-from .utils import _load_shader, _get_array, BatchAccumulator
+from .gloo import gl, buffer as gloo_buffer
+from .transform import TransformChain, Clip, pixels_to_ndc, Range, _range_affine
+from .utils import (
+    _load_shader, _get_array, _pack_color, _pack_index, _interleave, _vertex_dtype,
+    BatchAccumulator, SpatialIndex)
 
 
 logger = logging.getLogger(__name__)
@@ -34,6 +41,22 @@ def indent(text):
     return '\n'.join('    ' + l.strip() for l in text.splitlines())
 
 
+def _format_frame_stats(stats):
+    """Return the lines of the heads-up display showing the statistics of a FrameProfiler."""
+    frame = stats['frame']
+    lines = ['%.1f fps, %.2f ms/frame (p95 %.2f ms, max %.2f ms)' % (
+        stats['fps'], frame['mean'], frame['p95'], frame['max'])]
+    for name, section in sorted(stats['sections'].items()):
+        lines.append('%s: %.2f ms (max %.2f ms)' % (name, section['mean'], section['max']))
+    for kind in ('set', 'uploads'):
+        nbytes = sum(b['bytes'] for b in stats[kind].values())
+        duration = sum(b['duration'] for b in stats[kind].values())
+        lines.append('%s: %.1f kB/frame, %.2f ms' % (kind, nbytes / 1024., duration))
+    lines.append('%d vertices in %d visuals' % (
+        sum(stats['vertices'].values()), len(stats['vertices'])))
+    return lines
+
+
 #------------------------------------------------------------------------------
 # Base spike visual
 #------------------------------------------------------------------------------
@@ -58,8 +81,13 @@ class BaseVisual(object):
     Notes
     -----
 
-    * set_data MUST set self.n_vertices (necessary for a_box_index in layouts)
+    * set_data MUST set n_vertices with `self._set_state()` (necessary for a_box_index in
+      layouts)
     * set_data MUST call `self.emit_visual_set_data()` at the end, and return the data
+    * per-vertex attributes SHOULD be uploaded with `self.set_vertex_data()`, which supports
+      the compact layout (see `set_compact()`)
+    * set_data MAY run in a background thread when the program is lazy: it must then only
+      change the state used for rendering through the program or `self._set_state()`
 
     """
 
@@ -73,6 +101,26 @@ class BaseVisual(object):
 
     _hidden = False
 
+    # Whether the vertex attributes are uploaded with a packed, interleaved layout.
+    compact = False
+
+    # Attributes holding RGBA colors in [0, 1], and non-negative integer indices. They are
+    # respectively packed as normalized uint8 and uint16/uint32 in the compact layout.
+    _color_attributes = ('a_color', 'a_pick_id')
+    _index_attributes = ('a_signal_index', 'a_box_index')
+
+    # Origin of the uploaded positions, in NDC (see `set_origin()`).
+    origin = None
+    ndc_origin = None
+
+    # Data normalization on the GPU (see `_init_gpu_bounds()`).
+    gpu_bounds = False
+    gpu_bounds_index = None
+    data_origin = None
+
+    # Whether the visual is drawn in the picking pass of the canvas (see `enable_picking()`).
+    picking = False
+
     def __init__(self):
         self.gl_primitive_type = None
         self.transforms = TransformChain()  # CPU transforms for data normalization.
@@ -84,11 +132,59 @@ class BaseVisual(object):
         self.program = None
         self._acc = BatchAccumulator()
         self.index_buffer = None
+        # Vertex offsets of the independent primitives drawn with a single draw call.
+        self.segments = None
+        self._lazy_state = {}
+        # Arguments of the spatial index of the points, built on first use.
+        self._index_kwargs = None
+        self._spatial_index = None
 
     def emit_visual_set_data(self):
-        """Emit canvas.visual_set_data event after data has been set in the visual."""
+        """Emit canvas.visual_set_data event after data has been set in the visual.
+
+        In lazy mode, the event is emitted in the GUI thread when the queued program updates
+        are flushed.
+
+        """
+        if self._is_lazy():
+            self._lazy_state['_set_data'] = True
+            return
         emit('visual_set_data', self.canvas, self)
 
+    def _is_lazy(self):
+        return getattr(getattr(self, 'program', None), '_is_lazy', False)
+
+    def _set_state(self, **kwargs):
+        """Set attributes that the rendering depends on.
+
+        In lazy mode, they are only set when the queued program updates are flushed, so that
+        they remain consistent with the data on the GPU.
+
+        """
+        if self._is_lazy():
+            self._lazy_state.update(kwargs)
+        else:
+            self.__dict__.update(kwargs)
+
+    def _get_state(self, name):
+        """Return an attribute set with `_set_state()`, including the changes that are queued
+        in lazy mode."""
+        return self._lazy_state.get(name, getattr(self, name))
+
+    def flush(self):
+        """Apply the program updates and the state changes queued in lazy mode.
+
+        Must be called from the GUI thread, after lazy mode has been disabled.
+
+        """
+        assert not self._is_lazy()
+        self.program.flush()
+        state, self._lazy_state = self._lazy_state, {}
+        set_data = state.pop('_set_data', False)
+        self.__dict__.update(state)
+        if set_data:
+            self.emit_visual_set_data()
+
     # Visual definition
     # -------------------------------------------------------------------------
 
@@ -107,13 +203,234 @@ class BaseVisual(object):
         self.data_range = Range(data_range)
         self.transforms.add(self.data_range)
 
+    def set_compact(self, compact=True):
+        """Use the compact vertex layout at the next data update.
+
+        In this layout, colors are normalized uint8, indices are uint16 or uint32, positions
+        with a zero depth are 2D, and the attributes uploaded together are interleaved in a
+        single vertex buffer. This divides the number of bytes per vertex by two or more.
+
+        """
+        self.compact = compact
+
+    def set_origin(self, origin='auto'):
+        """Upload the positions relative to an origin, in NDC.
+
+        The positions are normalized in float64 on the CPU, and only their float32 offsets
+        relative to the origin are uploaded. PanZoom adds the float64 origin back to the pan
+        uniform, so that the precision does not depend on the absolute position of the data
+        (e.g. spike times late in a long recording), and panning does not require any upload.
+
+        With `'auto'`, every data update is a chunk with its own origin at its center.
+        `None` disables the offsets.
+
+        Only the x coordinate (the time axis) is offset: the y origin is always 0. The layouts
+        scale and shift the y coordinate of every box (e.g. `Stacked`) before the pan is
+        applied, so a y origin added back through the pan would be drawn at the wrong place.
+
+        """
+        self.origin = origin
+
+    def _get_origin(self, xy_min, xy_max):
+        """Return the origin in NDC of positions with the given bounding box, or None."""
+        if self.origin is None:
+            self._set_state(ndc_origin=None)
+            return None
+        if isinstance(self.origin, str) and self.origin == 'auto':
+            origin = .5 * (np.asarray(xy_min) + np.asarray(xy_max))
+        else:
+            origin = np.array(self.origin, dtype=np.float64)
+        assert origin.shape == (2,)
+        origin[1] = 0
+        self._set_state(ndc_origin=origin)
+        return origin
+
+    def _apply_origin(self, pos):
+        """Subtract the origin from `(n, 2+)` positions in NDC, before the float32 cast."""
+        if self.origin is None:
+            self._set_state(ndc_origin=None)
+            return pos
+        pos = np.array(pos, dtype=np.float64)
+        xy = pos[:, :2]
+        origin = self._get_origin(
+            *((xy.min(axis=0), xy.max(axis=0)) if len(xy) else (np.zeros(2), np.zeros(2))))
+        pos[:, :2] -= origin
+        return pos
+
+    def _init_gpu_bounds(self, index=None):
+        """Normalize the data on the GPU instead of with the CPU data range.
+
+        The positions are uploaded in data coordinates, relative to a float64 data origin at
+        the center of the data, whose position in NDC is added back by PanZoom as with
+        `set_origin()`. The affine normalization coefficients of the data bounds are fetched
+        from a small float texture at the GLSL variable `index` (e.g. `a_signal_index`), or from
+        a uniform if `index` is None. Changing the bounds (gain, offset, autoscaling) then only
+        uploads four floats per item, see `set_data_bounds()`.
+
+        Must be called in the constructor, before the visual is added to a canvas.
+
+        """
+        self.gpu_bounds = True
+        self.gpu_bounds_index = index
+        if index:
+            self.inserter.insert_vert('''
+                uniform sampler2D u_data_norm;
+                uniform float u_n_data_norm;
+            ''', 'header')
+            # Sample the center of the texel.
+            self.inserter.insert_vert(
+                'vec4 data_norm = texture2D(u_data_norm, vec2(({} + .5) / u_n_data_norm, .5));'
+                .format(index), 'before_transforms')
+        else:
+            self.inserter.insert_vert('uniform vec4 u_data_norm;', 'header')
+            self.inserter.insert_vert('vec4 data_norm = u_data_norm;', 'before_transforms')
+        self.inserter.insert_vert(
+            '{{varout}} = {{varout}} * data_norm.xy + data_norm.zw;', 'before_transforms')
+        # Keep the original position in normalized coordinates, as with the CPU data range.
+        if 'gl_Position = transform(' in self.vertex_shader:
+            self.inserter.insert_vert(
+                'pos_orig = pos_orig * data_norm.xy + data_norm.zw;', 'before_transforms')
+
+    def _apply_data_origin(self, pos, data_bounds):
+        """Subtract the data origin from `(n, 2+)` positions in data coordinates, before the
+        float32 cast, and upload the corresponding data normalization."""
+        data_bounds = np.atleast_2d(np.asarray(data_bounds, dtype=np.float64))
+        if not len(data_bounds):
+            return pos
+        pos = np.array(pos, dtype=np.float64)
+        xy = pos[:, :2]
+        origin = .5 * (xy.min(axis=0) + xy.max(axis=0)) if len(xy) else np.zeros(2)
+        origin = self._set_data_origin(origin, data_bounds)
+        pos[:, :2] -= origin
+        return pos
+
+    def _set_data_origin(self, origin, data_bounds):
+        """Set the data origin of the positions, upload the data normalization, and return
+        the data origin.
+
+        As with `set_origin()`, only the x coordinate is offset in NDC: the y coordinate of the
+        data origin is the one normalized to 0 with the bounds of the first item.
+
+        """
+        scale, shift = _range_affine(data_bounds[:1], self.data_range.to_bounds)
+        origin = np.array(origin, dtype=np.float64)
+        origin[1] = -shift[0, 1] / scale[0, 1]
+        # Position of the data origin in NDC, with the bounds of the first item.
+        ndc_origin = np.array([scale[0, 0] * origin[0] + shift[0, 0], 0.])
+        self._set_state(data_origin=origin, ndc_origin=ndc_origin)
+        self._upload_data_norm(data_bounds, origin, ndc_origin)
+        return origin
+
+    def _upload_data_norm(self, data_bounds, origin, ndc_origin):
+        """Upload the `(scale, shift)` coefficients normalizing the data bounds, for positions
+        relative to the data origin, and relative to the NDC origin after normalization."""
+        scale, shift = _range_affine(data_bounds, self.data_range.to_bounds)
+        shift = scale * origin + shift - ndc_origin
+        norm = np.c_[scale, shift].astype(np.float32)
+        if not self.gpu_bounds_index:
+            assert len(norm) == 1
+            self.program['u_data_norm'] = tuple(norm[0])
+            return
+        if len(norm) != getattr(self, '_n_data_norm', None):
+            # New float texture, otherwise the existing one is updated in place.
+            self._n_data_norm = len(norm)
+            norm = norm[np.newaxis, ...].view(gloo.TextureFloat2D)
+        self.program['u_data_norm'] = norm
+        self.program['u_n_data_norm'] = float(self._n_data_norm)
+
+    def set_data_bounds(self, data_bounds):
+        """Change the data bounds, without uploading the data again.
+
+        Only available when the data is normalized on the GPU. The origins of the last
+        `set_data()` are kept.
+
+        """
+        assert self.gpu_bounds
+        assert self.data_origin is not None
+        data_bounds = np.atleast_2d(np.asarray(data_bounds, dtype=np.float64))
+        assert data_bounds.shape[1] == 4
+        self._upload_data_norm(data_bounds, self.data_origin, self.ndc_origin)
+
+    def enable_picking(self):
+        """Draw the visual in the picking pass of the canvas, see `BaseCanvas.pick()`.
+
+        In this pass, the fragments write the picking id of their vertex, set with
+        `set_pick_ids()`, instead of their color. Must be called in the constructor, before the
+        visual is added to a canvas.
+
+        """
+        self.picking = True
+        self.inserter.insert_vert('attribute vec4 a_pick_id;', 'header')
+        self.inserter.add_varying('vec4', 'v_pick_id', 'a_pick_id')
+        self.inserter.insert_frag('uniform float u_picking;', 'header')
+        self.inserter.insert_frag('''
+            if (u_picking > 0.5) {
+                // Only the mostly opaque part of the primitive can be picked.
+                if (gl_FragColor.a < 0.5) discard;
+                gl_FragColor = v_pick_id;
+            }
+        ''', 'end')
+
+    def set_pick_ids(self, ids):
+        """Set the picking id of every vertex, a non-negative integer below `2 ** 32 - 1`.
+
+        The ids are packed in the four bytes of an RGBA color, 0 being the background.
+
+        """
+        assert self.picking
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        assert len(ids) == self._get_state('n_vertices')
+        rgba = (ids + 1).astype('<u4').view(np.uint8).reshape((-1, 4))
+        self.set_vertex_data(a_pick_id=rgba if self.compact else rgba / 255.)
+
+    def _pack_attribute(self, name, value):
+        """Convert an attribute to its compact representation."""
+        if name in self._color_attributes:
+            return _pack_color(value)
+        if name in self._index_attributes:
+            return _pack_index(value)
+        value = np.asarray(value, dtype=np.float32)
+        # The GPU sets the missing z coordinate to 0.
+        if name == 'a_position' and value.ndim == 2 and value.shape[1] == 3:
+            if not value[:, 2].any():
+                value = value[:, :2]
+        return value
+
+    def set_vertex_data(self, **attributes):
+        """Upload per-vertex attributes, passed as `(n_vertices, k)` arrays.
+
+        Every attribute is uploaded in its own float32 buffer, unless the visual is compact.
+
+        """
+        if not self.compact:
+            for name, value in attributes.items():
+                self.program[name] = np.asarray(value, dtype=np.float32)
+            return
+        packed = {name: self._pack_attribute(name, value) for name, value in attributes.items()}
+        self.set_vertex_array(_interleave(**packed))
+
+    def _vertex_array(self, n, **formats):
+        """Allocate `n` interleaved vertices, with the attributes given as
+        `name=(dtype, n_components)`, to be filled in place and uploaded with
+        `set_vertex_array()`."""
+        return np.empty(n, dtype=_vertex_dtype(**formats))
+
+    def set_vertex_array(self, vertices):
+        """Upload a structured array of interleaved vertices, whose field names are the
+        attribute names.
+
+        The vertex buffer is a view of the array: it is not copied before the upload.
+
+        """
+        self.program.bind(vertices.view(gloo.VertexBuffer))
+
     def on_draw(self):
         """Draw the visual."""
         # Skip the drawing if the program hasn't been built yet.
         # The program is built by the layout.
         if self.program is not None:
             # Draw the program.
-            self.program.draw(self.gl_primitive_type, self.index_buffer)
+            self.program.draw(self.gl_primitive_type, self.index_buffer, segments=self.segments)
         else:  # pragma: no cover
             logger.debug("Skipping drawing visual `%s` because the program "
                          "has not been built yet.", self)
@@ -129,15 +446,15 @@ class BaseVisual(object):
 
     def hide(self):
         """Hide the visual."""
-        self._hidden = True
+        self._set_state(_hidden=True)
 
     def show(self):
         """Show the visual."""
-        self._hidden = False
+        self._set_state(_hidden=False)
 
     def toggle(self):
         """Toggle the visual visibility."""
-        self._hidden = not self._hidden
+        self._set_state(_hidden=not self._get_state('_hidden'))
 
     def close(self):
         """Close the visual."""
@@ -188,7 +505,7 @@ class BaseVisual(object):
         """Set the visual's box index. This is used by layouts (e.g. subplot indices)."""
         # data is the output of validate_data. This is used by the child class TextVisual.
         assert box_index is not None
-        n = self.n_vertices
+        n = self._get_state('n_vertices')
         if not isinstance(box_index, np.ndarray):
             k = len(box_index)
             a_box_index = _get_array(box_index, (n, k))
@@ -198,7 +515,36 @@ class BaseVisual(object):
             a_box_index = np.c_[a_box_index.ravel()]
         assert a_box_index.ndim == 2
         assert a_box_index.shape[0] == n
-        self.program['a_box_index'] = a_box_index.astype(np.float32)
+        self.set_vertex_data(a_box_index=a_box_index)
+        if self._index_kwargs is not None:
+            self._index_kwargs = dict(self._index_kwargs, box_index=a_box_index)
+            self._spatial_index = None
+
+    # Spatial index
+    # -------------------------------------------------------------------------
+
+    def set_spatial_index(self, pos, data_bounds=None):
+        """Set the positions of the points used for lasso selections (see `SpatialIndex`).
+
+        This is called by `set_data()` in visuals made of points. The index is only built
+        the first time `spatial_index` is accessed, for example in the background thread
+        of a lasso query.
+
+        """
+        self._index_kwargs = dict(pos=pos, data_bounds=data_bounds)
+        self._spatial_index = None
+
+    @property
+    def spatial_index(self):
+        """Spatial index of the points of the visual, or None."""
+        kwargs = self._index_kwargs
+        if self._spatial_index is None and kwargs is not None:
+            index = SpatialIndex(**kwargs)
+            # Do not keep the index if new data has been set in the meantime.
+            if kwargs is not self._index_kwargs:
+                return index
+            self._spatial_index = index
+        return self._spatial_index
 
 
 #------------------------------------------------------------------------------
@@ -487,21 +833,158 @@ class LazyProgram(gloo.Program):
     should always be sent from the main GUI thread.
 
     """
+    # Set by `BaseCanvas.enable_profiler()` to record the data set to the program.
+    _profiler = None
+    _profile_name = ''
+
     def __init__(self, *args, **kwargs):
         self._update_queue = []
+        self._update_lock = Lock()
         self._is_lazy = False
         super(LazyProgram, self).__init__(*args, **kwargs)
 
     def __setitem__(self, name, data):
         # Remove all past items with the current name.
         if self._is_lazy:
-            self._update_queue[:] = ((n, d) for (n, d) in self._update_queue if n != name)
-            self._update_queue.append((name, data))
+            with self._update_lock:
+                self._update_queue[:] = (
+                    (n, d) for (n, d) in self._update_queue if n != name)
+                self._update_queue.append((name, data))
+        else:
+            self.set_immediate(name, data)
+
+    def set_immediate(self, name, data):
+        """Update a variable right away, even in lazy mode.
+
+        This is used by interactions (e.g. pan and zoom), which must not wait for the data
+        being prepared in a background thread.
+
+        """
+        if self._profiler is not None:
+            return self._set_profiled(name, data)
+        try:
+            super(LazyProgram, self).__setitem__(name, data)
+        except IndexError:
+            pass
+
+    def _set_profiled(self, name, data):
+        start = default_timer()
+        try:
+            super(LazyProgram, self).__setitem__(name, data)
+        except IndexError:
+            return
+        self._profiler.record_set(
+            '%s.%s' % (self._profile_name, name), getattr(data, 'nbytes', 0),
+            default_timer() - start)
+
+    def pop_update(self):
+        """Remove and return the oldest queued update `(name, data)`, or None."""
+        with self._update_lock:
+            return self._update_queue.pop(0) if self._update_queue else None
+
+    def flush(self):
+        """Apply all queued updates."""
+        with self._update_lock:
+            queue, self._update_queue = self._update_queue, []
+        for name, data in queue:
+            self.set_immediate(name, data)
+
+
+def _clone_shader(shader):
+    """Return an uncompiled copy of a shader object, sharing its preprocessed and parsed code."""
+    clone = copy.copy(shader)
+    gloo.GLObject.__init__(clone)
+    clone._target = shader._target
+    clone._snippets = {}
+    clone._parsed = dict(shader._parsed)
+    clone._program = None
+    return clone
+
+
+class ProgramCache(object):
+    """Process-wide cache of the shaders of the visual programs, keyed by a hash of their final
+    GLSL source code.
+
+    Views create many visuals with the same final source code (e.g. the axes of every view).
+    Their shaders are preprocessed and parsed only once. Within a canvas, which has its own
+    OpenGL context, they are also compiled only once, and every program just links them.
+
+    The `hits` and `misses` counters count the requested programs whose source code was already
+    in the cache, or not.
+
+    """
+    def __init__(self):
+        self._shaders = {}  # source hash: (vertex, fragment, geometry) parsed shaders
+        self._compiled = weakref.WeakKeyDictionary()  # context: {source hash: shaders}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._shaders)
+
+    def clear(self):
+        """Empty the cache and reset the counters."""
+        self._shaders.clear()
+        self._compiled.clear()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def source_hash(vertex, fragment, geometry=None, geometry_args=()):
+        """Hash of the final GLSL source code of a program."""
+        h = hashlib.sha1()
+        for s in (vertex, fragment, geometry or '', repr(tuple(geometry_args))):
+            h.update(s.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _create_shaders(self, vertex, fragment, geometry, geometry_args):
+        shaders = (
+            gloo.VertexShader(vertex), gloo.FragmentShader(fragment),
+            gloo.GeometryShader(geometry, *geometry_args) if geometry else None)
+        # Parse the code once, the parsed output is copied in the shaders of every context.
+        for shader in shaders:
+            if shader is not None:
+                shader.hooks, shader.uniforms, shader.attributes
+        return shaders
+
+    def get_shaders(self, vertex, fragment, geometry=None, geometry_args=(), context=None):
+        """Return the `(vertex, fragment, geometry)` shader objects of a program.
+
+        Parameters
+        ----------
+
+        vertex : str
+            Final GLSL code of the vertex shader.
+        fragment : str
+            Final GLSL code of the fragment shader.
+        geometry : str
+            Final GLSL code of the geometry shader, if any.
+        geometry_args : tuple
+            `(vertices_out, input_type, output_type)` arguments of the geometry shader.
+        context : object
+            Object that owns the OpenGL context of the program, typically the canvas. The
+            shader objects are shared by all programs with the same context, and must not be
+            modified (e.g. with gloo snippets). They are new, uncompiled objects if None.
+
+        """
+        key = self.source_hash(vertex, fragment, geometry, geometry_args)
+        if key in self._shaders:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._shaders[key] = self._create_shaders(vertex, fragment, geometry, geometry_args)
+        if context is None:
+            compiled = {}
         else:
-            try:
-                super(LazyProgram, self).__setitem__(name, data)
-            except IndexError:
-                pass
+            compiled = self._compiled.setdefault(context, {})
+        if key not in compiled:
+            compiled[key] = tuple(
+                _clone_shader(shader) if shader is not None else None
+                for shader in self._shaders[key])
+        return compiled[key]
+
+
+program_cache = ProgramCache()
 
 
 class BaseCanvas(QOpenGLWindow):
@@ -521,6 +1004,13 @@ class BaseCanvas(QOpenGLWindow):
         self._size = (0, 0)
         self._is_lazy = False
 
+        # Profiling.
+        self.profiler = None
+        self._profiler_sync = True
+        self._profiled_visual = ''
+        self._hud = None
+        self._hud_time = 0.
+
         # Events.
         self._attached = []
         self._mouse_press_position = None
@@ -549,16 +1039,26 @@ class BaseCanvas(QOpenGLWindow):
     # Queue
     # ---------------------------------------------------------------------------------------------
 
-    def set_lazy(self, lazy):
+    def set_lazy(self, lazy, visuals=None):
         """When the lazy mode is enabled, all OpenGL calls are deferred. Use with
         multithreading.
 
         Must be called *after* the visuals have been added, but *before* set_data().
+        The queued updates are applied at the next frame once the lazy mode is disabled.
+
+        Parameters
+        ----------
+
+        lazy : boolean
+        visuals : list
+            Only change the mode of these visuals (all visuals by default).
 
         """
-        self._is_lazy = lazy
-        for visual in self.visuals:
-            visual.visual.program._is_lazy = lazy
+        if visuals is None:
+            self._is_lazy = lazy
+            visuals = [v.visual for v in self.visuals]
+        for visual in visuals:
+            visual.program._is_lazy = lazy
 
     # Visuals
     # ---------------------------------------------------------------------------------------------
@@ -629,12 +1129,13 @@ class BaseCanvas(QOpenGLWindow):
 
         # Geometry shader, if there is one.
         gs = getattr(visual, 'geometry_shader', None)
-        if gs:
-            gs = gloo.GeometryShader(
-                gs, visual.geometry_count, visual.geometry_in, visual.geometry_out)
+        gs_args = (
+            (visual.geometry_count, visual.geometry_in, visual.geometry_out) if gs else ())
 
-        # Finally, we create the visual's program.
-        visual.program = LazyProgram(vs, fs, gs)
+        # Finally, we create the visual's program, with the shaders already compiled in this
+        # canvas for the same source code.
+        visual.program = LazyProgram(
+            *program_cache.get_shaders(vs, fs, gs, gs_args, context=self))
         logger.log(5, "Vertex shader: %s", vs)
         logger.log(5, "Fragment shader: %s", fs)
 
@@ -642,6 +1143,8 @@ class BaseCanvas(QOpenGLWindow):
         visual.on_resize(self.size().width(), self.size().height())
         # Register the visual in the list of visuals in the canvas.
         self.visuals.append(Bunch(visual=visual, **kwargs))
+        if self.profiler is not None:
+            self._profile_visual(self.visuals[-1], len(self.visuals) - 1)
         emit('visual_added', self, visual)
         return visual
 
@@ -655,9 +1158,164 @@ class BaseCanvas(QOpenGLWindow):
     def iter_update_queue(self):
         """Iterate through all OpenGL program updates called in lazy mode."""
         for v in self.visuals:
-            while v.visual.program._update_queue:
-                name, data = v.visual.program._update_queue.pop(0)
-                yield v.visual.program, name, data
+            program = v.visual.program
+            for name, data in iter(program.pop_update, None):
+                yield program, name, data
+
+    def flush_update_queue(self):
+        """Apply the updates queued by the visuals that are no longer in lazy mode."""
+        for v in self.visuals:
+            visual = v.visual
+            if not visual._is_lazy() and (visual.program._update_queue or visual._lazy_state):
+                visual.flush()
+
+    # Picking
+    # ---------------------------------------------------------------------------------------------
+
+    def _pick_framebuffer(self):
+        """Offscreen framebuffer of a single RGBA pixel, used for picking."""
+        if getattr(self, '_pick_fbo', None) is None:
+            texture = np.zeros((1, 1, 4), dtype=np.uint8).view(gloo.Texture2D)
+            self._pick_fbo = gloo.FrameBuffer(color=[texture])
+        return self._pick_fbo
+
+    def pick(self, pos):
+        """Return `(visual, pick_id)` for the topmost visual drawn at a position in pixels,
+        among the visuals with picking enabled, or None.
+
+        The pickable visuals are drawn with their picking ids as colors (see
+        `BaseVisual.set_pick_ids()`) in an offscreen framebuffer covering only the pixel under
+        the position, which is then read back. The cost on the CPU side does not depend on the
+        number of vertices.
+
+        """
+        visuals = [
+            v.visual for v in self.visuals
+            if v.visual.picking and not v.visual._hidden and v.visual.n_vertices > 0]
+        if not visuals:
+            return None
+        self.makeCurrent()
+        self.flush_update_queue()
+        # Position of the pixel in the framebuffer, whose origin is at the bottom left.
+        ratio = self.devicePixelRatio()
+        w, h = self.get_size()
+        w, h = int(round(w * ratio)), int(round(h * ratio))
+        x = int(np.clip(pos[0] * ratio, 0, w - 1))
+        y = int(np.clip(h - 1 - pos[1] * ratio, 0, h - 1))
+
+        viewport = gl.glGetIntegerv(gl.GL_VIEWPORT)
+        fbo = self._pick_framebuffer()
+        fbo.activate()
+        out = None
+        try:
+            # The viewport is shifted so that the only pixel of the framebuffer is (x, y).
+            gl.glViewport(-x, -y, w, h)
+            gl.glDisable(gl.GL_BLEND)
+            for visual in visuals:
+                gl.glClearColor(0, 0, 0, 0)
+                gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+                visual.program.set_immediate('u_picking', 1.)
+                visual.on_draw()
+                visual.program.set_immediate('u_picking', 0.)
+                pixel = gl.glReadPixels(0, 0, 1, 1, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)
+                pick_id = int(np.frombuffer(pixel, dtype=np.uint8)[:4].view('<u4')[0])
+                if pick_id:
+                    out = (visual, pick_id - 1)
+        finally:
+            fbo.deactivate()
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.defaultFramebufferObject())
+            gl.glViewport(*viewport)
+            gl.glEnable(gl.GL_BLEND)
+            self.doneCurrent()
+        if out is not None:
+            logger.debug("Picked id %d in visual %s.", out[1], out[0])
+        return out
+
+    # Profiling
+    # ---------------------------------------------------------------------------------------------
+
+    def _profile_visual(self, v, index):
+        program = v.visual.program
+        program._profiler = self.profiler
+        program._profile_name = v.get('key', None) or '%s%d' % (
+            v.visual.__class__.__name__, index)
+
+    def enable_profiler(self, n_frames=120, cprofile=False, sync=True):
+        """Record the frame timings, the bytes set and uploaded to the GPU, and the number of
+        vertices of every visual.
+
+        The statistics are available with `canvas.profiler.stats()`, and can be exported with
+        `canvas.profiler.to_json(path)`.
+
+        Parameters
+        ----------
+
+        n_frames : int
+            Number of frames in the rolling window.
+        cprofile : boolean
+            Whether to also profile the Python functions called during the frames.
+        sync : boolean
+            Whether to wait for the GPU at the end of every frame, so that the frame duration
+            includes the time spent by the GPU.
+
+        """
+        from utils.profiling import FrameProfiler
+        self.profiler = FrameProfiler(n_frames=n_frames, cprofile=cprofile)
+        self._profiler_sync = sync
+        for i, v in enumerate(self.visuals):
+            self._profile_visual(v, i)
+        return self.profiler
+
+    def disable_profiler(self):
+        """Stop recording the frame statistics and remove the heads-up display."""
+        if self._hud is not None:
+            self.remove(self._hud)
+            self._hud = None
+        self.profiler = None
+        for v in self.visuals:
+            v.visual.program._profiler = None
+
+    def toggle_hud(self):
+        """Toggle the heads-up display with the frame statistics.
+
+        The profiler is enabled the first time the display is shown.
+
+        """
+        if self._hud is None:
+            from .visuals import TextVisual
+            if self.profiler is None:
+                self.enable_profiler()
+            self._hud = TextVisual(color=(1., 1., 0., 1.))
+            # The display is not affected by the interacts and layouts.
+            self.add_visual(
+                self._hud, clearable=False, exclude_origins=tuple(self._attached), key='hud')
+            self._hud.set_data(pos=[[-1, 1]], text=['profiling...'], anchor=[[1, -1]])
+        else:
+            self._hud.toggle()
+        self.update()
+
+    def _update_hud(self):
+        """Refresh the heads-up display twice per second."""
+        if self._hud is None or self._hud._hidden or default_timer() - self._hud_time < .5:
+            return
+        self._hud_time = default_timer()
+        lines = _format_frame_stats(self.profiler.stats())
+        n = len(lines)
+        self._hud.set_data(
+            pos=np.tile([[-1., 1.]], (n, 1)), text=lines,
+            anchor=[[1., -1. - 2 * i] for i in range(n)])
+
+    def _record_upload(self, buffer, nbytes, duration):
+        self.profiler.record_upload(self._profiled_visual or 'canvas', nbytes, duration)
+
+    def _draw_profiled(self, visual):
+        """Draw a visual and record the duration, the GPU uploads and the number of vertices."""
+        name = visual.program._profile_name
+        self._profiled_visual = name
+        with self.profiler.section('draw'):
+            visual.on_draw()
+        self._profiled_visual = ''
+        self.profiler.record_visual(name, visual.n_vertices)
 
     # OpenGL methods
     # ---------------------------------------------------------------------------------------------
@@ -677,6 +1335,10 @@ class BaseCanvas(QOpenGLWindow):
 
     def paintGL(self):
         """Draw all visuals."""
+        prof = self.profiler
+        if prof is not None:
+            prof.start_frame()
+            gloo_buffer.upload_hook = self._record_upload
         try:
             gloo.clear()
             size = self.get_size()
@@ -684,6 +1346,12 @@ class BaseCanvas(QOpenGLWindow):
             for f in self._next_paint_callbacks:
                 f()
             self._next_paint_callbacks.clear()
+            # Apply the program updates prepared in background threads.
+            if prof is None:
+                self.flush_update_queue()
+            else:
+                with prof.section('flush'):
+                    self.flush_update_queue()
             # Draw all visuals, clearable first, non clearable last.
             visuals = [v for v in self.visuals if v.get('clearable', True)]
             visuals += [v for v in self.visuals if not v.get('clearable', True)]
@@ -695,12 +1363,24 @@ class BaseCanvas(QOpenGLWindow):
                 # Do not draw if there are no vertices.
                 if not visual._hidden and visual.n_vertices > 0 and size[0] > 10 and size[1] > 10:
                     logger.log(5, "Draw visual `%s`.", visual)
-                    visual.on_draw()
+                    if prof is None:
+                        visual.on_draw()
+                    else:
+                        self._draw_profiled(visual)
             self._size = size
+            if prof is not None and self._profiler_sync:
+                # Wait for the GPU, so that the frame duration includes the drawing.
+                with prof.section('gpu'):
+                    gl.glFinish()
         except Exception as e:  # pragma: no cover
             # raise e
             logger.debug("Exception in paintGL: %s", str(e))
             return
+        finally:
+            if prof is not None:
+                gloo_buffer.upload_hook = None
+                prof.end_frame()
+                self._update_hud()
 
     # Events
     # ---------------------------------------------------------------------------------------------
@@ -849,11 +1529,11 @@ class BaseLayout(object):
         self.canvas = canvas
         canvas.layout = self
         canvas.attach_events(self)
+        connect(self._on_visual_set_data, event='visual_set_data', sender=canvas)
 
-        @connect(sender=canvas)
-        def on_visual_set_data(sender, visual):
-            if canvas.has_visual(visual):
-                self.update_visual(visual)
+    def _on_visual_set_data(self, sender, visual):
+        if sender.has_visual(visual):
+            self.update_visual(visual)
 
     @contextmanager
     def swap_active_box(self, box):
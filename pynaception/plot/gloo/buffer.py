@@ -22,6 +22,7 @@ Read more on buffer objects on `OpenGL Wiki
 """
 
 import logging
+from timeit import default_timer
 
 import numpy as np
 
@@ -32,6 +33,66 @@ from .globject import GLObject
 
 log = logging.getLogger(__name__)
 
+# Function called with `(buffer, nbytes, duration)` after each upload to the GPU, or None.
+# It is only set while a canvas with an enabled profiler draws a frame.
+upload_hook = None
+
+
+def _capacity(nbytes):
+    """Smallest power of two that is larger than a number of bytes."""
+    return 1 << max(0, int(nbytes) - 1).bit_length()
+
+
+class BufferStorage(object):
+    """
+    Storage of a buffer on the GPU, which may be shared by successive CPU buffers.
+
+    The capacity of the storage is a power of two, so that data of a similar size
+    reuses the same GPU buffer instead of reallocating it. A full rewrite orphans the
+    storage, so that the driver does not wait for the frames still using the old data,
+    and a partial update only uploads the modified range.
+    """
+
+    def __init__(self, target, usage=gl.GL_DYNAMIC_DRAW):
+        self.target = target
+        self.usage = usage
+        self.handle = -1
+        self.capacity = 0
+
+    def create(self):
+        """ Create the buffer on GPU if needed """
+
+        if self.handle < 0:
+            self.handle = gl.glGenBuffers(1)
+            self.capacity = 0
+        return self.handle
+
+    def delete(self):
+        """ Delete the buffer from GPU """
+
+        if self.handle > -1:
+            gl.glDeleteBuffers(1, np.array([self.handle]))
+        self.handle = -1
+        self.capacity = 0
+
+    def upload(self, data, offset=0, size=None):
+        """
+        Upload the bytes `data[offset:offset + size]` of a CPU buffer to the bound buffer.
+        """
+
+        nbytes = data.nbytes
+        size = nbytes - offset if size is None else size
+        if nbytes > self.capacity or 4 * nbytes < self.capacity:
+            # Grow the storage, or shrink it if it is much too large. The new storage is
+            # undefined, so that the whole buffer is uploaded.
+            self.capacity = _capacity(nbytes)
+            gl.glBufferData(self.target, self.capacity, None, self.usage)
+            offset, size = 0, nbytes
+        elif offset == 0 and size == nbytes:
+            # Orphan the storage before a full rewrite.
+            gl.glBufferData(self.target, self.capacity, None, self.usage)
+        gl.glBufferSubData(self.target, offset, size, data[offset:offset + size])
+
 
 class Buffer(GPUData, GLObject):
     """
@@ -39,12 +100,31 @@ class Buffer(GPUData, GLObject):
 
     A generic buffer is an interface used to upload data to a GPU array buffer
     (gl.GL_ARRAY_BUFFER or gl.GL_ELEMENT_ARRAY_BUFFER).
+
+    The GPU storage of the buffer is a `BufferStorage`, which can be passed on to another
+    buffer with the same layout with `set_storage()`, so that the new data reuses the
+    GPU buffer of the old one.
     """
 
     def __init__(self, target, usage=gl.GL_DYNAMIC_DRAW):
         GLObject.__init__(self)
         self._target = target
         self._usage = usage
+        self._storage = None
+
+    @property
+    def storage(self):
+        """ GPU storage of the buffer """
+
+        if getattr(self, '_storage', None) is None:
+            self._storage = BufferStorage(self._target, self._usage)
+        return self._storage
+
+    def set_storage(self, storage):
+        """ Use an existing GPU storage, for example the one of a previous buffer """
+
+        if self._handle < 0:
+            self._storage = storage
 
     @property
     def need_update(self):
@@ -55,17 +135,13 @@ class Buffer(GPUData, GLObject):
     def _create(self):
         """ Create buffer on GPU """
 
-        self._handle = gl.glGenBuffers(1)
-        self._activate()
+        self._handle = self.storage.create()
         log.log(5, "GPU: Creating buffer (id=%d)" % self._id)
-        gl.glBufferData(self._target, self.nbytes, None, self._usage)
-        self._deactivate()
 
     def _delete(self):
         """ Delete buffer from GPU """
 
-        if self._handle > -1:
-            gl.glDeleteBuffers(1, np.array([self._handle]))
+        self.storage.delete()
 
     def _activate(self):
         """ Bind the buffer to some target """
@@ -86,8 +162,13 @@ class Buffer(GPUData, GLObject):
             start, stop = self.pending_data
             offset, nbytes = start, stop - start
             # offset, nbytes = self.pending_data
-            data = self.ravel().view(np.ubyte)[offset:offset + nbytes]
-            gl.glBufferSubData(self.target, offset, nbytes, data)
+            data = self.ravel().view(np.ubyte)
+            if upload_hook is None:
+                self.storage.upload(data, offset, nbytes)
+            else:
+                start = default_timer()
+                self.storage.upload(data, offset, nbytes)
+                upload_hook(self, nbytes, default_timer() - start)
         self._pending_data = None
         self._need_update = False
 
@@ -92,6 +92,8 @@ class Program(GLObject):
 
         self._uniforms = {}
         self._attributes = {}
+        # GPU storage of the vertex buffers, by tuple of attribute names.
+        self._storages = {}
 
         # Build hooks, uniforms and attributes
         self._build_hooks()
@@ -218,21 +220,25 @@ class Program(GLObject):
                 if shader.handle in attached:
                     gl.glDetachShader(program, shader.handle)
                 shader.activate()
-                if isinstance(shader, GeometryShader):
-                    if shader.vertices_out is not None:
-                        gl.glProgramParameteriEXT(self._handle,
-                                                  gl.GL_GEOMETRY_VERTICES_OUT_EXT,
-                                                  shader.vertices_out)
-                    if shader.input_type is not None:
-                        gl.glProgramParameteriEXT(self._handle,
-                                                  gl.GL_GEOMETRY_INPUT_TYPE_EXT,
-                                                  shader.input_type)
-                    if shader.output_type is not None:
-                        gl.glProgramParameteriEXT(self._handle,
-                                                  gl.GL_GEOMETRY_OUTPUT_TYPE_EXT,
-                                                  shader.output_type)
-                gl.glAttachShader(program, shader.handle)
-                shader._program = self
+            elif shader.handle in attached:
+                continue
+            # NOTE: a shader may have been compiled for another program in the same context,
+            # it just needs to be attached to this one.
+            if isinstance(shader, GeometryShader):
+                if shader.vertices_out is not None:
+                    gl.glProgramParameteriEXT(self._handle,
+                                              gl.GL_GEOMETRY_VERTICES_OUT_EXT,
+                                              shader.vertices_out)
+                if shader.input_type is not None:
+                    gl.glProgramParameteriEXT(self._handle,
+                                              gl.GL_GEOMETRY_INPUT_TYPE_EXT,
+                                              shader.input_type)
+                if shader.output_type is not None:
+                    gl.glProgramParameteriEXT(self._handle,
+                                              gl.GL_GEOMETRY_OUTPUT_TYPE_EXT,
+                                              shader.output_type)
+            gl.glAttachShader(program, shader.handle)
+            shader._program = self
 
     def _build_hooks(self):
         """ Build hooks """
@@ -298,7 +304,9 @@ class Program(GLObject):
         if isinstance(data, (VertexBuffer, VertexArray)):
             for name in data.dtype.names:
                 if name in self._attributes.keys():
-                    self._attributes[name].set_data(data.ravel()[name])
+                    # NOTE: go through __setitem__() so that derived classes
+                    # (e.g. lazy programs) see the update.
+                    self[name] = data.ravel()[name]
 
     def __setitem__(self, name, data):
         vhooks = self._vert_hooks.keys()
@@ -336,10 +344,27 @@ class Program(GLObject):
             self._uniforms[name].set_data(data)
         elif name in self._attributes.keys():
             self._attributes[name].set_data(data)
+            self._use_storage(self._attributes[name].data)
         else:
             raise IndexError(
                 "Unknown item %s (no corresponding hook, uniform or attribute)" % name)
 
+    def _use_storage(self, buffer):
+        """
+        Reuse the GPU storage of the previous vertex buffer with the same attributes,
+        so that successive updates of an attribute do not reallocate GPU memory.
+        """
+
+        if not isinstance(buffer, VertexBuffer):
+            return
+        # The fields of an interleaved buffer share the storage of the whole buffer.
+        if isinstance(buffer.base, VertexBuffer):
+            buffer = buffer.base
+        key = buffer.dtype.names
+        if key in self._storages:
+            buffer.set_storage(self._storages[key])
+        self._storages[key] = buffer.storage
+
     def __getitem__(self, name):
         if name in self._vert_hooks.keys():
             return self._vert_hooks[name]
@@ -574,7 +599,7 @@ class Program(GLObject):
         return 0
 
     # first=0, count=None):
-    def draw(self, mode=None, indices=None):
+    def draw(self, mode=None, indices=None, segments=None):
         """ Draw using the specified mode & indices.
 
         :param gl.GLEnum mode:
@@ -589,6 +614,11 @@ class Program(GLObject):
 
         :param IndexBuffer|None indices:
             Vertex indices to be drawn. If none given, everything is drawn.
+
+        :param array|None segments:
+            Offsets of consecutive groups of vertices, the last one being the number of
+            vertices. Each group is drawn as a separate primitive (e.g. one line strip per
+            signal) with a single call to glMultiDrawArrays.
         """
 
         if isinstance(mode, str):
@@ -610,10 +640,16 @@ class Program(GLObject):
                        np.dtype(np.uint32): gl.GL_UNSIGNED_INT}
             gl.glDrawElements(mode, indices.size, gltypes[indices.dtype], None)
             indices.deactivate()
+        elif segments is not None:
+            segments = np.asarray(segments, dtype=np.int32)
+            first, counts = segments[:-1], np.diff(segments)
+            gl.glMultiDrawArrays(mode, first, counts, len(counts))
         else:
             first = 0
             # count = (self._count or attributes[0].size) - first
-            count = len(tuple(attributes)[0])
+            # NOTE: generic attributes hold a single value for all vertices, and attributes
+            # that are computed in the shader may have no data at all.
+            count = max([len(a) for a in attributes if not a._generic] or [0])
             gl.glDrawArrays(mode, first, count)
 
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
@@ -106,6 +106,8 @@ class Shader(GLObject):
         self._hooked = self._code
         self._need_update = True
         self._program = None
+        # Parsed hooks, uniforms and attributes, as long as no snippet is set.
+        self._parsed = {}
 
     def __setitem__(self, name, snippet):
         """
@@ -113,6 +115,7 @@ class Shader(GLObject):
         """
 
         self._snippets[name] = snippet
+        self._parsed = {}
 
     def _replace_hooks(self, name, snippet):
 
@@ -179,6 +182,7 @@ class Shader(GLObject):
         """ Reset shader snippets """
 
         self._snippets = {}
+        self._parsed = {}
 
     @property
     def code(self):
@@ -314,24 +318,32 @@ class Shader(GLObject):
         """ Shader hooks (place where snippets can be inserted) """
 
         # We get hooks from the original code, not the hooked one
-        code = remove_comments(self._hooked)
-        return get_hooks(code)
+        return self._parse('hooks', lambda: get_hooks(remove_comments(self._hooked)))
 
     @property
     def uniforms(self):
         """ Shader uniforms obtained from source code """
 
-        code = remove_comments(self.code)
         gtypes = Shader._gtypes
-        return [(n, gtypes[t]) for (n, t) in get_uniforms(code)]
+        return self._parse('uniforms', lambda: [
+            (n, gtypes[t]) for (n, t) in get_uniforms(remove_comments(self.code))])
 
     @property
     def attributes(self):
         """ Shader attributes obtained from source code """
 
-        code = remove_comments(self.code)
         gtypes = Shader._gtypes
-        return [(n, gtypes[t]) for (n, t) in get_attributes(code)]
+        return self._parse('attributes', lambda: [
+            (n, gtypes[t]) for (n, t) in get_attributes(remove_comments(self.code))])
+
+    def _parse(self, name, parse):
+        """ Parse the code only once if there are no snippets """
+
+        if self._snippets:
+            return parse()
+        if name not in self._parsed:
+            self._parsed[name] = parse()
+        return self._parsed[name]
 
 
 # ------------------------------------------------------ VertexShader class ---
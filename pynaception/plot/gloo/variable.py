@@ -96,6 +96,21 @@ gl_typeinfo = {
 }
 
 
+# ------------------------------------------------------- attribute formats ---
+# Numpy types that can feed a float attribute without conversion on the CPU.
+# The integer types are converted to float by the GPU, 8-bit types are
+# normalized to [0, 1] (or [-1, 1]), e.g. for packed RGBA colors.
+gl_attribute_types = {
+    np.dtype(np.float32): (gl.GL_FLOAT, gl.GL_FALSE),
+    np.dtype(np.uint8): (gl.GL_UNSIGNED_BYTE, gl.GL_TRUE),
+    np.dtype(np.int8): (gl.GL_BYTE, gl.GL_TRUE),
+    np.dtype(np.uint16): (gl.GL_UNSIGNED_SHORT, gl.GL_FALSE),
+    np.dtype(np.int16): (gl.GL_SHORT, gl.GL_FALSE),
+    np.dtype(np.uint32): (gl.GL_UNSIGNED_INT, gl.GL_FALSE),
+    np.dtype(np.int32): (gl.GL_INT, gl.GL_FALSE),
+}
+
+
 # ---------------------------------------------------------- Variable class ---
 class Variable(GLObject):
     """ A variable is an interface between a program and data """
@@ -354,7 +369,15 @@ class Attribute(Variable):
         # upload it later to GPU memory.
         else:  # lif not isinstance(data, VertexBuffer):
             name, base, count = self.dtype
-            data = np.array(data, dtype=base, copy=False)
+            data = np.asarray(data)
+            # Packed types are uploaded as is (see gl_attribute_types).
+            if data.dtype in gl_attribute_types:
+                base = data.dtype
+            # Fewer components than in the shader, e.g. a 2D position for a vec3: the GPU
+            # fills the missing components with 0 (and 1 for w).
+            if data.ndim == 2 and 0 < data.shape[1] < count:
+                count = data.shape[1]
+            data = np.ascontiguousarray(data, dtype=base)
             data = data.ravel().view([(name, base, (count,))])
             # WARNING : transform data with the right type
             # data = np.array(data,copy=False)
@@ -362,15 +385,38 @@ class Attribute(Variable):
 
         self._generic = False
 
+    def _pointer_format(self):
+        """ Number of components, GL type and normalization of the buffer data
+
+        The format is derived from the data rather than from the shader type, so
+        that a buffer may hold packed (e.g. uint8 colors) or interleaved records.
+        """
+
+        size, gtype, _ = gl_typeinfo[self._gtype]
+        dtype = self.data.dtype
+        if dtype.names:
+            # Record with a single (sub-array) field.
+            dtype = dtype.fields[dtype.names[0]][0]
+            shape = dtype.shape
+        else:
+            # Field view of an interleaved buffer.
+            shape = self.data.shape[1:]
+        dtype = dtype.base
+        if dtype not in gl_attribute_types:
+            return size, gtype, gl.GL_FALSE
+        size = int(np.prod(shape)) if shape else 1
+        gtype, normalized = gl_attribute_types[dtype]
+        return size, gtype, normalized
+
     def _activate(self):
         if isinstance(self.data, (VertexBuffer, VertexArray)):
             self.data.activate()
-            size, gtype, dtype = gl_typeinfo[self._gtype]
+            size, gtype, normalized = self._pointer_format()
             stride = self.data.stride
             offset = ctypes.c_void_p(self.data.offset)
             gl.glEnableVertexAttribArray(self.handle)
             gl.glVertexAttribPointer(
-                self.handle, size, gtype, gl.GL_FALSE, stride, offset)
+                self.handle, size, gtype, normalized, stride, offset)
 
     def _deactivate(self):
         if isinstance(self.data, VertexBuffer):
@@ -414,8 +460,8 @@ class Attribute(Variable):
             else:
                 log.log(5, "data %s is okay %s" % (self.name, self.data.shape))
 
-            # Get relevant information from gl_typeinfo
-            size, gtype, dtype = gl_typeinfo[self._gtype]
+            # Get relevant information from the buffer data
+            size, gtype, normalized = self._pointer_format()
             stride = self.data.stride
 
             # Make offset a pointer, or it will be interpreted as a small array
@@ -423,7 +469,7 @@ class Attribute(Variable):
             gl.glEnableVertexAttribArray(self.handle)
             gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.data.handle)
             gl.glVertexAttribPointer(
-                self.handle, size, gtype, gl.GL_FALSE, stride, offset)
+                self.handle, size, gtype, normalized, stride, offset)
 
     def _create(self):
         """ Create attribute on GPU (get handle) """
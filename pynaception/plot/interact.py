@@ -10,9 +10,10 @@
 import logging
 import numpy as np
 
-from phylib.utils import emit
 from phylib.utils.geometry import get_non_overlapping_boxes, get_closest_box
 
+from ..event import emit
+from ..qt import Worker, thread_pool
 from .base import BaseLayout
 from .transform import Scale, Range, Subplot, Clip, NDC
 from .utils import _get_texture, _in_polygon
@@ -460,6 +461,29 @@ class Lasso(object):
         """Return which points belong to the polygon."""
         return _in_polygon(pos, self.polygon)
 
+    def select(self, visual, callback=None):
+        """Return the indices of the points of a visual inside the polygon.
+
+        The query uses the spatial index of the visual, and is restricted to the box of the
+        lasso. If a callback is specified, the query runs in the thread pool, the callback
+        is called with the indices in the GUI thread, and the worker is returned.
+
+        """
+        polygon, box = self.polygon, self.box
+
+        def _select():
+            index = visual.spatial_index
+            if index is None:
+                return np.array([], dtype=np.int64)
+            return np.flatnonzero(index.in_polygon(polygon, box=box))
+
+        if callback is None:
+            return _select()
+        worker = Worker(_select)
+        worker.signals.result.connect(callback)
+        thread_pool().start(worker)
+        return worker
+
     def attach(self, canvas):
         """Attach the lasso to a canvas."""
         canvas.attach_events(self)
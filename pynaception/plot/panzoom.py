@@ -14,7 +14,7 @@ import numpy as np
 
 from .transform import Translate, Scale, pixels_to_ndc
 from phylib.utils._types import _as_array
-from phylib.utils import emit, connect
+from ..event import emit, connect
 
 
 #------------------------------------------------------------------------------
@@ -134,6 +134,10 @@ class PanZoom(object):
         self._zoom_to_pointer = True
         self._canvas_aspect = np.ones(2)
 
+        # Pan and zoom events emitted at the next frame, see `update()`.
+        self._pending_events = {}
+        self._update_pending = False
+
         # Will be set when attached to a canvas.
         self.canvas = None
         self._translate = Translate(gpu_var=self.pan_var_name)
@@ -285,7 +289,7 @@ class PanZoom(object):
 
         new = tuple(self.pan)
         if new != old:
-            emit('pan', self, new)
+            self._pending_events['pan'] = True
         self.update()
 
     @property
@@ -308,7 +312,7 @@ class PanZoom(object):
 
         new = tuple(self.zoom)
         if new != old:
-            emit('zoom', self, new)
+            self._pending_events['zoom'] = True
         self.update()
 
     def pan_delta(self, d):
@@ -388,6 +392,7 @@ class PanZoom(object):
 
     def emit_update_events(self):
         """Emit the pan and zoom events to update views after a pan zoom manual update."""
+        self._pending_events.clear()
         emit('pan', self, self.pan)
         emit('zoom', self, self.zoom)
 
@@ -529,14 +534,8 @@ class PanZoom(object):
         self.canvas = canvas
         self._set_canvas_aspect()
 
-        @connect(sender=canvas)
-        def on_visual_added(sender, visual):
-            self.update_visual(visual)
-
-        @connect(sender=canvas)
-        def on_visual_set_data(sender, visual):
-            if canvas.has_visual(visual):
-                self.update_visual(visual)
+        connect(self._on_visual_added, event='visual_added', sender=canvas)
+        connect(self._on_visual_set_data, event='visual_set_data', sender=canvas)
 
         # Because the visual shaders must be modified to account for u_pan and u_zoom.
         if not all(v.visual.program is None for v in canvas.visuals):  # pragma: no cover
@@ -550,6 +549,13 @@ class PanZoom(object):
 
         canvas.attach_events(self)
 
+    def _on_visual_added(self, sender, visual):
+        self.update_visual(visual)
+
+    def _on_visual_set_data(self, sender, visual):
+        if sender.has_visual(visual):
+            self.update_visual(visual)
+
     def map(self, arr):
         """Apply the current panzoom transformation to a position array."""
         arr = Translate(self.pan).apply(arr)
@@ -565,17 +571,45 @@ class PanZoom(object):
     def update_visual(self, visual):
         """Update a visual with the current pan and zoom values."""
         if hasattr(visual, 'program'):
+            pan = self._pan
+            # Positions uploaded relative to a float64 origin (see `BaseVisual.set_origin()`):
+            # the sum is computed here in float64, and it remains small near the origin.
+            if getattr(visual, 'ndc_origin', None) is not None:
+                pan = np.asarray(pan, dtype=np.float64) + visual.ndc_origin
+            # The pan and zoom are updated even if the visual's data is being updated in
+            # the background (lazy mode).
+            setter = getattr(visual.program, 'set_immediate', visual.program.__setitem__)
             try:
-                visual.program[self.pan_var_name] = self._pan
-                visual.program[self.zoom_var_name] = self._zoom_aspect()
+                setter(self.pan_var_name, pan)
+                setter(self.zoom_var_name, self._zoom_aspect())
             except IndexError:  # pragma: no cover
                 # Visuals that are excluded from panzoom interact.
                 pass
 
+    def _flush(self):
+        """Update the visuals and emit the pending pan and zoom events, with the current
+        pan and zoom."""
+        self._update_pending = False
+        events, self._pending_events = self._pending_events, {}
+        if self.canvas:
+            for v in self.canvas.visuals:
+                self.update_visual(v.visual)
+        for name in events:
+            emit(name, self, tuple(getattr(self, name)))
+
     def update(self):
-        """Update all visuals in the attached canvas."""
-        if not self.canvas:
+        """Update all visuals in the attached canvas at the next frame.
+
+        Successive pan and zoom changes between two frames, for example with every mouse move
+        event, are coalesced: the uniforms are set, and the `pan` and `zoom` events are
+        emitted, at most once per frame with the latest values. The update is immediate when
+        the canvas is not visible.
+
+        """
+        if not self.canvas or not self.canvas.isExposed():
+            self._flush()
             return
-        for v in self.canvas.visuals:
-            self.update_visual(v.visual)
+        if not self._update_pending:
+            self._update_pending = True
+            self.canvas.on_next_paint(self._flush)
         self.canvas.update()
@@ -10,9 +10,6 @@
 import logging
 
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 
 from .axes import Axes
 from .base import BaseCanvas
@@ -255,6 +252,9 @@ class PlotCanvasMpl(object):
     axes = None
 
     def __init__(self, *args, **kwargs):
+        # NOTE: matplotlib is slow to import, it is only imported by this backend.
+        import matplotlib as mpl
+        import matplotlib.pyplot as plt
         plt.style.use('dark_background')
         mpl.rcParams['toolbar'] = 'None'
         mpl.rcParams['axes.prop_cycle'] = mpl.cycler(color=[DEFAULT_COLOR])
@@ -387,6 +387,7 @@ class PlotCanvasMpl(object):
         return self.figure.canvas
 
     def attach(self, gui):
+        from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
         self.gui = gui
         self.nav = NavigationToolbar(self.canvas, gui, coordinates=False)
         self.nav.pan()
@@ -398,6 +399,8 @@ class PlotCanvasMpl(object):
     def show(self):
         self.canvas.draw()
         if not self.gui and not self._shown:
+            from matplotlib.backends.backend_qt5agg import (
+                NavigationToolbar2QT as NavigationToolbar)
             self.nav = NavigationToolbar(self.canvas, None, coordinates=False)
             self.nav.pan()
         self._shown = True
@@ -406,5 +409,6 @@ class PlotCanvasMpl(object):
         return self.show()
 
     def close(self):
+        import matplotlib.pyplot as plt
         self.canvas.close()
         plt.close(self.figure)
@@ -12,7 +12,8 @@ import logging
 import numpy as np
 from pytest import fixture
 
-from ..base import BaseVisual, GLSLInserter, gloo
+from ..base import (
+    BaseVisual, GLSLInserter, ProgramCache, LazyProgram, gloo, _format_frame_stats)
 from ..transform import (subplot_bounds, Translate, Scale, Range,
                          Clip, Subplot, TransformChain)
 from . import mouse_click, mouse_drag, mouse_press, key_press, key_release
@@ -93,6 +94,58 @@ def test_glsl_inserter_hook(vertex_shader, fragment_shader):
     assert '// In fragment shader.' in fs
 
 
+def test_program_cache(vertex_shader_nohook, fragment_shader):
+    cache = ProgramCache()
+
+    class Context(object):
+        pass
+    c1, c2 = Context(), Context()
+
+    s1 = cache.get_shaders(vertex_shader_nohook, fragment_shader, context=c1)
+    s2 = cache.get_shaders(vertex_shader_nohook, fragment_shader, context=c1)
+    s3 = cache.get_shaders(vertex_shader_nohook, fragment_shader, context=c2)
+    assert (cache.hits, cache.misses, len(cache)) == (2, 1, 1)
+
+    # Shared within a context, new shader objects in another context.
+    assert s1 is s2
+    assert s1[0] is not s3[0]
+    assert s1[0].code == s3[0].code
+    assert s1[2] is None
+
+    # Every program has its own variables.
+    p1, p2 = LazyProgram(*s1), LazyProgram(*s2)
+    assert p1._attributes['a_position'] is not p2._attributes['a_position']
+
+    cache.get_shaders(vertex_shader_nohook + '\n', fragment_shader)
+    assert (cache.hits, cache.misses, len(cache)) == (2, 2, 2)
+
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+
+def test_program_storage(vertex_shader_nohook, fragment_shader):
+    program = gloo.Program(vertex_shader_nohook, fragment_shader)
+
+    # Successive arrays of an attribute share the same GPU storage.
+    program['a_position'] = np.zeros((10, 2), dtype=np.float32)
+    b1 = program['a_position']
+    program['a_position'] = np.ones((12, 2), dtype=np.float32)
+    b2 = program['a_position']
+    assert b1 is not b2
+    assert b1.storage is b2.storage
+
+    # The fields of an interleaved buffer use the storage of the whole buffer.
+    vertices = np.zeros(10, dtype=[('a_position', np.float32, 2), ('a_mask', np.float32)])
+    program.bind(vertices.view(gloo.VertexBuffer))
+    b3 = program['a_position']
+    assert b3.base.storage is not b1.storage
+    program.bind(vertices.copy().view(gloo.VertexBuffer))
+    assert program['a_position'].base.storage is b3.base.storage
+
+    assert [gloo.buffer._capacity(n) for n in (0, 1, 2, 3, 1000, 1024)] == [
+        1, 1, 2, 4, 1024, 1024]
+
+
 def test_mock_events(qtbot, canvas):
     c = canvas
     pos = p0 = (50, 50)
@@ -194,6 +247,74 @@ def test_canvas_lazy(qtbot, canvas):
     assert len(list(canvas.iter_update_queue())) == 2
 
 
+def test_canvas_lazy_flush(qtbot, canvas):
+    v = MyVisual()
+    canvas.add_visual(v)
+    canvas.set_lazy(True, visuals=[v])
+    v.set_data()
+    v.hide()
+    # The state changes wait for the queued updates.
+    assert not v._hidden
+    canvas.show()
+    qtbot.waitForWindowShown(canvas)
+    assert v.program._update_queue
+
+    # The queued updates are applied at the next frame once the lazy mode is disabled.
+    canvas.set_lazy(False, visuals=[v])
+    canvas.update()
+    qtbot.waitUntil(lambda: not v.program._update_queue)
+    assert v._hidden
+    canvas.close()
+
+
+def test_canvas_profiler(qtbot, canvas):
+    v = MyVisual()
+    canvas.add_visual(v, key='line')
+    prof = canvas.enable_profiler()
+    v.set_data()
+    canvas.toggle_hud()
+    canvas.show()
+    qtbot.waitForWindowShown(canvas)
+    for _ in range(3):
+        canvas.update()
+        qtbot.wait(20)
+
+    stats = prof.stats()
+    assert stats['n_frames'] >= 1
+    assert 'draw' in stats['sections']
+    assert stats['set']['line.a_position']['bytes'] > 0
+    assert stats['vertices']['line'] == 2
+    assert _format_frame_stats(stats)
+
+    canvas.toggle_hud()
+    assert canvas._hud._hidden
+    canvas.disable_profiler()
+    assert canvas.profiler is None
+    assert v.program._profiler is None
+    canvas.close()
+
+
+def test_canvas_pick(qtbot, canvas):
+    from ..visuals import ScatterVisual
+    v = ScatterVisual()
+    v.enable_picking()
+    canvas.add_visual(v)
+    v.set_data(pos=[[-.5, 0], [.5, 0]], size=20)
+    v.set_pick_ids([10, 2 ** 20])
+    canvas.show()
+    qtbot.waitForWindowShown(canvas)
+
+    w, h = canvas.get_size()
+    assert canvas.pick((w / 4, h / 2)) == (v, 10)
+    assert canvas.pick((3 * w / 4, h / 2)) == (v, 2 ** 20)
+    assert canvas.pick((w / 2, h / 4)) is None
+
+    # Hidden visuals are not picked.
+    v.hide()
+    assert canvas.pick((w / 4, h / 2)) is None
+    canvas.close()
+
+
 def test_visual_benchmark(qtbot, vertex_shader_nohook, fragment_shader):
     try:
         from memory_profiler import memory_usage
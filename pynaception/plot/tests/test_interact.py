@@ -257,6 +257,15 @@ def test_lasso_simple(qtbot):
     ae(l.in_polygon(b), [False, False, True, True])
     assert str(l)
 
+    # Query the spatial index of the visual, in the GUI thread and in the thread pool.
+    pos = np.c_[x, y]
+    expected = np.nonzero(l.in_polygon(pos))[0]
+    ae(l.select(scatter), expected)
+    selected = []
+    l.select(scatter, callback=selected.append)
+    qtbot.waitUntil(lambda: len(selected) == 1)
+    ae(selected[0], expected)
+
     # qtbot.stop()
     view.close()
 
@@ -9,12 +9,16 @@
 
 import os
 
+import numpy as np
 from numpy.testing import assert_allclose as ac
 from pytest import fixture
 
+from ...event import connect
 from . import mouse_drag, key_press
 from ..base import BaseVisual
+from ..interact import Stacked
 from ..panzoom import PanZoom
+from ..transform import Range, NDC
 
 
 #------------------------------------------------------------------------------
@@ -130,6 +134,46 @@ def test_panzoom_map():
     ac(pz.imap([2., -.5]), [[0., 0.]])
 
 
+def test_panzoom_origin():
+    pz = PanZoom()
+    pz.pan = (-.9, .1)
+
+    # Positions uploaded as float32 offsets relative to a float64 origin.
+    visual = BaseVisual()
+    visual.set_origin()
+    pos = visual._apply_origin(np.array([[.9, 0.], [.9 + 1e-9, 1.]]))
+    # Only the x coordinate is offset.
+    ac(visual.ndc_origin, [.9 + 5e-10, 0.])
+    ac(pos[:, 0], [-5e-10, 5e-10], rtol=1e-6)
+    ac(pos[:, 1], [0., 1.])
+
+    visual.program = {}
+    pz.update_visual(visual)
+    ac(visual.program['u_pan'], [5e-10, .1], atol=1e-12)
+
+
+def test_panzoom_origin_stacked():
+    pz = PanZoom()
+    pz.set_range((.8, -1, 1, 1))
+    stacked = Stacked(32)
+
+    # Positions in the upper half of the boxes.
+    x = np.linspace(.8, 1., 100)
+    pos = np.c_[x, .5 + .5 * x]
+    visual = BaseVisual()
+    visual.set_origin()
+    uploaded = visual._apply_origin(pos)
+    visual.program = {}
+    pz.update_visual(visual)
+
+    for box in (0, 15, 31):
+        # The Stacked layout maps NDC to the box bounds on the GPU, then the pan is added.
+        _, y0, _, y1 = stacked.box_bounds[box]
+        box_range = Range(NDC, (-1, y0, 1, y1))
+        expected = box_range.apply(pos) + pz.pan
+        ac(box_range.apply(uploaded) + visual.program['u_pan'], expected, atol=1e-12)
+
+
 def test_panzoom_constraints_x():
     pz = PanZoom()
     pz.xmin, pz.xmax = -2, 2
@@ -298,6 +342,27 @@ def test_panzoom_zoom_keyboard(qtbot, canvas_pz, panzoom):
     assert pz.zoom == [1, 1]
 
 
+def test_panzoom_coalesced(qtbot, canvas_pz, panzoom):
+    pz = panzoom
+    events = []
+
+    @connect(sender=pz)
+    def on_pan(sender, pan):
+        events.append(('pan', pan))
+
+    @connect(sender=pz)
+    def on_zoom(sender, zoom):
+        events.append(('zoom', zoom))
+
+    # Successive changes in the same frame only emit one event with the latest values.
+    for _ in range(10):
+        pz.pan_delta((.01, 0))
+    pz.zoom_delta((.1, .1))
+    assert events == []
+    qtbot.waitUntil(lambda: len(events) == 2)
+    assert events == [('pan', tuple(pz.pan)), ('zoom', tuple(pz.zoom))]
+
+
 def test_panzoom_resize(qtbot, canvas_pz, panzoom):
     c = canvas_pz
     pz = panzoom
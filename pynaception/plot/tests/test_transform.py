@@ -129,6 +129,23 @@ def test_range_cpu_vectorized():
     _check(Range(f, t), arr, arr_tr)
 
 
+def test_range_cpu_segments():
+    # Per-signal bounds, applied to segments of consecutive points.
+    f = np.array([[0, 0, 5, 5], [0, 0, 50, 50]], dtype=np.float64)
+    t = np.array([[0, 0, 1, 1]], dtype=np.float64)
+    for n0, n1 in ((2, 3), (200, 300)):
+        arr = np.random.uniform(size=(n0 + n1, 2)) * 10
+        expected = Range(np.repeat(f, [n0, n1], axis=0), t).apply(arr)
+        r = Range(f, t, segments=[0, n0, n0 + n1])
+        ac(r.apply(arr), expected)
+        ac(r.inverse().apply(expected), arr)
+
+        # In place.
+        out = arr.copy()
+        assert r.apply(out, out=out) is out
+        ac(out, expected)
+
+
 def test_clip_cpu():
     _check(Clip(), [0, 0], [0, 0])  # Default bounds.
 
@@ -263,3 +280,28 @@ def test_transform_chain_inverse():
     tci = tc.inverse()
     ae(tc.apply([[1., 0.]]), [[3., 0.]])
     ae(tci.apply([[3., 0.]]), [[1., 0.]])
+
+
+def test_transform_chain_fused():
+    tc = TransformChain()
+    tc.add([Scale(.5), Translate((1, 0)), Range([0, 0, 2, 2], [-1, -1, 1, 1]), Clip()])
+    a, b = tc.get_affine()[:2]
+    ac(a, [[.5, .5]])
+    ac(b, [[0, -1]])
+
+    arr = np.random.uniform(size=(10, 2))
+    expected = arr.copy()
+    for t in tc.transforms[:3]:
+        expected = t.apply(expected)
+    ac(tc.apply(arr), expected)
+
+    # In place, in float32.
+    out = arr.astype(np.float32)
+    assert tc.apply(out, out=out) is out
+    assert out.dtype == np.float32
+    ac(out, expected, rtol=1e-6)
+
+    # Rotations are not affine in this sense: fallback to the unfused path.
+    tc.add([Rotate('cw')])
+    assert tc.get_affine() is None
+    ac(tc.apply(arr), Rotate('cw').apply(expected))
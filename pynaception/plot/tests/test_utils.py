@@ -10,11 +10,12 @@
 import numpy as np
 from numpy.testing import assert_array_equal as ae
 from numpy.testing import assert_allclose as ac
-from pytest import raises
+from pytest import raises, mark
 
 from ..utils import (
-    _load_shader, _tesselate_histogram, BatchAccumulator, _in_polygon
-)
+    _load_shader, _tesselate_histogram, BatchAccumulator, _in_polygon, MinMaxPyramid,
+    _bin_times, _pack_color, _pack_index, _interleave, _vertex_dtype, _fill_affine,
+    _fill_segments, SpatialIndex)
 
 
 #------------------------------------------------------------------------------
@@ -59,3 +60,134 @@ def test_in_polygon():
                               (points[:, 1] < 1))[0]
     idx = np.nonzero(_in_polygon(points, polygon))[0]
     ae(idx, idx_expected)
+
+
+@mark.parametrize('n_points', [0, 10, 100000])
+def test_spatial_index(n_points):
+    points = .4 * np.random.randn(n_points, 2)
+    box_index = np.random.randint(0, 2, (n_points, 2))
+    polygon = [[-.5, -.5], [.6, -.4], [.1, 0], [.5, .7], [-.3, .4]]
+    expected = _in_polygon(points, polygon)
+
+    index = SpatialIndex(points, box_index=box_index, chunk_size=1000)
+    ae(index.in_polygon(polygon), expected)
+    ae(index.in_polygon(polygon, box=(1, 0)), expected & np.all(box_index == (1, 0), axis=1))
+    assert not index.in_polygon(polygon, box=(2, 2)).any()
+    assert not index.in_polygon(polygon[:2]).any()
+    assert not index.in_polygon(np.array(polygon) + 100).any()
+
+    # Polygons in normalized coordinates.
+    index = SpatialIndex(points, data_bounds=(-2, -2, 2, 2))
+    ae(index.in_polygon(np.array(polygon) / 2), expected)
+
+
+def test_minmax_pyramid():
+    n = 10000
+    t = np.linspace(0., 10., n)
+    y = np.random.randn(n)
+    pyramid = MinMaxPyramid(t, y, base=10, factor=4)
+    assert pyramid.bin_sizes[:3] == [10, 40, 160]
+    ymin, ymax = pyramid.levels[0]
+    assert len(ymin) == len(ymax) == 1000
+    ac(ymin[3], y[30:40].min())
+    ac(ymax[3], y[30:40].max())
+    ac(pyramid.levels[-1][0].min(), y.min())
+    ac(pyramid.levels[-1][1].max(), y.max())
+
+    # Few samples: raw data, no copy.
+    b = pyramid.get(1., 1.1, 1000)
+    assert b.level == -1
+    assert np.shares_memory(b.y, y)
+    assert b.x[0] <= 1. and b.x[-1] >= 1.1
+
+    # Many samples: decimated envelope.
+    b = pyramid.get(0., 10., 200)
+    assert b.level >= 0
+    assert len(b.x) == len(b.y) <= 200
+    ac(b.y.min(), y.min())
+    ac(b.y.max(), y.max())
+
+
+def test_minmax_pyramid_multichannel():
+    n, c = 1003, 3
+    t = np.arange(n) / 100.
+    y = np.random.randn(n, c)
+    pyramid = MinMaxPyramid(t, y, base=8, factor=2)
+    b = pyramid.get(t[0], t[-1], 100)
+    assert b.y.shape == (len(b.x), c)
+    ac(b.y.min(axis=0), y.min(axis=0))
+    ac(b.y.max(axis=0), y.max(axis=0))
+
+    ymin, ymax = pyramid.get_channel_bounds()
+    ac(ymin, y.min(axis=0))
+    ac(ymax, y.max(axis=0))
+
+    # Subset of channels, decimated or not.
+    for level in (None, -1):
+        bs = pyramid.get(t[0], t[-1], 100, level=level, channels=[2, 0])
+        ae(bs.y, pyramid.get(t[0], t[-1], 100, level=level).y[:, [2, 0]])
+
+
+def test_bin_times():
+    times = np.sort(np.random.uniform(0, 10, 1000))
+    counts = _bin_times(times, 2., 6., 8)
+    ae(counts, np.histogram(times, bins=8, range=(2., 6.))[0])
+
+
+def test_pack_color():
+    color = np.array([[0., .5, 1., 1.], [.2, .4, .6, .8]])
+    packed = _pack_color(color)
+    assert packed.dtype == np.uint8
+    ac(packed / 255., color, atol=.5 / 255)
+    assert _pack_color(packed) is packed
+
+
+def test_pack_index():
+    assert _pack_index(np.arange(10.)).dtype == np.uint16
+    assert _pack_index(np.array([0, 2 ** 16])).dtype == np.uint32
+    assert _pack_index(np.zeros(0)).dtype == np.uint16
+
+
+def test_interleave():
+    n = 5
+    pos = np.random.rand(n, 2).astype(np.float32)
+    color = np.random.randint(0, 255, (n, 4)).astype(np.uint8)
+    index = np.arange(n, dtype=np.uint16)
+    arr = _interleave(a_position=pos, a_color=color, a_signal_index=index)
+    assert arr.shape == (n,)
+    assert arr.dtype.names == ('a_position', 'a_color', 'a_signal_index')
+    # Every field is aligned on 4 bytes: 8 + 4 + 4 bytes per vertex.
+    assert arr.dtype.itemsize == 16
+    assert [arr.dtype.fields[name][1] for name in arr.dtype.names] == [0, 8, 12]
+    ae(arr['a_position'], pos)
+    ae(arr['a_color'], color)
+    ae(arr['a_signal_index'][:, 0], index)
+
+
+def test_vertex_dtype():
+    dtype = _vertex_dtype(a_position=(np.float32, 3), a_color=(np.uint8, 4), a_box_index=(
+        np.uint16, 1))
+    assert dtype.itemsize == 20
+    assert [dtype.fields[name][1] for name in dtype.names] == [0, 12, 16]
+
+
+@mark.parametrize('n_samples', [(3, 0, 5), (1000, 2000), (300000,)])
+def test_fill_affine(n_samples):
+    segments = np.r_[0, np.cumsum(n_samples)]
+    arrs = [1e4 + np.random.rand(n) for n in n_samples]
+    scale = np.random.rand(len(arrs))
+    shift = -1e4 * scale
+    out = np.zeros(segments[-1], dtype=np.float32)
+    _fill_affine(out, arrs, scale, shift, segments)
+    # The values are computed in float64 before the cast.
+    expected = np.concatenate([a * arr + b for arr, a, b in zip(arrs, scale, shift)])
+    ac(out, expected, rtol=1e-6, atol=1e-6)
+
+
+@mark.parametrize('n_samples', [(3, 0, 5), (1000, 2000)])
+def test_fill_segments(n_samples):
+    segments = np.r_[0, np.cumsum(n_samples)]
+    values = np.random.rand(len(n_samples), 4)
+    out = np.zeros((segments[-1], 4), dtype=np.float32)
+    _fill_segments(out, values, segments)
+    ae(out, np.repeat(values, n_samples, axis=0).astype(np.float32))
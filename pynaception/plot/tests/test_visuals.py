@@ -10,6 +10,8 @@
 import os
 
 import numpy as np
+from numpy.testing import assert_equal as ae
+from numpy.testing import assert_allclose as ac
 
 from ..visuals import (
     ScatterVisual, PatchVisual, PlotVisual, HistogramVisual, LineVisual,
@@ -53,6 +55,18 @@ def test_scatter_markers(qtbot, canvas_pz):
     _test_visual(qtbot, canvas_pz, ScatterVisual(marker='vbar'), x=x, y=y, data_bounds='auto')
 
 
+def test_scatter_zero_copy(qtbot, canvas_pz):
+    v = ScatterVisual()
+    canvas_pz.add_visual(v)
+    pos = np.random.uniform(-1, 1, (100, 2)).astype(np.float32)
+    v.set_data(pos=pos)
+    # Contiguous float32 positions are uploaded from the caller's buffer.
+    assert np.shares_memory(v.program['a_position'], pos)
+    canvas_pz.show()
+    qtbot.waitForWindowShown(canvas_pz)
+    canvas_pz.close()
+
+
 def test_scatter_custom(qtbot, canvas_pz):
 
     n = 100
@@ -70,6 +84,23 @@ def test_scatter_custom(qtbot, canvas_pz):
     _test_visual(qtbot, canvas_pz, ScatterVisual(), pos=pos, color=c, size=s)
 
 
+def test_scatter_color_lookup(qtbot, canvas):
+    n = 100
+    v = ScatterVisual(color_index='a_unit')
+    v.inserter.insert_vert('attribute float a_unit;', 'header')
+    canvas.add_visual(v)
+    v.set_data(pos=.2 * np.random.randn(n, 2))
+    assert v.program['a_color'] is None
+    v.program['a_unit'] = np.random.randint(0, 3, n).astype(np.float32)
+    v.set_color_lookup(np.random.uniform(.4, .7, size=(3, 4)))
+    assert v.program['u_color_lookup'].shape == (1, 3, 4)
+
+    canvas.show()
+    qtbot.waitForWindowShown(canvas)
+    v.close()
+    canvas.close()
+
+
 #------------------------------------------------------------------------------
 # Test patch visual
 #------------------------------------------------------------------------------
@@ -173,6 +204,62 @@ def test_plot_color(qtbot, canvas_pz):
     canvas_pz.close()
 
 
+def test_plot_compact(qtbot, canvas_pz):
+    v = PlotVisual()
+    v.set_compact()
+    canvas_pz.add_visual(v)
+    v.set_data(y=.2 * np.random.randn(3, 10), color=np.random.uniform(.5, .9, size=(3, 4)))
+    # 2D position, uint8 color and float32 mask, interleaved.
+    assert v.program['a_position'].shape == (30, 2)
+    assert v.program['a_color'].dtype == np.uint8
+    assert v.program['a_color'].stride == 16
+    v.set_color(np.random.uniform(low=.5, high=.9, size=(30, 4)))
+    canvas_pz.show()
+    qtbot.waitForWindowShown(canvas_pz)
+    canvas_pz.close()
+
+
+def test_plot_gpu_bounds(qtbot, canvas_pz):
+    v = PlotVisual(gpu_bounds=True)
+    canvas_pz.add_visual(v)
+    data_bounds = [[0, -1, 1, 1], [0, -2, 1, 2], [0, -4, 1, 4]]
+    v.set_data(y=.2 * np.random.randn(3, 10), data_bounds=data_bounds)
+    # One normalization texel per signal.
+    assert v.program['u_data_norm'].shape == (1, 3, 4)
+    v.set_data_bounds(np.array(data_bounds) * 2)
+    ac(v.program['u_data_norm'][0, :, 1], [.5, .25, .125])
+    canvas_pz.show()
+    qtbot.waitForWindowShown(canvas_pz)
+    canvas_pz.close()
+
+
+def test_plot_segments(qtbot, canvas_pz):
+    v = PlotVisual()
+    canvas_pz.add_visual(v)
+    v.set_data(y=[np.random.randn(i) for i in (5, 20, 50)])
+    # One line strip per signal, drawn without a signal index attribute.
+    ae(v.segments, [0, 5, 25, 75])
+    assert 'a_signal_index' not in v.program
+    v.set_data(y=np.random.randn(10))
+    assert v.segments is None
+    canvas_pz.show()
+    qtbot.waitForWindowShown(canvas_pz)
+    canvas_pz.close()
+
+
+def test_plot_zero_copy(qtbot, canvas_pz):
+    v = PlotVisual()
+    canvas_pz.add_visual(v)
+    v.set_data(y=np.random.randn(3, 100), data_bounds='auto')
+    # The attributes are views of a single interleaved array, written in place.
+    assert v.program['a_position'].shape == (300, 2)
+    assert np.may_share_memory(v.program['a_position'], v.program['a_color'])
+    assert np.may_share_memory(v.program['a_position'], v.program['a_mask'])
+    canvas_pz.show()
+    qtbot.waitForWindowShown(canvas_pz)
+    canvas_pz.close()
+
+
 def test_plot_2(qtbot, canvas_pz):
 
     n_signals = 50
@@ -441,3 +528,28 @@ def test_text_3(qtbot, canvas_pz):
     _test_visual(
         qtbot, canvas_pz, TextVisual(color=(1, 1, 0, 1)), pos=[(0, 0)] * 10, text=text,
         anchor=[(1, -1 - 2 * i) for i in range(5)] + [(-1 - 2 * i, 1) for i in range(5)])
+
+
+def test_text_move(qtbot, canvas_pz):
+    v = TextVisual()
+    canvas_pz.add_visual(v)
+    text = ['12', '345']
+    v.set_data(pos=[[0, 0], [.5, .5]], text=text)
+    tex = v.program['u_tex']
+    # The attributes are structured vertex buffers with a single field.
+    ae(v.program['a_char_index'].view(np.float32).ravel()[::6], [17, 18, 19, 20, 21])
+    ae(v.program['a_glyph_index'].view(np.float32).ravel()[::6], [0, 1, 0, 1, 2])
+
+    # Only the positions change: the glyph attributes and the font map are not uploaded again.
+    calls = []
+    set_glyphs = v._set_glyphs
+    v._set_glyphs = lambda *args: calls.append(args) or set_glyphs(*args)
+    v.set_data(pos=[[-.5, 0], [.5, -.5]], text=text)
+    assert not calls
+    assert v.program['u_tex'] is tex
+    ac(v.program['a_position'].view(np.float32).reshape((-1, 2))[::6],
+       [[-.5, 0], [-.5, 0], [.5, -.5], [.5, -.5], [.5, -.5]])
+
+    canvas_pz.show()
+    qtbot.waitForWindowShown(canvas_pz)
+    canvas_pz.close()
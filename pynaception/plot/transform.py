@@ -93,6 +93,57 @@ def _normalize(arr, m, M):
     return arr
 
 
+def _range_affine(from_bounds, to_bounds):
+    """Return the `(scale, shift)` arrays, of shape `(n, 2)`, of the linear transforms between
+    `(n, 4)` or `(1, 4)` source and target rectangles."""
+    from_bounds = np.array(np.atleast_2d(from_bounds), dtype=np.float64)
+    to_bounds = np.array(np.atleast_2d(to_bounds), dtype=np.float64)
+    assert from_bounds.shape[-1] == to_bounds.shape[-1] == 4
+    f0, f1 = from_bounds[:, :2], from_bounds[:, 2:]
+    t0, t1 = to_bounds[:, :2], to_bounds[:, 2:]
+    # Degenerate axes are extended maximally.
+    for z0, z1 in ((f0, f1), (t0, t1)):
+        ind = np.abs(z0 - z1) < 1e-8
+        z0[ind] = -1
+        z1[ind] = +1
+    scale = (t1 - t0) / (f1 - f0)
+    shift = t0 - f0 * scale
+    return scale, shift
+
+
+def _apply_affine(arr, scale, shift, segments=None, out=None):
+    """Compute `arr * scale + shift` in place, in `out` if specified, or in a copy of `arr`.
+
+    `scale` and `shift` are `(n, 2)` arrays, with one row for all points (n=1), one row per
+    point, or one row per segment of consecutive points, with `segments` the `(n + 1,)` array
+    of the segment offsets.
+
+    """
+    if out is None:
+        out = np.array(arr)
+    elif out is not arr:
+        np.copyto(out, arr)
+    k = out.shape[1]
+    scale, shift = scale[:, :k], shift[:, :k]
+    if segments is None or len(scale) == 1:
+        out *= scale
+        out += shift
+        return out
+    segments = np.asarray(segments)
+    assert len(segments) == len(scale) + 1
+    assert segments[-1] == len(out)
+    if len(out) >= 64 * len(scale):
+        # Long segments: operate on views of the output, no per-point array is allocated.
+        for i0, i1, a, b in zip(segments[:-1], segments[1:], scale, shift):
+            out[i0:i1] *= a
+            out[i0:i1] += b
+    else:
+        counts = np.diff(segments)
+        out *= np.repeat(scale, counts, axis=0)
+        out += np.repeat(shift, counts, axis=0)
+    return out
+
+
 def _fix_coordinate_in_visual(visual, coord):
     """Insert GLSL code to fix the position on the x or y coordinate."""
     assert coord in ('x', 'y')
@@ -214,6 +265,11 @@ class Translate(BaseTransform):
         param = param if param is not None else _call_if_callable(self.amount)
         return arr + np.asarray(param)
 
+    def get_affine(self):
+        """Return the `(scale, shift)` arrays of the transform."""
+        shift = np.atleast_2d(np.broadcast_to(_call_if_callable(self.amount), (2,)))
+        return np.ones((1, 2)), shift.astype(np.float64)
+
     def glsl(self, var):
         """Return a GLSL snippet that applies the translation to a given GLSL variable name."""
         assert var
@@ -253,6 +309,11 @@ class Scale(BaseTransform):
         param = param if param is not None else _call_if_callable(self.amount)
         return arr * np.asarray(param)
 
+    def get_affine(self):
+        """Return the `(scale, shift)` arrays of the transform."""
+        scale = np.atleast_2d(np.broadcast_to(_call_if_callable(self.amount), (2,)))
+        return scale.astype(np.float64), np.zeros((1, 2))
+
     def glsl(self, var):
         """Return a GLSL snippet that applies the scaling to a given GLSL variable name."""
         assert var
@@ -329,6 +390,9 @@ class Range(BaseTransform):
         Name of the GPU variable with the from bounds.
     to_gpu_var : str
         Name of the GPU variable with the to bounds.
+    segments : array-like
+        Offsets of consecutive segments of points, when the bounds are given per segment
+        (e.g. per signal) rather than per point. The bounds then have `len(segments) - 1` rows.
 
     """
 
@@ -336,20 +400,24 @@ class Range(BaseTransform):
     to_bounds = NDC
     from_gpu_var = None
     to_gpu_var = None
+    segments = None
 
     def __init__(self, from_bounds=None, to_bounds=None, **kwargs):
         super(Range, self).__init__(from_bounds=from_bounds, to_bounds=to_bounds, **kwargs)
 
-    def apply(self, arr, from_bounds=None, to_bounds=None):
-        """Apply the transform to a NumPy array."""
+    def get_affine(self, from_bounds=None, to_bounds=None):
+        """Return the `(scale, shift)` arrays of the transform, with one row per row of
+        bounds."""
         from_bounds = from_bounds if from_bounds is not None else self.from_bounds
         to_bounds = to_bounds if to_bounds is not None else self.to_bounds
         assert not isinstance(from_bounds, str) and not isinstance(to_bounds, str)
-        from_bounds = np.atleast_2d(_call_if_callable(from_bounds)).astype(np.float64)
-        to_bounds = np.atleast_2d(_call_if_callable(to_bounds)).astype(np.float64)
-        assert from_bounds.shape[-1] == 4
-        assert to_bounds.shape[-1] == 4
-        return range_transform(from_bounds, to_bounds, arr)
+        return _range_affine(_call_if_callable(from_bounds), _call_if_callable(to_bounds))
+
+    def apply(self, arr, from_bounds=None, to_bounds=None, segments=None, out=None):
+        """Apply the transform to a NumPy array, in `out` if specified."""
+        scale, shift = self.get_affine(from_bounds=from_bounds, to_bounds=to_bounds)
+        segments = segments if segments is not None else self.segments
+        return _apply_affine(arr, scale, shift, segments=segments, out=out)
 
     def glsl(self, var):
         """Return a GLSL snippet that applies the transform to a given GLSL variable name."""
@@ -371,6 +439,7 @@ class Range(BaseTransform):
         return Range(
             from_bounds=self.to_bounds, to_bounds=self.from_bounds,
             from_gpu_var=self.to_gpu_var, to_gpu_var=self.from_gpu_var,
+            segments=self.segments,
         )
 
 
@@ -496,12 +565,49 @@ class TransformChain(object):
             if transform.__class__.__name__ == class_name:
                 return transform
 
-    def apply(self, arr):
-        """Apply all transforms on an array."""
+    def get_affine(self):
+        """Fuse the CPU transforms into a single `(scale, shift, segments)` affine transform,
+        or return None if the chain is not affine (e.g. rotation)."""
+        scale, shift, segments = np.ones((1, 2)), np.zeros((1, 2)), None
+        for t in self.transforms:
+            if isinstance(t, Clip):
+                continue
+            if not hasattr(t, 'get_affine'):
+                return
+            a, b = t.get_affine()
+            t_segments = getattr(t, 'segments', None)
+            if t_segments is not None and len(a) > 1:
+                if segments is not None and segments is not t_segments:
+                    return
+                segments = t_segments
+            if len(a) > 1 and len(scale) > 1 and len(a) != len(scale):
+                return
+            scale, shift = scale * a, shift * a + b
+        return scale, shift, segments
+
+    def apply(self, arr, out=None):
+        """Apply all transforms on an array.
+
+        The transforms are fused into a single affine transform when possible, computed in
+        place in `out` if specified (which may be `arr` itself).
+
+        """
+        if arr is None or not len(arr):
+            return arr
+        arr = np.atleast_2d(arr)
+        if arr.dtype not in (np.float32, np.float64):
+            arr = arr.astype(np.float64)
+        affine = self.get_affine()
+        if affine is not None:
+            scale, shift, segments = affine
+            return _apply_affine(arr, scale, shift, segments=segments, out=out)
         for t in self.transforms:
             if isinstance(t, Clip):
                 continue
             arr = t.apply(arr)
+        if out is not None:
+            out[...] = arr
+            arr = out
         return arr
 
     def inverse(self):
@@ -14,6 +14,8 @@ import numpy as np
 
 from phylib.utils import Bunch, _as_array
 
+from .transform import Range, NDC
+
 logger = logging.getLogger(__name__)
 
 
@@ -94,6 +96,99 @@ def _get_index(n_items, item_size, n):
     return index
 
 
+def _pack_color(color):
+    """Pack float RGBA colors in [0, 1] into normalized uint8 values (4 bytes per vertex)."""
+    color = np.asarray(color)
+    if color.dtype == np.uint8:
+        return color
+    return np.clip(np.round(color * 255), 0, 255).astype(np.uint8)
+
+
+def _pack_index(index):
+    """Pack non-negative integer indices into the smallest of uint16 or uint32."""
+    index = np.asarray(index)
+    if index.dtype in (np.uint16, np.uint32):
+        return index
+    dtype = np.uint16 if not index.size or index.max() < 2 ** 16 else np.uint32
+    return index.astype(dtype)
+
+
+def _vertex_dtype(**formats):
+    """Structured dtype of interleaved vertices, with the fields given as
+    `name=(dtype, n_components)`.
+
+    Every field starts on a 4-byte boundary, as required by most OpenGL implementations.
+
+    """
+    names, dtypes, offsets = [], [], []
+    offset = 0
+    for name, (dtype, k) in formats.items():
+        dtype = np.dtype(dtype)
+        names.append(name)
+        dtypes.append((dtype, (k,)))
+        offsets.append(offset)
+        offset += -(-dtype.itemsize * k // 4) * 4
+    return np.dtype(dict(names=names, formats=dtypes, offsets=offsets, itemsize=offset))
+
+
+def _interleave(**arrays):
+    """Interleave per-vertex arrays with the same number of rows into a single structured
+    array, with one field per array."""
+    n = None
+    for name, arr in arrays.items():
+        arr = np.asarray(arr)
+        if arr.ndim == 1:
+            arr = arr[:, np.newaxis]
+        assert arr.ndim == 2
+        assert n is None or arr.shape[0] == n
+        n = arr.shape[0]
+        arrays[name] = arr
+    dtype = _vertex_dtype(**{name: (arr.dtype, arr.shape[1]) for name, arr in arrays.items()})
+    out = np.zeros(n or 0, dtype=dtype)
+    for name, arr in arrays.items():
+        out[name] = arr
+    return out
+
+
+def _fill_affine(out, arrs, scale, shift, segments, chunk_size=2 ** 16):
+    """Write `arr * scale[i] + shift[i]` for the i-th 1D array of `arrs` in the i-th segment
+    of the 1D array `out`, typically a float32 field of a vertex array.
+
+    The values are computed in float64 by chunks, so that no array of the size of the data is
+    allocated, and cast to the type of `out` at the end.
+
+    """
+    segments = np.asarray(segments)
+    assert len(arrs) == len(scale) == len(shift) == len(segments) - 1
+    if len(out) < 64 * len(arrs):
+        # Many short arrays: vectorized computation on the concatenated arrays.
+        counts = np.diff(segments)
+        arr = np.concatenate(arrs) if len(arrs) else np.zeros(0)
+        out[:] = arr * np.repeat(scale, counts) + np.repeat(shift, counts)
+        return out
+    buf = np.empty(min(chunk_size, len(out)), dtype=np.float64)
+    for arr, i0, a, b in zip(arrs, segments[:-1], scale, shift):
+        for j in range(0, len(arr), chunk_size):
+            chunk = arr[j:j + chunk_size]
+            tmp = buf[:len(chunk)]
+            np.multiply(chunk, a, out=tmp, dtype=np.float64)
+            tmp += b
+            out[i0 + j:i0 + j + len(chunk)] = tmp
+    return out
+
+
+def _fill_segments(out, values, segments):
+    """Set the rows of the i-th segment of `out` to the i-th row of `values`."""
+    segments = np.asarray(segments)
+    assert len(values) == len(segments) - 1
+    if len(out) < 64 * len(values):
+        out[:] = np.repeat(values, np.diff(segments), axis=0)
+        return out
+    for i0, i1, value in zip(segments[:-1], segments[1:], values):
+        out[i0:i1] = value
+    return out
+
+
 def get_linear_x(n_signals, n_samples):
     """Get a vertical stack of arrays ranging from -1 to 1.
 
@@ -190,16 +285,345 @@ class BatchAccumulator(object):
         return Bunch({key: getattr(self, key) for key in self.items.keys()})
 
 
+#------------------------------------------------------------------------------
+# Decimation
+#------------------------------------------------------------------------------
+
+def _reduce_bins(arr, size, ufunc):
+    """Reduce consecutive bins of `size` rows of an array with a ufunc (np.minimum or np.maximum).
+
+    The last bin may be incomplete.
+
+    """
+    n = arr.shape[0]
+    k = n // size
+    out = ufunc.reduce(arr[:k * size].reshape((k, size) + arr.shape[1:]), axis=1)
+    if n > k * size:
+        tail = ufunc.reduce(arr[k * size:], axis=0)
+        out = np.concatenate((out, tail[np.newaxis, ...]), axis=0)
+    return out
+
+
+def _bin_times(times, t0, t1, n_bins):
+    """Count the sorted times falling in `n_bins` regular bins between `t0` and `t1`.
+
+    This only requires a binary search per bin edge, not a pass over the times.
+
+    """
+    edges = np.searchsorted(times, np.linspace(t0, t1, n_bins + 1), side='left')
+    return np.diff(edges)
+
+
+class MinMaxPyramid(object):
+    """Multi-resolution min/max envelope of a time series.
+
+    Level `k` stores the minimum and maximum of the signal in consecutive bins of
+    `base * factor ** k` samples. The levels are built once, so that any time window can then
+    be drawn with a number of vertices that depends on the screen width rather than on the
+    number of samples.
+
+    Constructor
+    -----------
+
+    t : array-like
+        An `(n_samples,)` array with the sorted sample times.
+    y : array-like
+        An `(n_samples,)` or `(n_samples, n_channels)` array with the signal values.
+    base : int
+        Number of samples per bin in the finest level.
+    factor : int
+        Decimation factor between two consecutive levels.
+
+    """
+
+    def __init__(self, t, y, base=16, factor=4):
+        assert len(t) == len(y)
+        assert base >= 2 and factor >= 2
+        self.t = t
+        self.y = y
+        self.n_samples = len(t)
+        self.base = base
+        self.factor = factor
+        self.bin_sizes = []
+        self.levels = []
+        self._build()
+
+    def _build(self):
+        size = self.base
+        ymin = _reduce_bins(self.y, size, np.minimum)
+        ymax = _reduce_bins(self.y, size, np.maximum)
+        while True:
+            self.bin_sizes.append(size)
+            self.levels.append((ymin, ymax))
+            if len(ymin) <= self.factor:
+                break
+            # Each level is computed from the previous one.
+            ymin = _reduce_bins(ymin, self.factor, np.minimum)
+            ymax = _reduce_bins(ymax, self.factor, np.maximum)
+            size *= self.factor
+
+    @property
+    def n_levels(self):
+        """Number of decimation levels (the raw data not included)."""
+        return len(self.levels)
+
+    def get_bounds(self):
+        """Return the data bounds `(t0, ymin, t1, ymax)` of the whole signal."""
+        # The coarsest level gives the global extrema without scanning the data again.
+        ymin, ymax = self.levels[-1]
+        return (self.t[0], ymin.min(), self.t[-1], ymax.max())
+
+    def get_channel_bounds(self):
+        """Return the `(ymin, ymax)` arrays of every channel."""
+        ymin, ymax = self.levels[-1]
+        return ymin.min(axis=0), ymax.max(axis=0)
+
+    def get_level(self, n_samples, n_points):
+        """Return the coarsest level needed to draw `n_samples` samples with at most
+        `n_points` vertices, or -1 if the raw samples can be drawn directly."""
+        if n_samples <= n_points:
+            return -1
+        # Every bin is drawn with two vertices (min and max).
+        n_bins = max(1, n_points // 2)
+        for level, size in enumerate(self.bin_sizes):
+            if n_samples <= size * n_bins:
+                return level
+        return self.n_levels - 1
+
+    def get_range(self, t0, t1):
+        """Return the sample indices `(start, stop)` covering the interval `[t0, t1]`."""
+        # One extra sample on each side so that the line reaches the edges of the window.
+        i0 = max(0, np.searchsorted(self.t, t0, side='left') - 1)
+        i1 = min(self.n_samples, np.searchsorted(self.t, t1, side='right') + 1)
+        return i0, i1
+
+    def get_n_vertices(self, t0, t1, level):
+        """Return the number of vertices needed to draw `[t0, t1]` at a given level."""
+        i0, i1 = self.get_range(t0, t1)
+        if level < 0:
+            return i1 - i0
+        size = self.bin_sizes[level]
+        return 2 * (-(-i1 // size) - i0 // size)
+
+    def get(self, t0, t1, n_points=None, level=None, channels=None):
+        """Return the envelope of the signal between `t0` and `t1`, with about `n_points`
+        vertices, or at a given level (-1 for the raw samples).
+
+        Return a Bunch with `x`, `y`, `level`, `start` and `stop`, where `start` and `stop`
+        are the sample indices spanned by the returned vertices. For a multichannel signal,
+        `channels` selects the columns of `y`.
+
+        """
+        i0, i1 = self.get_range(t0, t1)
+        if level is None:
+            level = self.get_level(i1 - i0, n_points)
+        if level < 0:
+            # NOTE: these are views on the original arrays, no copy is made.
+            y = self.y[i0:i1] if channels is None else self.y[i0:i1, channels]
+            return Bunch(x=self.t[i0:i1], y=y, level=level, start=i0, stop=i1)
+        size = self.bin_sizes[level]
+        ymin, ymax = self.levels[level]
+        if channels is not None:
+            ymin, ymax = ymin[:, channels], ymax[:, channels]
+        j0, j1 = i0 // size, min(len(ymin), -(-i1 // size))
+        # The min and max of every bin are interleaved and drawn at the start of the bin.
+        x = np.repeat(self.t[j0 * size:j1 * size:size], 2)
+        y = np.empty((2 * (j1 - j0),) + ymin.shape[1:], dtype=ymin.dtype)
+        y[0::2] = ymin[j0:j1]
+        y[1::2] = ymax[j0:j1]
+        return Bunch(
+            x=x, y=y, level=level, start=j0 * size, stop=min(j1 * size, self.n_samples))
+
+
+#------------------------------------------------------------------------------
+# Spatial index
+#------------------------------------------------------------------------------
+
+def _box_key(box):
+    """Hashable key of a box index, which may be an integer or a tuple."""
+    return tuple(int(b) for b in np.atleast_1d(box))
+
+
+class SpatialIndex(object):
+    """Uniform grid over 2D points, for fast polygon queries such as lasso selections.
+
+    The grid cell of every point is computed once. A query only runs the exact
+    point-in-polygon test on the points in the cells crossed by the edges of the polygon: the
+    points in the cells inside the polygon are selected, and all other points are rejected,
+    without testing them.
+
+    Constructor
+    -----------
+
+    pos : array-like
+        An `(n_points, 2)` array with the positions of the points. It is not copied.
+    data_bounds : array-like
+        If set, the data bounds `(xmin, ymin, xmax, ymax)` of the points, or an
+        `(n_points, 4)` array. The queried polygons are then in normalized device coordinates.
+    box_index : array-like
+        If set, an `(n_points,)` or `(n_points, k)` array with the box of every point, for
+        example the subplot of a grid layout. Queries can then be restricted to one box.
+    max_cells : int
+        Maximum number of grid cells along each axis.
+
+    """
+
+    # Average number of points per cell, for small numbers of points.
+    points_per_cell = 256
+
+    def __init__(self, pos, data_bounds=None, box_index=None, max_cells=256, chunk_size=2 ** 20):
+        pos = np.asarray(pos)
+        assert pos.ndim == 2 and pos.shape[1] == 2
+        if data_bounds is not None:
+            data_bounds = np.atleast_2d(data_bounds)
+            if not len(data_bounds):
+                data_bounds = None
+            elif (data_bounds == data_bounds[0]).all():
+                data_bounds = data_bounds[0]
+            else:
+                # Different data bounds for every point: index the normalized positions.
+                pos, data_bounds = Range().apply(pos, from_bounds=data_bounds), None
+        self.pos = pos
+        self.data_bounds = data_bounds
+        self.chunk_size = chunk_size
+        self.n_points = n = len(pos)
+        self.n_cells = int(np.clip(np.sqrt(n / self.points_per_cell), 1, max_cells))
+        self.bounds = (
+            (pos[:, 0].min(), pos[:, 1].min(), pos[:, 0].max(), pos[:, 1].max())
+            if n else (-1., -1., 1., 1.))
+        # Grid cell of every point.
+        self._cells = np.empty(n, dtype=np.min_scalar_type(self.n_cells ** 2 - 1))
+        for i in range(0, n, chunk_size):
+            ix, iy = self._cell_xy(pos[i:i + chunk_size])
+            self._cells[i:i + chunk_size] = iy * self.n_cells + ix
+        self.boxes = {}
+        self._box_ids = None
+        self.set_box_index(box_index)
+
+    def _cell_xy(self, points):
+        """Return the grid cell of some points, as integer x and y arrays."""
+        x0, y0, x1, y1 = self.bounds
+        n = self.n_cells
+        ix = np.floor((points[:, 0] - x0) * (n / ((x1 - x0) or 1.)))
+        iy = np.floor((points[:, 1] - y0) * (n / ((y1 - y0) or 1.)))
+        return np.clip(ix, 0, n - 1).astype(np.int64), np.clip(iy, 0, n - 1).astype(np.int64)
+
+    def set_box_index(self, box_index):
+        """Set the box of every point."""
+        if box_index is None:
+            self.boxes, self._box_ids = {}, None
+            return
+        box_index = np.asarray(box_index)
+        assert len(box_index) == self.n_points
+        if not self.n_points:
+            self.boxes, self._box_ids = {}, None
+            return
+        box_index = box_index.reshape((self.n_points, -1))
+        if (box_index == box_index[0]).all():
+            # All points are in the same box.
+            self.boxes, self._box_ids = {_box_key(box_index[0]): 0}, None
+            return
+        boxes, ids = np.unique(box_index, axis=0, return_inverse=True)
+        self.boxes = {_box_key(box): i for i, box in enumerate(boxes)}
+        self._box_ids = ids.ravel().astype(np.min_scalar_type(len(boxes) - 1))
+
+    def _cell_states(self, polygon):
+        """Return, for every cell, 0 if it is outside the polygon, 1 if it is inside, and 2 if
+        it is crossed by an edge of the polygon."""
+        n = self.n_cells
+        x0, y0, x1, y1 = self.bounds
+        w, h = ((x1 - x0) or 1.) / n, ((y1 - y0) or 1.) / n
+        states = np.zeros((n, n), dtype=np.uint8)
+
+        # Split every edge in pieces smaller than a cell: the cells of the two ends of a piece
+        # contain the whole piece.
+        p0 = polygon
+        p1 = np.roll(polygon, -1, axis=0)
+        d = p1 - p0
+        k = np.maximum(1, np.ceil(np.max(np.abs(d) / (w, h), axis=1))).astype(np.int64)
+        edge = np.repeat(np.arange(len(polygon)), k + 1)
+        t = np.arange(len(edge)) - np.repeat(np.cumsum(k + 1) - (k + 1), k + 1)
+        points = p0[edge] + d[edge] * (t / k[edge])[:, np.newaxis]
+        ix, iy = self._cell_xy(points)
+        same = edge[:-1] == edge[1:]
+        ixa, ixb, iya, iyb = ix[:-1][same], ix[1:][same], iy[:-1][same], iy[1:][same]
+        for i, j in ((ixa, iya), (ixa, iyb), (ixb, iya), (ixb, iyb)):
+            states[j, i] = 2
+
+        # The other cells in the bounding box of the polygon are either inside or outside.
+        (i0, i1), (j0, j1) = self._cell_xy(np.array([polygon.min(axis=0), polygon.max(axis=0)]))
+        sub = states[j0:j1 + 1, i0:i1 + 1]
+        j, i = np.nonzero(sub == 0)
+        centers = np.c_[x0 + (i0 + i + .5) * w, y0 + (j0 + j + .5) * h]
+        inside = _in_polygon(centers, polygon)
+        sub[j[inside], i[inside]] = 1
+        return states.ravel()
+
+    def in_polygon(self, polygon, box=None):
+        """Return which points belong to a polygon, as a boolean array.
+
+        Parameters
+        ----------
+
+        polygon : array-like
+            An `(n_vertices, 2)` array with the vertices of the polygon.
+        box : int or tuple
+            If set, only the points in this box can be selected.
+
+        """
+        polygon = np.asarray(polygon, dtype=np.float64).reshape((-1, 2))
+        out = np.zeros(self.n_points, dtype=bool)
+        if len(polygon) < 3 or not self.n_points:
+            return out
+        if self.data_bounds is not None:
+            polygon = Range(NDC, self.data_bounds).apply(polygon)
+
+        # Reject all points if the polygon does not intersect their bounding box.
+        x0, y0, x1, y1 = self.bounds
+        (px0, py0), (px1, py1) = polygon.min(axis=0), polygon.max(axis=0)
+        if px1 < x0 or px0 > x1 or py1 < y0 or py0 > y1:
+            return out
+
+        # Cell states of the requested box.
+        states = self._cell_states(polygon)
+        if self._box_ids is not None:
+            lookup = np.zeros((len(self.boxes), len(states)), dtype=np.uint8)
+            if box is None:
+                lookup[:] = states
+            elif _box_key(box) in self.boxes:
+                lookup[self.boxes[_box_key(box)]] = states
+            lookup = lookup.ravel()
+        elif box is None or _box_key(box) in self.boxes:
+            lookup = states
+        else:
+            return out
+
+        # Only the points in the cells crossed by the polygon edges are tested.
+        for i in range(0, self.n_points, self.chunk_size):
+            s = slice(i, i + self.chunk_size)
+            codes = self._cells[s]
+            if self._box_ids is not None:
+                codes = self._box_ids[s].astype(np.int64) * len(states) + codes
+            chunk = lookup[codes]
+            out[s] = chunk == 1
+            candidates = i + np.flatnonzero(chunk == 2)
+            out[candidates] = _in_polygon(self.pos[candidates], polygon)
+        return out
+
+
 #------------------------------------------------------------------------------
 # Misc
 #------------------------------------------------------------------------------
 
+_SHADERS = {}
+
+
 def _load_shader(filename):
-    """Load a shader file."""
-    path = Path(__file__).parent / 'glsl' / filename
-    if not path.exists():
-        return
-    return path.read_text()
+    """Load a shader file, only once."""
+    if filename not in _SHADERS:
+        path = Path(__file__).parent / 'glsl' / filename
+        _SHADERS[filename] = path.read_text() if path.exists() else None
+    return _SHADERS[filename]
 
 
 def _tesselate_histogram(hist):
@@ -239,7 +663,14 @@ def _in_polygon(points, polygon):
     polygon = _as_array(polygon)
     assert points.ndim == 2
     assert polygon.ndim == 2
-    if len(polygon):
-        polygon = np.vstack((polygon, polygon[0]))
+    out = np.zeros(len(points), dtype=bool)
+    if not len(polygon):
+        return out
+    # Only test the points in the bounding box of the polygon.
+    (x0, y0), (x1, y1) = polygon.min(axis=0), polygon.max(axis=0)
+    x, y = points[:, 0], points[:, 1]
+    idx = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+    polygon = np.vstack((polygon, polygon[0]))
     path = Path(polygon, closed=True)
-    return path.contains_points(points)
+    out[idx] = path.contains_points(points[idx])
+    return out
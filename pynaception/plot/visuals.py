@@ -16,15 +16,18 @@ The `validate()` method is used to fill default values and validate the requeste
 
 import gzip
 from pathlib import Path
+import weakref
 
 import numpy as np
 
+from . import gloo
 from .base import BaseVisual
 from .gloo import gl
 from .transform import NDC
 from .utils import (
-    _tesselate_histogram, _get_texture, _get_array, _get_pos, _get_index)
-from gui.qt import is_high_dpi
+    _tesselate_histogram, _get_texture, _get_array, _get_pos, _get_index, _pack_color,
+    _pack_index, _fill_affine, _fill_segments)
+from ..qt import is_high_dpi
 from phylib.io.array import _as_array
 from phylib.utils import Bunch
 from phylib.utils.geometry import _get_data_bounds
@@ -102,7 +105,7 @@ class PatchVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
         if data.data_bounds is not None:
             self.data_range.from_bounds = data.data_bounds
             pos_tr = self.transforms.apply(data.pos)
@@ -116,7 +119,7 @@ class PatchVisual(BaseVisual):
 
     def set_color(self, color):
         """Change the color of the markers."""
-        color = _get_array(color, (self.n_vertices, 4), PatchVisual.default_color)
+        color = _get_array(color, (self._get_state('n_vertices'), 4), PatchVisual.default_color)
         self.program['a_color'] = color.astype(np.float32)
 
 
@@ -133,6 +136,14 @@ class ScatterVisual(BaseVisual):
     marker : string (used for all points in the scatter visual)
         Default: disc. Can be one of: arrow, asterisk, chevron, clover, club, cross, diamond,
         disc, ellipse, hbar, heart, infinity, pin, ring, spade, square, tag, triangle, vbar
+    color_index : string
+        Name of a GLSL variable, for example `a_box_index` provided by a layout. If set, the
+        color of every point is fetched from a lookup texture at this index (see
+        `set_color_lookup()`), and the `color` parameter is ignored. Changing the colors then
+        only requires uploading one color per index, instead of one color per point.
+    gpu_bounds : boolean
+        If True, the data bounds are applied on the GPU: all points share the same data bounds,
+        which can be changed with `set_data_bounds()` without uploading the points again.
 
     Parameters
     ----------
@@ -147,7 +158,7 @@ class ScatterVisual(BaseVisual):
     data_bounds : array-like (2D, shape[1] == 4)
 
     """
-    _init_keywords = ('marker',)
+    _init_keywords = ('marker', 'color_index', 'gpu_bounds')
     default_marker_size = 10.
     default_marker = 'disc'
     default_color = DEFAULT_COLOR
@@ -173,7 +184,7 @@ class ScatterVisual(BaseVisual):
         'vbar',
     )
 
-    def __init__(self, marker=None, marker_scaling=None):
+    def __init__(self, marker=None, marker_scaling=None, color_index=None, gpu_bounds=False):
         super(ScatterVisual, self).__init__()
 
         # Set the marker type.
@@ -187,6 +198,19 @@ class ScatterVisual(BaseVisual):
         self.set_primitive_type('points')
         self.set_data_range(NDC)
 
+        self.color_index = color_index
+        if color_index:
+            self.inserter.insert_vert('''
+                uniform sampler2D u_color_lookup;
+                uniform float u_n_colors;
+            ''', 'header')
+            # Sample the center of the texel.
+            self.inserter.insert_vert('''
+                v_color = texture2D(u_color_lookup, vec2(({} + .5) / u_n_colors, .5));
+            '''.format(color_index), 'end')
+        if gpu_bounds:
+            self._init_gpu_bounds()
+
     def vertex_count(self, x=None, y=None, pos=None, **kwargs):
         """Number of vertices for the requested data."""
         return y.size if y is not None else len(pos)
@@ -204,7 +228,8 @@ class ScatterVisual(BaseVisual):
         n = pos.shape[0]
 
         # Validate the data.
-        color = _get_array(color, (n, 4), ScatterVisual.default_color, dtype=np.float32)
+        if not self.color_index:
+            color = _get_array(color, (n, 4), ScatterVisual.default_color, dtype=np.float32)
         size = _get_array(size, (n, 1), ScatterVisual.default_marker_size)
         depth = _get_array(depth, (n, 1), 0)
         if data_bounds is not None:
@@ -218,27 +243,47 @@ class ScatterVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
-        if data.data_bounds is not None:
+        self._set_state(n_vertices=self.vertex_count(**data))
+        if self.gpu_bounds:
+            data_bounds = data.data_bounds if data.data_bounds is not None else NDC
+            assert np.all(data_bounds == np.atleast_2d(data_bounds)[0])
+            pos_tr = self._apply_data_origin(data.pos, np.atleast_2d(data_bounds)[:1])
+        elif data.data_bounds is not None:
             self.data_range.from_bounds = data.data_bounds
-            pos_tr = self.transforms.apply(data.pos)
+            pos_tr = self._apply_origin(self.transforms.apply(data.pos))
         else:
-            pos_tr = data.pos
-        pos_tr = np.c_[pos_tr, data.depth]
-        self.program['a_position'] = pos_tr.astype(np.float32)
-        self.program['a_size'] = data.size.astype(np.float32)
-        self.program['a_color'] = data.color.astype(np.float32)
+            pos_tr = self._apply_origin(data.pos)
+        if data.depth.any():
+            pos_tr = np.c_[pos_tr, data.depth]
+        # Float32 contiguous positions are uploaded without any copy.
+        attributes = dict(a_position=pos_tr, a_size=data.size)
+        if not self.color_index:
+            attributes['a_color'] = data.color
+        self.set_vertex_data(**attributes)
+        self.set_spatial_index(data.pos, data_bounds=data.data_bounds)
         self.emit_visual_set_data()
         return data
 
     def set_color(self, color):
         """Change the color of the markers."""
-        color = _get_array(color, (self.n_vertices, 4), ScatterVisual.default_color)
-        self.program['a_color'] = color.astype(np.float32)
+        color = _get_array(color, (self._get_state('n_vertices'), 4), ScatterVisual.default_color)
+        self.set_vertex_data(a_color=color)
+
+    def set_color_lookup(self, colors):
+        """Set the colors fetched at `color_index`, as an `(n_colors, 4)` array.
+
+        Only this small texture is uploaded, whatever the number of points.
+
+        """
+        assert self.color_index
+        colors = np.asarray(colors, dtype=np.float32)
+        assert colors.ndim == 2 and colors.shape[1] == 4
+        self.program['u_color_lookup'] = colors[np.newaxis, ...]
+        self.program['u_n_colors'] = float(len(colors))
 
     def set_marker_size(self, marker_size):
         """Change the size of the markers."""
-        size = _get_array(marker_size, (self.n_vertices, 1))
+        size = _get_array(marker_size, (self._get_state('n_vertices'), 1))
         assert np.all(size > 0)
         self.program['a_size'] = size.astype(np.float32)
 
@@ -337,7 +382,7 @@ class UniformScatterVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
         if data.data_bounds is not None:
             self.data_range.from_bounds = data.data_bounds
             pos_tr = self.transforms.apply(data.pos)
@@ -352,6 +397,7 @@ class UniformScatterVisual(BaseVisual):
         self.program['u_size'] = self.marker_size
         self.program['u_color'] = self.color
         self.program['u_mask_max'] = _max(masks)
+        self.set_spatial_index(data.pos, data_bounds=data.data_bounds)
         self.emit_visual_set_data()
         return data
 
@@ -380,9 +426,80 @@ def _max(arr):
     return arr.max() if arr is not None and len(arr) > 0 else 1
 
 
+def _affine_bounds(x, y, scale, shift):
+    """Bounding box of the signals `(x[i], y[i])` after the affine transforms
+    `(scale[i], shift[i])`, without transforming the signals."""
+    lo, hi = [], []
+    for xi, yi, a, b in zip(x, y, scale, shift):
+        if not len(xi):
+            continue
+        corners = np.array([[xi.min(), yi.min()], [xi.max(), yi.max()]]) * a + b
+        lo.append(corners.min(axis=0))
+        hi.append(corners.max(axis=0))
+    if not lo:
+        return np.zeros(2), np.zeros(2)
+    return np.min(lo, axis=0), np.max(hi, axis=0)
+
+
+def _fill_plot_positions(visual, pos, x, y, data_bounds, segments):
+    """Write the positions of the signals `(x[i], y[i])` in the `(n, 2+)` float32 array `pos`,
+    normalized with one row of data bounds per signal (on the CPU or on the GPU), and relative
+    to the origin of the visual."""
+    n_signals = len(y)
+    x = [np.asarray(_) for _ in x]
+    y = [np.asarray(_) for _ in y]
+
+    # One affine transform per signal normalizes the positions.
+    scale, shift = np.ones((n_signals, 2)), np.zeros((n_signals, 2))
+    if visual.gpu_bounds:
+        data_bounds = data_bounds if data_bounds is not None else NDC
+        data_bounds = _get_data_bounds(data_bounds, length=n_signals)
+    elif data_bounds is not None:
+        visual.data_range.from_bounds = data_bounds
+        visual.data_range.segments = segments
+        affine = visual.transforms.get_affine()
+        assert affine is not None
+        scale = np.broadcast_to(affine[0], (n_signals, 2))
+        shift = np.broadcast_to(affine[1], (n_signals, 2))
+
+    # The positions are uploaded relative to an origin, at the center of the data.
+    xy_min, xy_max = _affine_bounds(x, y, scale, shift)
+    if visual.gpu_bounds:
+        origin = visual._set_data_origin(.5 * (xy_min + xy_max), data_bounds)
+    else:
+        origin = visual._get_origin(xy_min, xy_max)
+    if origin is not None:
+        shift = shift - origin
+
+    _fill_affine(pos[:, 0], x, scale[:, 0], shift[:, 0], segments)
+    _fill_affine(pos[:, 1], y, scale[:, 1], shift[:, 1], segments)
+    return pos
+
+
+def _get_segments(n_samples):
+    """Vertex offsets of the signals, drawn as separate line strips in a single draw call.
+
+    Return None with a single signal.
+
+    """
+    if len(n_samples) <= 1:
+        return None
+    return np.r_[0, np.cumsum(n_samples)].astype(np.int32)
+
+
 class PlotVisual(BaseVisual):
     """Plot visual, with multiple line plots of various sizes and colors.
 
+    Constructor
+    -----------
+
+    gpu_bounds : boolean
+        If True, the per-signal data bounds are applied on the GPU. The samples are uploaded
+        once, and `set_data_bounds()` only uploads the bounds (gain, offset, y-autoscaling).
+        This requires a per-vertex signal index attribute.
+
+    The signals are drawn as separate line strips with a single draw call.
+
     Parameters
     ----------
 
@@ -396,15 +513,19 @@ class PlotVisual(BaseVisual):
 
     """
 
+    _init_keywords = ('gpu_bounds',)
     default_color = DEFAULT_COLOR
     _noconcat = ('x', 'y')
 
-    def __init__(self):
+    def __init__(self, gpu_bounds=False):
         super(PlotVisual, self).__init__()
 
         self.set_shader('plot')
         self.set_primitive_type('line_strip')
         self.set_data_range(NDC)
+        if gpu_bounds:
+            self.inserter.insert_vert('attribute float a_signal_index;', 'header')
+            self._init_gpu_bounds('a_signal_index')
 
     def validate(
             self, x=None, y=None, color=None, depth=None, masks=None, data_bounds=None, **kwargs):
@@ -456,8 +577,8 @@ class PlotVisual(BaseVisual):
 
     def set_color(self, color):
         """Update the visual's color."""
-        assert color.shape == (self.n_vertices, 4)
-        self.program['a_color'] = color.astype(np.float32)
+        assert color.shape == (self._get_state('n_vertices'), 4)
+        self.set_vertex_data(a_color=color)
 
     def vertex_count(self, y=None, **kwargs):
         """Number of vertices for the requested data."""
@@ -467,7 +588,7 @@ class PlotVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
 
         assert isinstance(data.y, list)
         n_signals = len(data.y)
@@ -477,45 +598,36 @@ class PlotVisual(BaseVisual):
         self.n_samples = n_samples
 
         n = sum(n_samples)
-        x = np.concatenate(data.x) if len(data.x) else np.array([])
-        y = np.concatenate(data.y) if len(data.y) else np.array([])
-
-        # Generate the position array.
-        pos = np.empty((n, 2), dtype=np.float64)
-        pos[:, 0] = x.ravel()
-        pos[:, 1] = y.ravel()
-        assert pos.shape == (n, 2)
-
-        # Generate the color attribute.
-        color = data.color
-        assert color.shape == (n_signals, 4)
-        color = np.repeat(color, n_samples, axis=0)
-        assert color.shape == (n, 4)
-
-        # Generate signal index.
-        signal_index = np.repeat(np.arange(n_signals), n_samples)
-        signal_index = _get_array(signal_index, (n, 1))
-        assert signal_index.shape == (n, 1)
-
-        # Transform the positions.
-        if data.data_bounds is not None:
-            data_bounds = np.repeat(data.data_bounds, n_samples, axis=0)
-            self.data_range.from_bounds = data_bounds
-            pos = self.transforms.apply(pos)
-
-        # Masks.
-        masks = np.repeat(data.masks, n_samples, axis=0)
-        assert masks.shape == (n, 1)
-
-        # Position and depth.
-        depth = np.repeat(data.depth, n_samples, axis=0)
-        pos_depth = np.c_[pos, depth]
-
-        self.program['a_position'] = pos_depth.astype(np.float32)
-        self.program['a_color'] = color.astype(np.float32)
-        self.program['a_signal_index'] = signal_index.astype(np.float32)
-        self.program['a_mask'] = masks.astype(np.float32)
-        self.program['u_mask_max'] = _max(masks)
+        segments = np.r_[0, np.cumsum(n_samples)]
+
+        # Packed vertex attributes, with a single value per signal.
+        color = _pack_color(data.color) if self.compact else data.color.astype(np.float32)
+        formats = dict(
+            a_position=(np.float32, 3 if data.depth.any() else 2),
+            a_color=(color.dtype, 4),
+            a_mask=(np.float32, 1),
+        )
+        if self.gpu_bounds:
+            # Signal index, to fetch the data normalization of every vertex.
+            signal_index = np.arange(n_signals)
+            signal_index = (
+                _pack_index(signal_index) if self.compact else signal_index.astype(np.float32))
+            formats['a_signal_index'] = (signal_index.dtype, 1)
+
+        # The vertices are written in place: the data is not copied before the upload.
+        vertices = self._vertex_array(n, **formats)
+        pos = vertices['a_position']
+        _fill_plot_positions(self, pos, data.x, data.y, data.data_bounds, segments)
+        if pos.shape[1] == 3:
+            _fill_segments(pos[:, 2], data.depth[:, 0], segments)
+        _fill_segments(vertices['a_color'], color, segments)
+        _fill_segments(vertices['a_mask'], data.masks, segments)
+        if self.gpu_bounds:
+            _fill_segments(vertices['a_signal_index'][:, 0], signal_index, segments)
+
+        self.set_vertex_array(vertices)
+        self.program['u_mask_max'] = _max(data.masks)
+        self._set_state(segments=_get_segments(n_samples))
 
         self.emit_visual_set_data()
         return data
@@ -598,46 +710,23 @@ class UniformPlotVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
 
         assert isinstance(data.y, list)
-        n_signals = len(data.y)
         n_samples = [len(_) for _ in data.y]
         n = sum(n_samples)
-        x = np.concatenate(data.x) if len(data.x) else np.array([])
-        y = np.concatenate(data.y) if len(data.y) else np.array([])
-
-        # Generate the position array.
-        pos = np.empty((n, 2), dtype=np.float64)
-        pos[:, 0] = x.ravel()
-        pos[:, 1] = y.ravel()
-        assert pos.shape == (n, 2)
-
-        # Generate signal index.
-        signal_index = np.repeat(np.arange(n_signals), n_samples)
-        signal_index = _get_array(signal_index, (n, 1))
-        assert signal_index.shape == (n, 1)
-
-        # Masks.
-        masks = np.repeat(data.masks, n_samples, axis=0)
+        segments = np.r_[0, np.cumsum(n_samples)]
 
-        # Transform the positions.
-        if data.data_bounds is not None:
-            data_bounds = np.repeat(data.data_bounds, n_samples, axis=0)
-            self.data_range.from_bounds = data_bounds
-            pos = self.transforms.apply(pos)
-
-        assert pos.shape == (n, 2)
-        assert signal_index.shape == (n, 1)
-        assert masks.shape == (n, 1)
-
-        # Position and depth.
-        self.program['a_position'] = pos.astype(np.float32)
-        self.program['a_signal_index'] = signal_index.astype(np.float32)
-        self.program['a_mask'] = masks.astype(np.float32)
+        # The vertices are written in place: the data is not copied before the upload.
+        vertices = self._vertex_array(n, a_position=(np.float32, 2), a_mask=(np.float32, 1))
+        _fill_plot_positions(
+            self, vertices['a_position'], data.x, data.y, data.data_bounds, segments)
+        _fill_segments(vertices['a_mask'], data.masks, segments)
 
+        self.set_vertex_array(vertices)
         self.program['u_color'] = self.color
-        self.program['u_mask_max'] = _max(masks)
+        self.program['u_mask_max'] = _max(data.masks)
+        self._set_state(segments=_get_segments(n_samples))
 
         self.emit_visual_set_data()
         return data
@@ -704,7 +793,7 @@ class HistogramVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
         hist = data.hist
 
         n_hists, n_bins = hist.shape
@@ -745,6 +834,36 @@ SDF_SIZE = 64
 GLYPH_SIZE = (40, 64)
 FONT_MAP_CHARS = ''.join(chr(i) for i in range(32, 32 + FONT_MAP_SIZE[0] * FONT_MAP_SIZE[1]))
 
+_FONT_MAP = None
+# Font map textures shared by the text visuals of every canvas (one OpenGL context per canvas).
+_FONT_TEXTURES = weakref.WeakKeyDictionary()
+
+
+def _load_font_map():
+    """Load the multi signed distance field font map once, flipped for OpenGL."""
+    global _FONT_MAP
+    if _FONT_MAP is None:
+        with gzip.open(str(FONT_MAP_PATH), 'rb') as f:
+            _FONT_MAP = np.ascontiguousarray(np.load(f)[::-1, :])
+    return _FONT_MAP
+
+
+def _get_font_texture(canvas):
+    """Return the font map texture of a canvas, which is uploaded only once."""
+    if canvas is None:
+        return _load_font_map().view(gloo.Texture2D)
+    if canvas not in _FONT_TEXTURES:
+        _FONT_TEXTURES[canvas] = _load_font_map().view(gloo.Texture2D)
+    return _FONT_TEXTURES[canvas]
+
+
+def _get_glyph_indices(text):
+    """Return the indices of the characters of a string in the font map."""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype='<u4').astype(np.int64) - 32
+    if len(codes) and not (0 <= codes.min() and codes.max() < len(FONT_MAP_CHARS)):
+        raise ValueError("Unsupported characters in %s." % text)
+    return codes
+
 
 class TextVisual(BaseVisual):
     """Display strings at multiple locations.
@@ -802,12 +921,13 @@ class TextVisual(BaseVisual):
             self.font_size *= 2
         assert self.font_size > 0
 
-        # Load the multi signed distance field font map.
-        with gzip.open(str(FONT_MAP_PATH), 'rb') as f:
-            self._tex = np.load(f)
+        # The multi signed distance field font map is shared by all text visuals.
+        self._tex = _load_font_map()
+        # Text, anchors and colors of the glyph attributes on the GPU.
+        self._glyphs_key = None
 
     def _get_glyph_indices(self, s):
-        return [FONT_MAP_CHARS.index(char) for char in s]
+        return _get_glyph_indices(s)
 
     def validate(
             self, pos=None, text=None, color=None, anchor=None, data_bounds=None, **kwargs):
@@ -852,73 +972,27 @@ class TextVisual(BaseVisual):
             pos=pos, text=text, anchor=anchor, data_bounds=data_bounds, color=color,
             _n_items=n_text, _n_vertices=self.vertex_count(text=text))
 
-    def vertex_count(self, **kwargs):
-        """Number of vertices for the requested data."""
-        """Take the output of validate() as input."""
-        # Total number of glyphs * 6 (6 vertices per glyph).
-        return sum(map(len, kwargs.get('text', ''))) * 6
-
-    def set_data(self, *args, **kwargs):
-        """Update the visual data."""
-        data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
-
-        pos = data.pos.astype(np.float64)
-        assert pos.ndim == 2
-        assert pos.shape[1] == 2
-        assert pos.dtype == np.float64
-
-        # Concatenate all strings.
-        text = data.text
-        n_text = len(text)
-        lengths = list(map(len, text))
-        assert isinstance(text, list)
-        text = ''.join(text)
-        a_char_index = self._get_glyph_indices(text)
-        n_glyphs = len(a_char_index)
+    def _set_glyphs(self, data, lengths):
+        """Upload the attributes of the glyphs of all strings, and the font map."""
+        n_text = len(lengths)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        n_glyphs = int(lengths.sum())
+        n_vertices = n_glyphs * 6
 
-        tex = self._tex
-        glyph_height = tex.shape[0] // 6
-        glyph_width = tex.shape[1] // 16
-        glyph_size = (glyph_width * self.font_size / 12, glyph_height * self.font_size / 12)
+        a_char_index = self._get_glyph_indices(''.join(data.text))
+        # Index of every glyph in its string: 0, 1, 2, 0, 1, 0, 1, 2, 3...
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        a_glyph_index = np.arange(n_glyphs) - starts
+        a_quad_index = np.tile(np.arange(6), n_glyphs)
 
-        # Position of all glyphs.
-        a_position = np.repeat(pos, lengths, axis=0)
-        if not len(lengths):
-            a_glyph_index = np.zeros((0,))
-        else:
-            a_glyph_index = np.concatenate([np.arange(n) for n in lengths])
-        a_quad_index = np.arange(6)
+        a_anchor = np.repeat(data.anchor, 6 * lengths, axis=0)
+        a_color = np.repeat(data.color, 6 * lengths, axis=0)
+        a_lengths = np.repeat(lengths, 6 * lengths)
+        a_string_index = np.repeat(np.arange(n_text), 6 * lengths)
 
-        a_position = np.repeat(a_position, 6, axis=0)
         a_glyph_index = np.repeat(a_glyph_index, 6)
-        a_quad_index = np.tile(a_quad_index, n_glyphs)
         a_char_index = np.repeat(a_char_index, 6)
 
-        a_anchor = np.repeat(data.anchor, lengths, axis=0)
-        a_anchor = np.repeat(a_anchor, 6, axis=0)
-
-        a_color = np.repeat(data.color, lengths, axis=0)
-        a_color = np.repeat(a_color, 6, axis=0)
-
-        a_lengths = np.repeat(lengths, lengths)
-        a_lengths = np.repeat(a_lengths, 6)
-
-        a_string_index = np.repeat(np.arange(n_text), lengths)
-        a_string_index = np.repeat(a_string_index, 6)
-
-        n_vertices = n_glyphs * 6
-
-        # Transform the positions.
-        assert data.data_bounds is not None
-        data_bounds = data.data_bounds
-        data_bounds = np.repeat(data_bounds, lengths, axis=0)
-        data_bounds = np.repeat(data_bounds, 6, axis=0)
-        assert data_bounds.shape == (n_vertices, 4)
-        self.data_range.from_bounds = data_bounds
-        pos_tr = self.transforms.apply(a_position)
-        assert pos_tr.shape == (n_vertices, 2)
-
         assert a_glyph_index.shape == (n_vertices,)  # 000000111111...
         assert a_quad_index.shape == (n_vertices,)  # 012345012345....
         assert a_char_index.shape == (n_vertices,)  # 67.67.67.67.67.67.97.97.97.97.97...
@@ -927,7 +1001,6 @@ class TextVisual(BaseVisual):
         assert a_lengths.shape == (n_vertices,)  # 7777777777777777777...
         assert a_string_index.shape == (n_vertices,)  # 000000000000000111111111111...
 
-        self.program['a_position'] = pos_tr.astype(np.float32)
         self.program['a_color'] = a_color.astype(np.float32)
         self.program['a_glyph_index'] = a_glyph_index.astype(np.float32)
         self.program['a_quad_index'] = a_quad_index.astype(np.float32)
@@ -936,11 +1009,55 @@ class TextVisual(BaseVisual):
         self.program['a_lengths'] = a_lengths.astype(np.float32)
         self.program['a_string_index'] = a_string_index.astype(np.float32)
 
-        self.program['u_glyph_size'] = glyph_size
-        self.program['u_color'] = self.color
+        if self._glyphs_key is None:
+            tex = self._tex
+            glyph_height = tex.shape[0] // 6
+            glyph_width = tex.shape[1] // 16
+            glyph_size = (
+                glyph_width * self.font_size / 12, glyph_height * self.font_size / 12)
+            self.program['u_glyph_size'] = glyph_size
+            self.program['u_color'] = self.color
+            # The font map texture is shared by the text visuals of the canvas.
+            self.program['u_tex'] = _get_font_texture(getattr(self, 'canvas', None))
+            self.program['u_tex_size'] = tex.shape[:2]
+
+    def vertex_count(self, **kwargs):
+        """Number of vertices for the requested data."""
+        """Take the output of validate() as input."""
+        # Total number of glyphs * 6 (6 vertices per glyph).
+        return sum(map(len, kwargs.get('text', ''))) * 6
+
+    def set_data(self, *args, **kwargs):
+        """Update the visual data."""
+        data = self.validate(*args, **kwargs)
+        self._set_state(n_vertices=self.vertex_count(**data))
+
+        pos = data.pos.astype(np.float64)
+        assert pos.ndim == 2
+        assert pos.shape[1] == 2
+        assert pos.dtype == np.float64
 
-        self.program['u_tex'] = tex[::-1, :]
-        self.program['u_tex_size'] = tex.shape[:2]
+        text = data.text
+        lengths = list(map(len, text))
+        assert isinstance(text, list)
+        n_vertices = sum(lengths) * 6
+
+        # Transform the positions of the strings, before repeating them for every vertex.
+        assert data.data_bounds is not None
+        self.data_range.from_bounds = data.data_bounds
+        pos_tr = self.transforms.apply(pos)
+
+        # Position of all glyphs.
+        a_position = np.repeat(pos_tr, 6 * np.asarray(lengths, dtype=np.int64), axis=0)
+        assert a_position.shape == (n_vertices, 2)
+        self.program['a_position'] = a_position.astype(np.float32)
+
+        # The glyph attributes only depend on the text, anchors and colors: they are not
+        # uploaded again when only the positions change (e.g. the tick labels of the axes).
+        glyphs_key = (tuple(data.text), data.anchor.tobytes(), data.color.tobytes())
+        if glyphs_key != self._glyphs_key:
+            self._set_glyphs(data, lengths)
+            self._glyphs_key = glyphs_key
 
         self.emit_visual_set_data()
         return data
@@ -1008,7 +1125,7 @@ class LineVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
 
         pos = data.pos
         assert pos.ndim == 2
@@ -1019,17 +1136,16 @@ class LineVisual(BaseVisual):
         pos = pos.reshape((-1, 2))
 
         # Transform the positions.
-        data_bounds = np.repeat(data.data_bounds, 2, axis=0)
-        self.data_range.from_bounds = data_bounds
+        self.data_range.from_bounds = data.data_bounds
+        self.data_range.segments = np.arange(n_lines + 1) * 2
         pos_tr = self.transforms.apply(pos)
 
         # Position.
         assert pos_tr.shape == (n_vertices, 2)
-        self.program['a_position'] = pos_tr.astype(np.float32)
 
         # Color.
         color = np.repeat(data.color, 2, axis=0)
-        self.program['a_color'] = color.astype(np.float32)
+        self.set_vertex_data(a_position=pos_tr, a_color=color)
 
         self.emit_visual_set_data()
         return data
@@ -1151,7 +1267,7 @@ class LineAggGeomVisual(BaseVisual):  # pragma: no cover
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
 
         pos = data.pos
         assert pos.ndim == 2
@@ -1168,7 +1284,7 @@ class LineAggGeomVisual(BaseVisual):  # pragma: no cover
         self.program['miter_limit'] = 4.0
         self.program['color'] = data.color
 
-        self.index_buffer = self._get_index_buffer(pos_tr, closed=False)
+        self._set_state(index_buffer=self._get_index_buffer(pos_tr, closed=False))
 
         self.emit_visual_set_data()
         return data
@@ -1258,7 +1374,7 @@ class PlotAggVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
         closed = self.closed
 
         n_signals, n_samples = data.y.shape
@@ -1281,8 +1397,8 @@ class PlotAggVisual(BaseVisual):
 
         # Transform the positions.
         if data.data_bounds is not None:
-            data_bounds = np.repeat(data.data_bounds, n_samples, axis=0)
-            self.data_range.from_bounds = data_bounds
+            self.data_range.from_bounds = data.data_bounds
+            self.data_range.segments = np.arange(n_signals + 1) * n_samples
             pos = self.transforms.apply(pos)
 
         itemsize = self.n_samples
@@ -1386,6 +1502,9 @@ class ImageVisual(BaseVisual):
     Parameters
     ----------
     image : array-like (3D)
+    bounds : array-like (4,)
+        The rectangle `(x0, y0, x1, y1)` where the image is drawn, in normalized coordinates.
+        By default, the image fills the whole box.
 
     """
 
@@ -1395,13 +1514,15 @@ class ImageVisual(BaseVisual):
         self.set_shader('image')
         self.set_primitive_type('triangles')
 
-    def validate(self, image=None, **kwargs):
+    def validate(self, image=None, bounds=None, **kwargs):
         """Validate the requested data before passing it to set_data()."""
         assert image is not None
         image = np.asarray(image, np.float32)
         assert image.ndim == 3
         assert image.shape[2] == 4
-        return Bunch(image=image, _n_items=1, _n_vertices=self.vertex_count())
+        bounds = np.asarray(bounds if bounds is not None else NDC, dtype=np.float64)
+        assert bounds.shape == (4,)
+        return Bunch(image=image, bounds=bounds, _n_items=1, _n_vertices=self.vertex_count())
 
     def vertex_count(self, image=None, **kwargs):
         """Number of vertices for the requested data."""
@@ -1410,16 +1531,17 @@ class ImageVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
         image = data.image
 
+        x0, y0, x1, y1 = data.bounds
         pos = np.array([
-            [-1, -1],
-            [-1, +1],
-            [+1, -1],
-            [-1, +1],
-            [+1, +1],
-            [+1, -1],
+            [x0, y0],
+            [x0, y1],
+            [x1, y0],
+            [x0, y1],
+            [x1, y1],
+            [x1, y0],
         ])
         tex_coords = np.array([
             [0, 1],
@@ -1484,7 +1606,7 @@ class PolygonVisual(BaseVisual):
     def set_data(self, *args, **kwargs):
         """Update the visual data."""
         data = self.validate(*args, **kwargs)
-        self.n_vertices = self.vertex_count(**data)
+        self._set_state(n_vertices=self.vertex_count(**data))
 
         pos = data.pos
         assert pos.ndim == 2
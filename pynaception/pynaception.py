@@ -6,14 +6,14 @@
 
 import sys
 
-from .gui import GUI
-from .controller import Controller
+from .datasource import DataSource
 
 
 ######### QT @@@@@@@@@@@@@@@@@@@@@@@@@@
 # from OpenGL import GL  # noqa
 
-from PyQt5.QtWidgets import QApplication
+# NOTE: the GUI, the views, Qt and OpenGL are only imported when calling scope(), so that
+# `import pynaception` remains fast.
 
 # ######### SDL2 @@@@@@@@@@@@@@@@@@@@@@@
 # import sdl2.ext
@@ -25,7 +25,9 @@ def get_pynapple_variables(variables):
     tmp = variables.copy()
     pynavar = {}
     for k, v in tmp.items():
-        if hasattr(v, '__module__'):
+        if isinstance(v, DataSource) and k[0] != '_':
+            pynavar[k] = v
+        elif hasattr(v, '__module__'):
             if "pynapple" in v.__module__ and k[0] != '_':
                 pynavar[k] = v
 
@@ -33,6 +35,10 @@ def get_pynapple_variables(variables):
 
 
 def scope(variables):
+    from PyQt5.QtWidgets import QApplication
+    from .gui import GUI
+    from .controller import Controller
+
     pynavar = get_pynapple_variables(variables)
     
     global QT_APP
@@ -5,17 +5,28 @@
 # @Last Modified time: 2022-06-01 09:39:05
 
 import gc
+import logging
+from threading import Lock
+
 import numpy as np
+from phylib.utils import Bunch
+from .event import connect, emit, unconnect
 # from .base import ManualClusteringView
-from .plot.visuals import PlotVisual
-from .raster import ScatterVisual
-from plot import PlotCanvas
+from .plot import PlotCanvas
+from .plot.utils import MinMaxPyramid, _bin_times
+from .plot.visuals import PlotVisual, ScatterVisual, ImageVisual
+from .datasource import DataSource, ChunkedEnvelope, flatten_tsgroup
+from .qt import QTimer, Worker, thread_pool
+
+logger = logging.getLogger(__name__)
 
 
 class PynaView(object):
     
-    def __init__(self, **kwargs):
+    def __init__(self, max_vertices=None, **kwargs):
         self._closed = False
+        if max_vertices is not None:
+            self.max_vertices = max_vertices
 
         # Attached GUI.
         self.gui = None
@@ -32,6 +43,214 @@ class PynaView(object):
         """Update the axes."""
         self.canvas.axes.reset_data_bounds(self.data_bounds)
 
+    # Streaming
+    # -------------------------------------------------------------------------
+
+    # Maximum number of vertices uploaded at once.
+    max_vertices = 2000000
+    # Duration loaded on each side of the visible window, relative to its duration.
+    margin = 1.
+    # Maximum ratio between the loaded and visible durations. The uploaded positions are
+    # relative to the center of the loaded window, so reloading a smaller window when zooming
+    # in keeps the float32 offsets precise.
+    max_chunk_ratio = 64.
+
+    def _init_streaming(self):
+        """Reload the visible time window in the background whenever the view is panned,
+        zoomed or resized."""
+        self._loaded = None
+        self._worker = None
+        self._pending = False
+        self._generation = 0
+        # Windows prepared for a request of this generation or older are discarded.
+        self._cancelled = 0
+        self._progress = None
+        # Window and key of the last request.
+        self._requested = None
+        # Held while a window is uploaded, so that a cancelled window is never uploaded.
+        self._upload_lock = Lock()
+
+        # Bound methods are weakly referenced by the event system, unlike closures, so that
+        # they do not keep the view alive.
+        connect(self._on_pan_zoom, event='pan', sender=self.canvas.panzoom)
+        connect(self._on_pan_zoom, event='zoom', sender=self.canvas.panzoom)
+        connect(self._on_canvas_resize, event='resize', sender=self.canvas)
+
+    def _on_pan_zoom(self, sender, value):
+        self.request_window()
+
+    def _on_canvas_resize(self, sender, w, h):
+        self.request_window()
+
+    def get_time_window(self):
+        """Return the time interval currently visible in the canvas."""
+        x0, _, x1, _ = self.canvas.panzoom.get_range()
+        t0, _, t1, _ = np.ravel(self.data_bounds)[:4]
+        a = .5 * (t1 - t0)
+        return t0 + (x0 + 1) * a, t0 + (x1 + 1) * a
+
+    def _clamp_window(self, t0, t1, count):
+        """Shrink the window `[t0, t1]` around its center until `count(t0, t1)` fits in
+        the vertex budget."""
+        for _ in range(20):
+            n = count(t0, t1)
+            if n <= self.max_vertices:
+                break
+            c, h = .5 * (t0 + t1), .5 * (t1 - t0)
+            h *= .95 * self.max_vertices / float(n)
+            t0, t1 = c - h, c + h
+        return t0, t1
+
+    def _get_window_key(self, t0, t1):
+        """Return what determines the data of a window besides its bounds, for example the
+        decimation level. To be overriden."""
+        return None
+
+    def _fetch_window(self, t0, t1, key):
+        """Return the data to upload for a time window, as a Bunch with `t0`, `t1` and
+        `key` fields. This function runs in a background thread: it must not touch the
+        canvas. To be overriden."""
+        raise NotImplementedError()
+
+    def _upload_window(self, b):
+        """Upload the data of a window returned by `_fetch_window()`. To be overriden."""
+        raise NotImplementedError()
+
+    def _is_loaded(self, t0, t1, key):
+        loaded = self._loaded
+        if loaded is None or loaded.key != key:
+            return False
+        # The last fetched window was clamped to the vertex budget for this very viewport.
+        if loaded.visible == (t0, t1):
+            return True
+        if loaded.t1 - loaded.t0 > self.max_chunk_ratio * (t1 - t0):
+            return False
+        return loaded.t0 <= t0 and t1 <= loaded.t1
+
+    def request_window(self):
+        """Prepare the visible time window plus a margin in a background thread, unless it
+        is already loaded.
+
+        The data is fetched and the visuals are updated in the thread pool, with their program
+        updates queued (lazy mode) and applied in the GUI thread once it returns. A request
+        made while a window is being prepared is started once it returns: the window being
+        prepared is still shown in the meantime, for example during a continuous pan.
+
+        """
+        if self._closed:
+            return
+        t0, t1 = self.get_time_window()
+        key = self._get_window_key(t0, t1)
+        if self._is_loaded(t0, t1, key):
+            return
+        # The pan and zoom events of a single viewport change request the same window.
+        if self._worker is not None and not self._pending and self._requested == (t0, t1, key):
+            return
+        self._requested = (t0, t1, key)
+        self._generation += 1
+        if self._worker is not None:
+            self._pending = True
+            return
+        self.canvas.set_lazy(True, visuals=self._get_lazy_visuals())
+        worker = Worker(self._prepare_window, t0, t1, key, self._generation)
+        worker.signals.result.connect(self._on_window_prepared)
+        worker.signals.progress.connect(self._on_progress)
+        worker.signals.finished.connect(self._on_prepare_finished)
+        self._worker = worker
+        thread_pool().start(worker)
+
+    def _get_lazy_visuals(self):
+        """Visuals updated by `_upload_window()`."""
+        return [self.visual]
+
+    def _is_cancelled(self, generation):
+        """Whether the window being prepared has been cancelled by `load_window()`."""
+        return self._closed or generation <= self._cancelled
+
+    def _fetch_visible_window(self, t0, t1, key):
+        d = (t1 - t0) * self.margin
+        b = self._fetch_window(t0 - d, t1 + d, key)
+        b.visible = (t0, t1)
+        return b
+
+    def _prepare_window(self, t0, t1, key, generation):
+        # NOTE: this runs in a background thread.
+        worker = self._worker
+        worker.report_progress(0.)
+        b = self._fetch_visible_window(t0, t1, key)
+        worker.report_progress(.5)
+        with self._upload_lock:
+            # The window may have been cancelled by `load_window()`.
+            if self._is_cancelled(generation):
+                return
+            self._upload_window(b)
+        worker.report_progress(1.)
+        # Or the view may have been closed during the upload.
+        if self._is_cancelled(generation):
+            return
+        b.generation = generation
+        return b
+
+    def _on_window_prepared(self, b):
+        if b is None or self._is_cancelled(b.generation):
+            return
+        self._loaded = b
+
+    def _on_prepare_finished(self):
+        self._worker = None
+        self._on_progress(None)
+        if self._closed:
+            return
+        # The queued updates are applied now, as the next request would make the visuals
+        # lazy again before the next frame.
+        self.canvas.set_lazy(False, visuals=self._get_lazy_visuals())
+        self.canvas.flush_update_queue()
+        self.canvas.update()
+        if self._pending:
+            self._pending = False
+            self.request_window()
+
+    def _on_progress(self, value):
+        self._progress = value
+        self.update_status()
+
+    def load_window(self):
+        """Load the visible time window synchronously.
+
+        The window being prepared in the background, if any, is cancelled. If its updates
+        were already queued, they are applied first and overwritten by this window.
+
+        """
+        with self._upload_lock:
+            self._cancelled = self._generation
+            self._generation += 1
+            self.canvas.set_lazy(False, visuals=self._get_lazy_visuals())
+            self.canvas.flush_update_queue()
+            t0, t1 = self.get_time_window()
+            b = self._fetch_visible_window(t0, t1, self._get_window_key(t0, t1))
+            b.generation = self._generation
+            self._loaded = b
+            self._upload_window(b)
+        self.canvas.update()
+
+    # Status
+    # -------------------------------------------------------------------------
+
+    @property
+    def status(self):
+        """Status text shown in the dock, to be overriden."""
+        return ''
+
+    def update_status(self):
+        """Update the status text of the dock, with the progress of the window being
+        prepared, if any."""
+        if not hasattr(self, 'dock'):
+            return
+        text = self.status
+        progress = getattr(self, '_progress', None)
+        if progress is not None:
+            text = (text + ' - ' if text else '') + 'loading %d%%' % (100 * progress)
+        self.dock.set_status(text)
 
     def plot(self, **kwargs):  # pragma: no cover
         """Update the view with the current cluster selection."""
@@ -48,53 +267,95 @@ class PynaView(object):
         """        
         gui.add_view(self, position=None)
         self.gui = gui
+        self.update_status()
 
     def show(self):
         """Show the underlying canvas."""
         return self.canvas.show()
 
     def close(self):
-        """Close the view."""
-        if hasattr(self, 'dock'):
-            return self.dock.close()
-        self.canvas.close()
+        """Close the view, and its dock if it is attached to a GUI."""
+        if self._closed:
+            return
         self._closed = True
-        unconnect(self)
-        gc.collect(0)   
+        # The view, the canvas and the panzoom no longer receive events.
+        unconnect(self, self.canvas, self.canvas.panzoom)
+        if hasattr(self, 'dock'):
+            self.dock.close()
+        else:
+            self.canvas.close()
+        gc.collect(0)
 
 
 
 class TsdView(PynaView):
+    """This view shows a time series as a line plot.
 
+    The signal is drawn from a min/max decimation pyramid: only the envelope of the visible
+    time window is uploaded, with a number of vertices proportional to the canvas width.
+
+    Constructor
+    -----------
+
+    tsd : Tsd or DataSource
+        The time series to show.
+
+    """
+
+    # Number of vertices uploaded per horizontal pixel.
+    points_per_pixel = 2
+    color = (0.7, 0.8, 0.45, 1)
 
     def __init__(self, tsd, **kwargs):
 
         super(TsdView, self).__init__(**kwargs)
 
         self.tsd = tsd
+        if isinstance(tsd, DataSource):
+            # Lazy sources are decimated on the fly, reading only the visible window.
+            self.pyramid = ChunkedEnvelope(tsd)
+        else:
+            self.pyramid = MinMaxPyramid(tsd.index.values, tsd.values)
 
         self.canvas.set_layout('stacked', n_plots=1)
         self.canvas.enable_axes()
 
         self.visual = PlotVisual()
+        # Packed vertex layout: 2D float32 position, uint8 color, float32 mask.
+        self.visual.set_compact()
+        # Float32 positions relative to the center of each uploaded window.
+        self.visual.set_origin()
 
         self.canvas.add_visual(self.visual)
-        
-        self.data_bounds = np.array([[
-            tsd.index.values.min(), 
-            tsd.values.min(), 
-            tsd.index.values.max(),
-            tsd.values.max()]
-            ])
 
+        self.data_bounds = np.array([self.pyramid.get_bounds()], dtype=np.float64)
 
-    def plot(self, **kwargs):        
+        self._init_streaming()
+
+    def _get_window_key(self, t0, t1):
+        """The decimation level needed to draw the visible window."""
+        n_points = self.points_per_pixel * self.canvas.get_size()[0]
+        i0, i1 = self.pyramid.get_range(t0, t1)
+        return self.pyramid.get_level(i1 - i0, n_points)
+
+    def _fetch_window(self, t0, t1, level):
+        t0, t1 = self._clamp_window(
+            t0, t1, lambda t0, t1: self.pyramid.get_n_vertices(t0, t1, level))
+        b = self.pyramid.get(t0, t1, level=level)
+        b.t0, b.t1, b.key = t0, t1, level
+        return b
+
+    def _upload_window(self, b):
+        # The data bounds are those of the whole signal, so that the uploaded window
+        # is drawn at the right place.
         self.visual.set_data(
-            x=self.tsd.index.values, 
-            y=self.tsd.values, 
-            color=[0.7, 0.8, 0.45, 1], 
-            data_bounds = self.data_bounds,
-            depth=np.array([10]))
+            x=b.x,
+            y=b.y,
+            color=self.color,
+            data_bounds=self.data_bounds)
+
+    def plot(self, **kwargs):
+        self.load_window()
         self._update_axes()
         self.canvas.update()
 
@@ -108,6 +369,160 @@ class TsdView(PynaView):
 
 
 
+class TsdFrameView(PynaView):
+    """This view shows the channels of a multichannel time series as stacked traces.
+
+    The channels are decimated with a min/max pyramid, every channel being normalized with its
+    own value range. Only a subset of consecutive channels is shown at once, and all of them
+    are drawn with a single batched plot visual. The subset is scrolled with shift+wheel or
+    the PageUp/PageDown keys.
+
+    Constructor
+    -----------
+
+    tsdframe : TsdFrame or DataSource
+        The multichannel time series to show.
+    n_visible_channels : int
+        Maximum number of channels shown at once.
+
+    """
+
+    # Number of vertices uploaded per horizontal pixel and per channel.
+    points_per_pixel = 2
+    n_visible_channels = 32
+    color = (0.7, 0.8, 0.45, 1)
+
+    def __init__(self, tsdframe, n_visible_channels=None, **kwargs):
+
+        super(TsdFrameView, self).__init__(**kwargs)
+
+        self.tsdframe = tsdframe
+        if isinstance(tsdframe, DataSource):
+            assert tsdframe.n_channels > 0
+            self.pyramid = ChunkedEnvelope(tsdframe)
+        else:
+            self.pyramid = MinMaxPyramid(tsdframe.index.values, tsdframe.values)
+        t0, _, t1, _ = self.pyramid.get_bounds()
+        self.t_bounds = (t0, t1)
+
+        # Per-channel value range.
+        ymin, ymax = self.pyramid.get_channel_bounds()
+        self.n_channels = len(ymin)
+        ymax = np.where(ymax > ymin, ymax, ymin + 1)
+        self.channel_bounds = np.c_[ymin, ymax].astype(np.float64)
+
+        if n_visible_channels is not None:
+            self.n_visible_channels = n_visible_channels
+        self.channel_start = 0
+
+        self.canvas.set_layout('stacked', origin='top', n_plots=self.n_visible, has_clip=False)
+        self.canvas.enable_axes()
+
+        self.visual = PlotVisual()
+        self.visual.set_compact()
+        self.visual.set_origin()
+        self.canvas.add_visual(self.visual)
+
+        self.data_bounds = self._get_data_bounds()
+
+        self._init_streaming()
+
+    # Channels
+    # -------------------------------------------------------------------------
+
+    @property
+    def n_visible(self):
+        """Number of channels currently shown."""
+        return min(self.n_visible_channels, self.n_channels)
+
+    @property
+    def channels(self):
+        """Indices of the channels currently shown."""
+        return np.arange(self.channel_start, self.channel_start + self.n_visible)
+
+    def set_channels(self, channel_start, n_visible_channels=None):
+        """Show `n_visible_channels` channels starting at `channel_start`."""
+        if n_visible_channels is not None:
+            self.n_visible_channels = max(1, n_visible_channels)
+        self.channel_start = int(np.clip(channel_start, 0, self.n_channels - self.n_visible))
+        self.canvas.stacked.n_boxes = self.n_visible
+        self.data_bounds = self._get_data_bounds()
+        self._update_axes()
+        self.update_status()
+        self.request_window()
+
+    def scroll_channels(self, n):
+        """Scroll the channels by `n` rows (down if positive)."""
+        self.set_channels(self.channel_start + n)
+
+    def on_mouse_wheel(self, e):  # pragma: no cover
+        """Scroll the channels with shift+wheel."""
+        if e.modifiers == ('Shift',):
+            self.scroll_channels(-int(np.sign(e.delta)) * max(1, self.n_visible // 4))
+
+    def on_key_press(self, e):
+        """Scroll the channels by pages with PageUp/PageDown."""
+        if e.modifiers:
+            return
+        if e.key == 'PageDown':
+            self.scroll_channels(self.n_visible)
+        elif e.key == 'PageUp':
+            self.scroll_channels(-self.n_visible)
+
+    # Streaming
+    # -------------------------------------------------------------------------
+
+    def _get_data_bounds(self):
+        """Bounds of the view: time on the x axis, one row per visible channel."""
+        t0, t1 = self.t_bounds
+        return np.array([[t0, 0, t1, self.n_visible]], dtype=np.float64)
+
+    def _get_window_key(self, t0, t1):
+        """The decimation level and the visible channels."""
+        n_points = self.points_per_pixel * self.canvas.get_size()[0]
+        i0, i1 = self.pyramid.get_range(t0, t1)
+        return (self.pyramid.get_level(i1 - i0, n_points), self.channel_start, self.n_visible)
+
+    def _fetch_window(self, t0, t1, key):
+        level, channel_start, n_visible = key
+        channels = np.arange(channel_start, channel_start + n_visible)
+        t0, t1 = self._clamp_window(
+            t0, t1, lambda t0, t1: n_visible * self.pyramid.get_n_vertices(t0, t1, level))
+        b = self.pyramid.get(t0, t1, level=level, channels=channels)
+        b.channels = channels
+        b.t0, b.t1, b.key = t0, t1, key
+        return b
+
+    def _upload_window(self, b):
+        n_visible = len(b.channels)
+        n = len(b.x)
+        if not n:
+            self.visual._set_state(n_vertices=0)
+            return
+        # One signal per channel, all drawn in a single call. The time bounds are those of
+        # the whole signal, so that the uploaded window is drawn at the right place.
+        t0, t1 = self.t_bounds
+        bounds = self.channel_bounds[b.channels]
+        data_bounds = np.c_[
+            np.full(n_visible, t0), bounds[:, 0], np.full(n_visible, t1), bounds[:, 1]]
+        self.visual.set_data(
+            x=[b.x] * n_visible,
+            y=list(np.asarray(b.y).reshape((n, n_visible)).T),
+            color=self.color,
+            data_bounds=data_bounds)
+        self.visual.set_box_index(np.repeat(np.arange(n_visible), n))
+
+    def plot(self, **kwargs):
+        self.load_window()
+        self._update_axes()
+        self.canvas.update()
+
+    @property
+    def status(self):
+        return 'channels %d-%d / %d' % (
+            self.channel_start, self.channel_start + self.n_visible - 1, self.n_channels)
+
+
 class TsGroupView(PynaView):
     """This view shows a raster plot of all clusters.
 
@@ -120,11 +535,24 @@ class TsGroupView(PynaView):
         An `(n_spikes,)` array with the spike-cluster assignments.
     cluster_ids : array-like
         The list of all clusters to show initially.
+    streaming : boolean
+        Whether to only upload the spikes of the visible time window (plus a margin),
+        reloaded in the background on pan and zoom. By default, streaming is used when there
+        are more spikes than `max_vertices`.
+
+    In streaming mode, when more than `density_threshold` spikes are visible, the raster is
+    drawn as an image with the number of spikes of every unit per pixel column, instead of
+    one tick per spike.
 
     """
 
     _default_position = 'right'
 
+    # Number of visible spikes above which the spike density is shown instead of the spikes.
+    density_threshold = 500000
+    # Maximum width of the spike density image.
+    max_density_bins = 8192
+
     default_shortcuts = {
         'change_marker_size': 'alt+wheel',
         'switch_color_scheme': 'shift+wheel',
@@ -134,25 +562,36 @@ class TsGroupView(PynaView):
         'select_more': 'shift+click',
     }
 
-    def __init__(self, spike_times, spike_clusters, cluster_ids, **kwargs):
+    def __init__(self, spike_times, spike_clusters, cluster_ids, streaming=None, **kwargs):
+        super(TsGroupView, self).__init__(**kwargs)
+
         self.spike_times = spike_times
         self.n_spikes = len(spike_times)
-        self.duration = spike_times[-1] * 1.01
+        # NOTE: the spikes are not necessarily sorted by time.
+        self.duration = spike_times.max() * 1.01
         self.n_clusters = 1
 
         assert len(spike_clusters) == self.n_spikes
         self.spike_clusters = spike_clusters
         self.all_cluster_ids = cluster_ids
         self.n_clusters = len(self.all_cluster_ids)
-        self.spike_ids = np.isin(self.spike_clusters, self.all_cluster_ids)
+        self.cluster_colors = np.random.rand(self.n_clusters, 4)
+        self.cluster_colors[:, -1] = 1.0
+        self.selected_clusters = None
 
-        super(TsGroupView, self).__init__(**kwargs)
+        self.streaming = self.n_spikes > self.max_vertices if streaming is None else streaming
+        if self.streaming:
+            self._init_segments()
+        else:
+            self.spike_ids = np.isin(self.spike_clusters, self.all_cluster_ids)
 
         self.canvas.set_layout('stacked', origin='top', n_plots=self.n_clusters, has_clip=False)
         self.canvas.enable_axes()
 
+        # The colors are fetched in a per-cluster lookup texture, indexed by the box index.
         self.visual = ScatterVisual(
             marker='vbar',
+            color_index='a_box_index',
             marker_scaling='''
                 point_size = v_size * u_zoom.y + 5.;
                 float width = 0.2;
@@ -164,9 +603,34 @@ class TsGroupView(PynaView):
         self.visual.inserter.insert_vert('''
                 gl_PointSize = a_size * u_zoom.y + 5.0;
         ''', 'end')
+        # Every spike is drawn with its index in the picking pass, see `pick_spike()`.
+        self.visual.enable_picking()
+        self.visual.set_compact()
+        self.visual.set_origin()
         self.canvas.add_visual(self.visual)
+        self.visual.set_color_lookup(self.cluster_colors)
         self.canvas.panzoom.set_constrain_bounds((-1, -2, +1, +2))
 
+        if self.streaming:
+            # The rows of the image match the boxes of the stacked layout.
+            self.density_visual = ImageVisual()
+            self.canvas.add_visual(self.density_visual, exclude_origins=(self.canvas.stacked,))
+            self.density_visual.hide()
+            self._init_streaming()
+
+
+    @classmethod
+    def from_tsgroup(cls, tsgroup, **kwargs):
+        """Create a raster view of a pynapple `TsGroup`.
+
+        The flattened spike arrays are cached, so that re-opening the same `TsGroup` does
+        not copy the spikes again.
+
+        """
+        b = flatten_tsgroup(tsgroup)
+        view = cls(b.spike_times, b.spike_clusters, cluster_ids=b.cluster_ids, **kwargs)
+        view.tsgroup = tsgroup
+        return view
 
     def _get_x(self):
         """Return the x position of the spikes."""
@@ -198,12 +662,97 @@ class TsGroupView(PynaView):
         # assert np.all(np.in1d(cl, self.cluster_ids))
         return self._index_of(cl, self.all_cluster_ids)
 
-    def _get_color(self, box_index):
-        """Return, for every spike, its color, based on its box index."""
-        cluster_colors = np.random.rand(len(self.all_cluster_ids), 4)
-        cluster_colors[:,-1] = 1.0
+    # Streaming
+    # -------------------------------------------------------------------------
 
-        return cluster_colors[box_index, :]
+    def _init_segments(self):
+        """Sort the spikes by cluster, then by time, so that the spikes of every cluster in a
+        time window can be found with a binary search."""
+        t, clu = self.spike_times, self.spike_clusters
+        dc = np.diff(clu)
+        if not np.all((dc > 0) | ((dc == 0) & (np.diff(t) >= 0))):
+            order = np.lexsort((t, clu))
+            self.spike_times, self.spike_clusters = t[order], clu[order]
+        # The spikes are also sorted by `rank * span + t - t_min`, where `rank` is the rank of
+        # their cluster and `span` exceeds the recording duration, so that the spikes of all
+        # clusters in a time window are found with a single binary search.
+        self._t_min = self.spike_times.min()
+        self._t_span = self.spike_times.max() - self._t_min + 1.
+        self._sorted_cluster_ids = np.unique(self.spike_clusters)
+        rank = np.searchsorted(self._sorted_cluster_ids, self.spike_clusters)
+        self._spike_keys = rank * self._t_span + (self.spike_times - self._t_min)
+        self._update_segments()
+
+    def _update_segments(self):
+        """Compute the segment of every cluster in the sorted spike arrays, in the order of
+        the rows of the raster plot."""
+        self._starts = np.searchsorted(self.spike_clusters, self.all_cluster_ids, side='left')
+        self._stops = np.searchsorted(self.spike_clusters, self.all_cluster_ids, side='right')
+        self._key_offsets = self._t_span * np.searchsorted(
+            self._sorted_cluster_ids, self.all_cluster_ids)
+
+    def _get_window_indices(self, t0, t1):
+        """Return, for every cluster, the indices of its first and last spikes in `[t0, t1]`."""
+        dt = np.clip([t0 - self._t_min, t1 - self._t_min], -.5, self._t_span - .5)
+        i0 = np.searchsorted(self._spike_keys, self._key_offsets + dt[0], side='left')
+        i1 = np.searchsorted(self._spike_keys, self._key_offsets + dt[1], side='right')
+        # The clusters without spikes have an empty segment.
+        i0 = np.clip(i0, self._starts, self._stops)
+        i1 = np.clip(i1, self._starts, self._stops)
+        return i0, i1
+
+    def _count_window(self, t0, t1):
+        i0, i1 = self._get_window_indices(t0, t1)
+        return int((i1 - i0).sum())
+
+    def _get_window_key(self, t0, t1):
+        """Whether the spikes or their density are shown, and at which resolution."""
+        if self.density_threshold is None or self._count_window(t0, t1) <= self.density_threshold:
+            return 'spikes'
+        # The density image is recomputed when the bin width changes by more than ~20%.
+        return ('density', self.canvas.get_size()[0], int(np.log2(t1 - t0) * 4))
+
+    def _get_density_image(self, t0, t1, n_bins):
+        """Return an RGBA image with the number of spikes of every cluster in regular bins."""
+        counts = np.zeros((self.n_clusters, n_bins), dtype=np.float32)
+        for k, (start, stop) in enumerate(zip(self._starts, self._stops)):
+            counts[k] = _bin_times(self.spike_times[start:stop], t0, t1, n_bins)
+        intensity = np.log1p(counts)
+        intensity /= max(intensity.max(), 1.)
+        image = np.empty((self.n_clusters, n_bins, 4), dtype=np.float32)
+        colors = self._get_cluster_colors(self.selected_clusters)
+        image[..., :3] = colors[:, np.newaxis, :3] * intensity[..., np.newaxis]
+        image[..., 3] = counts > 0
+        return image
+
+    def _fetch_window(self, t0, t1, key):
+        if key != 'spikes':
+            # Bins of about one pixel, the visible window being `width` pixels wide.
+            _, width, _ = key
+            n_bins = int(width * (1 + 2 * self.margin))
+            n_bins = min(n_bins, self.max_density_bins)
+            image = self._get_density_image(t0, t1, n_bins)
+            return Bunch(image=image, t0=t0, t1=t1, key=key)
+        t0, t1 = self._clamp_window(t0, t1, self._count_window)
+        i0, i1 = self._get_window_indices(t0, t1)
+        x = np.concatenate([self.spike_times[a:b] for a, b in zip(i0, i1)])
+        box_index = np.repeat(np.arange(self.n_clusters), i1 - i0)
+        spike_ids = np.concatenate([np.arange(a, b) for a, b in zip(i0, i1)])
+        return Bunch(x=x, box_index=box_index, spike_ids=spike_ids, t0=t0, t1=t1, key=key)
+
+    def _get_lazy_visuals(self):
+        return [self.visual, self.density_visual]
+
+    def _upload_window(self, b):
+        if b.key == 'spikes':
+            self._set_spikes(b.x, b.box_index, b.spike_ids)
+            self.density_visual.hide()
+            self.visual.show()
+            return
+        x0, x1 = -1 + 2 * b.t0 / self.duration, -1 + 2 * b.t1 / self.duration
+        self.density_visual.set_data(image=b.image, bounds=(x0, -1, x1, 1))
+        self.visual.hide()
+        self.density_visual.show()
 
     # Main methods
     # -------------------------------------------------------------------------
@@ -215,42 +764,101 @@ class TsGroupView(PynaView):
     def update_cluster_sort(self, cluster_ids):
         """Update the order of all clusters."""
         self.all_cluster_ids = cluster_ids
+        if self.streaming:
+            self._update_segments()
+            self.load_window()
+            return
         self.visual.set_box_index(self._get_box_index())
         self.canvas.update()
 
-    def update_color(self):
-        """Update the color of the spikes, depending on the selected clusters."""
-        box_index = self._get_box_index()
-        color = self._get_color(box_index, selected_clusters=self.cluster_ids)
-        self.visual.set_color(color)
+    def _get_cluster_colors(self, selected_clusters=None):
+        """Return the color of every cluster, the unselected ones being dimmed when some
+        clusters are selected."""
+        colors = self.cluster_colors.copy()
+        if selected_clusters is not None and len(selected_clusters):
+            unselected = ~np.isin(self.all_cluster_ids, selected_clusters)
+            colors[unselected, :3] *= .25
+        return colors
+
+    def update_color(self, selected_clusters=None):
+        """Update the color of the spikes, depending on the selected clusters.
+
+        Only one color per cluster is uploaded to the GPU.
+
+        """
+        self.selected_clusters = selected_clusters
+        self.visual.set_color_lookup(self._get_cluster_colors(selected_clusters))
+        # The density image has the colors baked in.
+        if self.streaming and self._loaded is not None and self._loaded.key != 'spikes':
+            self._loaded = None
+            self.request_window()
         self.canvas.update()
 
     @property
     def status(self):
-        return 'Color scheme: %s' % self.color_scheme
+        return '%d units' % self.n_clusters
+
+    def _set_spikes(self, x, box_index, spike_ids):
+        """Upload the spikes to the visual, with their indices as picking ids."""
+        if not len(x):
+            self.visual._set_state(n_vertices=0)
+            return
+        self.visual.set_data(
+            x=x, y=np.zeros(len(x)), size=5, data_bounds=(0, -1, self.duration, 1))
+        self.visual.set_box_index(box_index)
+        self.visual.set_pick_ids(spike_ids)
 
     def plot(self, **kwargs):
         """Make the raster plot."""
-        print(1)
         if not len(self.spike_clusters):
             return
-        x = self._get_x()  # spike times for the selected spikes
-        y = self._get_y()  # just 0
-        box_index = self._get_box_index()
-        color = self._get_color(box_index)
-        assert x.shape == y.shape == box_index.shape
-        assert color.shape[0] == len(box_index)
         self.data_bounds = self._get_data_bounds()
-
-        self.visual.set_data(
-            x=x, y=y, color=color, size=5,
-            data_bounds=(0, -1, self.duration, 1))
-        self.visual.set_box_index(box_index)
+        if self.streaming:
+            self.load_window()
+        else:
+            x = self._get_x()  # spike times for the selected spikes
+            box_index = self._get_box_index()
+            assert x.shape == box_index.shape
+            self._set_spikes(x, box_index, np.flatnonzero(self.spike_ids))
         self.canvas.stacked.n_boxes = self.n_clusters
         self._update_axes()
         # self.canvas.stacked.add_boxes(self.canvas)
         self.canvas.update()
 
+    # Selection
+    # -------------------------------------------------------------------------
+
+    def pick_spike(self, pos):
+        """Return the index of the spike drawn under a position in pixels, or None.
+
+        The index refers to `spike_times` and `spike_clusters`. It is found by drawing the spikes
+        with their indices as colors in a single-pixel offscreen framebuffer.
+
+        """
+        picked = self.canvas.pick(pos)
+        if picked is None or picked[0] is not self.visual:
+            return None
+        return picked[1]
+
+    def on_mouse_click(self, e):
+        """Select the unit of the spike under the cursor with ctrl+click, or add it to the
+        selection with shift+click."""
+        if 'Control' not in e.modifiers and 'Shift' not in e.modifiers:
+            return
+        spike_id = self.pick_spike(e.pos)
+        if spike_id is None:
+            return
+        cluster_id = self.spike_clusters[spike_id]
+        logger.debug("Click on spike %d of cluster %d.", spike_id, cluster_id)
+        if 'Shift' in e.modifiers:
+            selected = list(self.selected_clusters if self.selected_clusters is not None else [])
+            selected += [cluster_id] if cluster_id not in selected else []
+            emit('select_more', self, [cluster_id])
+        else:
+            selected = [cluster_id]
+            emit('request_select', self, [cluster_id])
+        self.update_color(selected)
+
     def attach(self, gui):
         """Attach the view to the GUI."""
         super(TsGroupView, self).attach(gui)
@@ -259,3 +867,103 @@ class TsGroupView(PynaView):
         #self.actions.add(self.decrease_marker_size)
         # self.actions.separator()
 
+
+class TimeSync(object):
+    """Synchronize the visible time window of several views.
+
+    When a view is panned or zoomed, the other views are moved to show the same time window,
+    keeping their own vertical range. The pan and zoom changes of a frame are applied after
+    that frame in a single pass: every other view is moved once, requests the data of its new
+    window once, and all canvases are repainted in the same cycle.
+
+    Constructor
+    -----------
+
+    views : list
+        The views to synchronize, deriving from `PynaView`.
+
+    """
+
+    def __init__(self, views=()):
+        self.views = []
+        # Time window shown by all views.
+        self.window = None
+        # View whose time window is to be shown by the other views.
+        self._source = None
+        self._syncing = False
+        # Pan and zoom callback of every view.
+        self._callbacks = {}
+        for view in views:
+            self.add_view(view)
+
+    def _is_ready(self, view):
+        return not view._closed and getattr(view, 'data_bounds', None) is not None
+
+    def add_view(self, view):
+        """Synchronize a view with the other views."""
+        if view in self.views:
+            return
+        self.views.append(view)
+
+        def on_pan_zoom(sender, value):
+            self._on_pan_zoom(view)
+
+        panzoom = view.canvas.panzoom
+        connect(on_pan_zoom, event='pan', sender=panzoom)
+        connect(on_pan_zoom, event='zoom', sender=panzoom)
+        self._callbacks[view] = on_pan_zoom
+        if self.window is None or not self._is_ready(view):
+            return
+        self._syncing = True
+        try:
+            self._set_window(view, *self.window)
+        finally:
+            self._syncing = False
+
+    def remove_view(self, view):
+        """Stop synchronizing a view."""
+        if view in self.views:
+            self.views.remove(view)
+            unconnect(self._callbacks.pop(view))
+        if self._source is view:
+            self._source = None
+
+    def _on_pan_zoom(self, view):
+        # Ignore the events of the views moved by `sync()`.
+        if self._syncing:
+            return
+        if not view.canvas.isExposed():
+            self.sync(view)
+            return
+        # The pan and zoom events of a frame are handled once, after the frame.
+        if self._source is None:
+            QTimer.singleShot(0, self._sync_source)
+        self._source = view
+
+    def _sync_source(self):
+        view, self._source = self._source, None
+        if view is not None:
+            self.sync(view)
+
+    def _set_window(self, view, t0, t1):
+        """Move a view to show a time window."""
+        b0, _, b1, _ = np.ravel(view.data_bounds)[:4]
+        a = .5 * (b1 - b0)
+        _, y0, _, y1 = view.canvas.panzoom.get_range()
+        # This emits the pan and zoom events, which update the axes and request the window.
+        view.canvas.panzoom.set_range(((t0 - b0) / a - 1, y0, (t1 - b0) / a - 1, y1))
+
+    def sync(self, view):
+        """Show the visible time window of a view in all other views."""
+        for other in [v for v in self.views if v._closed]:
+            self.remove_view(other)
+        if not self._is_ready(view):
+            return
+        t0, t1 = self.window = view.get_time_window()
+        self._syncing = True
+        try:
+            for other in self.views:
+                if other is not view and self._is_ready(other):
+                    self._set_window(other, t0, t1)
+        finally:
+            self._syncing = False
@@ -8,7 +8,7 @@
 
 from contextlib import contextmanager
 from datetime import datetime
-from functools import wraps, partial
+from functools import wraps
 import logging
 import os
 import os.path as op
@@ -38,11 +38,6 @@ from PyQt5.QtCore import (Qt, QByteArray, QMetaObject, QObject,  # noqa
 from PyQt5.QtGui import (  # noqa
     QKeySequence, QIcon, QColor, QMouseEvent, QGuiApplication,
     QFontDatabase, QWindow, QOpenGLWindow)
-from PyQt5.QtWebEngineWidgets import (QWebEngineView,  # noqa
-                                      QWebEnginePage,
-                                      # QWebSettings,
-                                      )
-from PyQt5.QtWebChannel import QWebChannel  # noqa
 from PyQt5.QtWidgets import (# noqa
     QAction, QStatusBar, QMainWindow, QDockWidget, QToolBar,
     QWidget, QHBoxLayout, QVBoxLayout, QGridLayout, QScrollArea,
@@ -56,6 +51,16 @@ from PyQt5.QtWidgets import (# noqa
 # on Ubuntu.
 #QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
 
+# QtWebEngine is slow to load: the web widgets are imported from `webview` on first access.
+_WEBVIEW_NAMES = ('QWebEngineView', 'QWebEnginePage', 'QWebChannel', 'WebPage', 'WebView')
+
+
+def __getattr__(name):
+    if name in _WEBVIEW_NAMES:
+        from . import webview
+        return getattr(webview, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 
 # -----------------------------------------------------------------------------
 # Testing functions: mock dialogs in automated tests
@@ -436,48 +441,6 @@ def _static_abs_path(rel_path):
     return Path(__file__).parent / 'static' / rel_path
 
 
-class WebPage(QWebEnginePage):
-    """A Qt web page widget."""
-    _raise_on_javascript_error = False
-
-    def javaScriptConsoleMessage(self, level, msg, line, source):
-        super(WebPage, self).javaScriptConsoleMessage(level, msg, line, source)
-        msg = "[JS:L%02d] %s" % (line, msg)
-        f = (partial(logger.log, 5), logger.warning, logger.error)[level]
-        if self._raise_on_javascript_error and level >= 2:
-            raise RuntimeError(msg)
-        f(msg)
-
-
-class WebView(QWebEngineView):
-    """A generic HTML widget."""
-
-    def __init__(self, *args):
-        super(WebView, self).__init__(*args)
-        self.html = None
-        assert isinstance(self.window(), QWidget)
-        self._page = WebPage(self)
-        self.setPage(self._page)
-        self.move(100, 100)
-        self.resize(400, 400)
-
-    def set_html(self, html, callback=None):
-        """Set the HTML code."""
-        self._callback = callback
-        self.loadFinished.connect(self._loadFinished)
-        static_dir = str(Path(__file__).parent / 'static') + '/'
-        base_url = QUrl().fromLocalFile(static_dir)
-        self.page().setHtml(html, base_url)
-
-    def _callable(self, data):
-        self.html = data
-        if self._callback:
-            self._callback(self.html)
-
-    def _loadFinished(self, result):
-        self.page().toHtml(self._callable)
-
-
 # -----------------------------------------------------------------------------
 # Threading
 # -----------------------------------------------------------------------------
@@ -487,6 +450,7 @@ class WorkerSignals(QObject):
     finished = pyqtSignal()
     error = pyqtSignal(tuple)
     result = pyqtSignal(object)
+    progress = pyqtSignal(object)
 
 
 def thread_pool():
@@ -522,6 +486,11 @@ class Worker(QRunnable):
         self.kwargs = kwargs
         self.signals = WorkerSignals()
 
+    def report_progress(self, value):
+        """Emit the progress signal, with a value between 0 and 1, from within the task.
+        The connected slots are called in the GUI thread."""
+        self.signals.progress.emit(value)
+
     @pyqtSlot()
     def run(self):  # pragma: no cover
         """Run the task in a background thread. Should not be called directly unless you want
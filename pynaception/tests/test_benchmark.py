@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""Test the benchmark suite."""
+
+
+#------------------------------------------------------------------------------
+# Imports
+#------------------------------------------------------------------------------
+
+import json
+
+from pytest import raises
+
+from ..benchmark import run_benchmarks, compare, main
+
+
+#------------------------------------------------------------------------------
+# Tests
+#------------------------------------------------------------------------------
+
+def test_run_benchmarks(tmp_path):
+    path = tmp_path / 'results.json'
+    results = run_benchmarks(
+        names=['transform_chain', 'batch_accumulator'], sizes=(1000,), repeats=2, output=path)
+    assert json.loads(path.read_text()) == json.loads(json.dumps(results))
+
+    keys = [(r['name'], r['phase'], r['n_points']) for r in results['results']]
+    assert keys == [
+        ('transform_chain', 'apply', 1000),
+        ('transform_chain', 'apply_inplace', 1000),
+        ('batch_accumulator', 'add_batch_data', 1000),
+        ('batch_accumulator', 'data', 1000),
+    ]
+    for r in results['results']:
+        assert len(r['durations_ms']) == 2
+        assert r['duration_ms'] == min(r['durations_ms'])
+
+    # Sizes above the maximum size of a benchmark are skipped.
+    assert run_benchmarks(names=['batch_accumulator'], sizes=(1e8,))['results'] == []
+
+    with raises(ValueError):
+        run_benchmarks(names=['unknown'])
+
+
+def test_compare():
+    def _results(duration):
+        return {'results': [dict(
+            name='plot_visual', phase='draw', n_points=1000, duration_ms=duration)]}
+
+    assert compare(_results(1.2), _results(1.)) == []
+    assert compare(_results(2.), _results(1.)) == [('plot_visual', 'draw', 1000, 1., 2.)]
+    assert compare(_results(2.), _results(1.), tolerance=3) == []
+    assert compare(_results(2.), {'results': []}) == []
+
+
+def test_main(tmp_path):
+    path = tmp_path / 'results.json'
+    args = ['--only', 'transform_chain', '--sizes', '1e3', '--repeats', '1']
+    assert main(args + ['--output', str(path)]) == 0
+    results = json.loads(path.read_text())
+    assert results['results'][0]['n_points'] == 1000
+
+    # Compare to a much faster baseline.
+    for r in results['results']:
+        r['duration_ms'] = 1e-9
+    path.write_text(json.dumps(results))
+    assert main(args + ['--baseline', str(path)]) == 1
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""Test the controller."""
+
+
+#------------------------------------------------------------------------------
+# Imports
+#------------------------------------------------------------------------------
+
+import numpy as np
+from numpy.testing import assert_allclose as ac
+
+from ..controller import Controller
+from ..datasource import ArraySource
+from ..gui import GUI
+
+
+#------------------------------------------------------------------------------
+# Tests
+#------------------------------------------------------------------------------
+
+def test_controller_close_view(qapp):
+    gui = GUI()
+    controller = Controller({}, gui)
+    t = np.linspace(0, 10, 1000)
+    for name in ('a', 'b', 'c'):
+        controller.add_tsd_view(ArraySource(t, np.random.normal(size=1000)), name)
+    a, b, c = (controller.views[name] for name in ('a', 'b', 'c'))
+    assert controller.time_sync.views == [a, b, c]
+
+    # Closing a dock closes its view, which is no longer synchronized.
+    b.dock.close()
+    assert b._closed
+    assert controller.time_sync.views == [a, c]
+    assert list(controller.views) == ['a', 'c']
+    window = b.get_time_window()
+
+    a.canvas.panzoom.set_range((-.5, -1, .5, 1))
+    ac(c.get_time_window(), (2.5, 7.5))
+    assert b.get_time_window() == window
+
+    # Same when closing the view.
+    c.close()
+    assert not c.dock.isVisible()
+    assert controller.time_sync.views == [a]
+    assert gui._views == [a]
+
+    a.close()
+    assert not controller.time_sync.views
+    gui.close()
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""Test data sources."""
+
+
+#------------------------------------------------------------------------------
+# Imports
+#------------------------------------------------------------------------------
+
+import numpy as np
+from numpy.testing import assert_array_equal as ae
+from numpy.testing import assert_allclose as ac
+from pytest import fixture, importorskip, raises
+
+from ..datasource import (
+    ArraySource, BinarySource, HDF5Source, ChunkedEnvelope, flatten_tsgroup)
+from ..plot.utils import MinMaxPyramid
+
+
+#------------------------------------------------------------------------------
+# Fixtures
+#------------------------------------------------------------------------------
+
+@fixture
+def binary(tmp_path):
+    data = np.random.randint(-1000, 1000, size=(10000, 4)).astype(np.int16)
+    path = tmp_path / 'data.dat'
+    data.tofile(path)
+    return path, data
+
+
+#------------------------------------------------------------------------------
+# Test data sources
+#------------------------------------------------------------------------------
+
+def test_array_source():
+    t = np.linspace(0., 1., 101)
+    source = ArraySource(t, np.sin(t))
+    assert len(source) == 101
+    assert source.shape == (101,)
+    assert source.t_start == 0.
+    assert source.t_end == 1.
+    assert source.searchsorted(.5) == 50
+    assert source.searchsorted(.5, side='right') == 51
+    assert np.shares_memory(source.get_values(10, 20), source.values)
+
+
+def test_binary_source(binary):
+    path, data = binary
+    source = BinarySource(path, n_channels=4, sampling_rate=1000.)
+    assert source.shape == (10000, 4)
+    ae(source.get_values(100, 200), data[100:200])
+    ac(source.get_times(0, 3), [0., .001, .002])
+    assert source.t_end == 9.999
+    assert source.searchsorted(.1) == 100
+    assert source.searchsorted(.1, side='right') == 101
+    assert source.searchsorted(-1.) == 0
+    assert source.searchsorted(100.) == 10000
+
+    # The sample times are found at their own index.
+    for t_start in (0., 1234.5678):
+        source = BinarySource(path, n_channels=4, sampling_rate=30000., t_start=t_start)
+        t = source.get_times(0, source.n_samples)
+        tq = np.r_[t[::37], t[::37] + 1e-6, t[0] - 1., t[-1] + 1.]
+        for side in ('left', 'right'):
+            assert [source.searchsorted(x, side) for x in tq] == list(
+                np.searchsorted(t, tq, side))
+
+    source = BinarySource(path, n_channels=4, sampling_rate=1000., channels=2)
+    assert source.shape == (10000,)
+    ae(source.get_values(0, 10), data[:10, 2])
+
+    source = BinarySource(path, n_channels=4, sampling_rate=1000., channels=[0, 3])
+    assert source.shape == (10000, 2)
+    ae(source.get_values(0, 10), data[:10, [0, 3]])
+
+
+def test_hdf5_source(tmp_path):
+    h5py = importorskip('h5py')
+    t = np.sort(np.random.uniform(0, 10, 1000))
+    y = np.random.randn(1000, 3)
+    path = tmp_path / 'data.h5'
+    with h5py.File(path, 'w') as f:
+        f['data'] = y
+        f['timestamps'] = t
+    with h5py.File(path, 'r') as f:
+        source = HDF5Source(f['data'], timestamps=f['timestamps'], channels=1)
+        assert source.shape == (1000,)
+        ae(source.get_values(5, 10), y[5:10, 1])
+        for tq in (0., t[10], 5., 20.):
+            assert source.searchsorted(tq) == np.searchsorted(t, tq)
+            assert source.searchsorted(tq, 'right') == np.searchsorted(t, tq, 'right')
+
+    # The source owns the file it opens.
+    with HDF5Source.from_file(path, 'data', sampling_rate=100.) as source:
+        ae(source.get_values(0, 10), y[:10])
+        f = source.file
+    assert not f
+    assert source.file is None
+    source.close()
+
+
+def test_hdf5_source_nwb(tmp_path):
+    h5py = importorskip('h5py')
+    y = np.random.randn(100)
+    path = tmp_path / 'data.nwb'
+    with h5py.File(path, 'w') as f:
+        f['acquisition/lfp/data'] = y
+        f['acquisition/lfp/starting_time'] = 2.
+        f['acquisition/lfp/starting_time'].attrs['rate'] = 10.
+    source = HDF5Source.from_nwb(path, 'acquisition/lfp')
+    assert source.t_start == 2.
+    ae(source.get_values(0, 10), y[:10])
+    source.close()
+    assert source.file is None
+
+    # The file is closed if the group is invalid.
+    with raises(KeyError):
+        HDF5Source.from_nwb(path, 'acquisition/unknown')
+    with h5py.File(path, 'a'):
+        pass
+
+
+#------------------------------------------------------------------------------
+# Test decimation
+#------------------------------------------------------------------------------
+
+def test_chunked_envelope(binary):
+    path, data = binary
+    source = BinarySource(path, n_channels=4, sampling_rate=1000., channels=1)
+    t = source.get_times(0, len(source))
+    pyramid = MinMaxPyramid(t, data[:, 1], base=8, factor=2)
+    envelope = ChunkedEnvelope(source, base=8, factor=2)
+
+    b0 = pyramid.get(1., 5., 200)
+    b1 = envelope.get(1., 5., 200)
+    assert b0.level == b1.level >= 0
+    ac(b0.x, b1.x)
+    ae(b0.y, b1.y)
+
+    b = envelope.get(1., 1.05, 200)
+    assert b.level == -1
+    ae(b.y, data[b.start:b.stop, 1])
+
+    # Very low zoom level: only blocks of samples are read.
+    envelope.max_read = 1000
+    b = envelope.get(0., 10., 100)
+    assert len(b.x) == len(b.y) <= 100
+    assert data[:, 1].min() <= b.y.min()
+    assert b.y.max() <= data[:, 1].max()
+
+
+def test_chunked_envelope_channels(binary):
+    path, data = binary
+    source = BinarySource(path, n_channels=4, sampling_rate=1000.)
+    t = source.get_times(0, len(source))
+    pyramid = MinMaxPyramid(t, data, base=8, factor=2)
+    envelope = ChunkedEnvelope(source, base=8, factor=2)
+
+    b0 = pyramid.get(1., 5., 200, channels=[1, 3])
+    b1 = envelope.get(1., 5., 200, channels=[1, 3])
+    assert b1.y.shape == (len(b1.x), 2)
+    ae(b0.y, b1.y)
+
+    ymin, ymax = envelope.get_channel_bounds()
+    assert ymin.shape == ymax.shape == (4,)
+    assert np.all(ymin <= ymax)
+
+
+#------------------------------------------------------------------------------
+# Test spike trains
+#------------------------------------------------------------------------------
+
+def test_flatten_tsgroup():
+    nap = importorskip('pynapple')
+    tsgroup = nap.TsGroup({
+        3: nap.Ts(t=np.sort(np.random.uniform(0, 100, 50))),
+        1: nap.Ts(t=np.sort(np.random.uniform(0, 100, 20))),
+        7: nap.Ts(t=np.sort(np.random.uniform(0, 100, 30))),
+    })
+    b = flatten_tsgroup(tsgroup)
+    ae(b.cluster_ids, [1, 3, 7])
+    assert b.spike_times.dtype == np.float64
+    assert b.spike_clusters.dtype == np.int16
+    ae(np.bincount(b.spike_clusters)[[1, 3, 7]], [20, 50, 30])
+    ae(b.spike_times[20:70], tsgroup[3].index.values)
+    ae(b.spike_clusters[20:70], 3)
+
+    # The result is cached.
+    assert flatten_tsgroup(tsgroup) is b
+
+
+def test_flatten_tsgroup_large_ids():
+    nap = importorskip('pynapple')
+    tsgroup = nap.TsGroup({100000: nap.Ts(t=np.arange(10.))})
+    assert flatten_tsgroup(tsgroup).spike_clusters.dtype == np.int32
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""Test the event system."""
+
+
+#------------------------------------------------------------------------------
+# Imports
+#------------------------------------------------------------------------------
+
+import gc
+import weakref
+
+from ..event import EventEmitter
+
+
+#------------------------------------------------------------------------------
+# Tests
+#------------------------------------------------------------------------------
+
+class _Sender(object):
+    pass
+
+
+class _Receiver(object):
+    def __init__(self):
+        self.received = []
+
+    def on_spam(self, sender, arg):
+        self.received.append(arg)
+        return 'receiver'
+
+
+def test_event_emitter():
+    ev = EventEmitter()
+    s0, s1 = _Sender(), _Sender()
+    calls = []
+
+    @ev.connect(last=True)
+    def on_spam(sender, arg):
+        calls.append(('last', arg))
+        return 'last'
+
+    @ev.connect(sender=s0)
+    def on_spam(sender, arg):  # noqa
+        calls.append(('s0', arg))
+        return 's0'
+
+    @ev.connect
+    def on_spam(sender, arg):  # noqa
+        calls.append(('all', arg))
+        return 'all'
+
+    assert ev.emit('spam', s0, 1) == ['s0', 'all', 'last']
+    assert ev.emit('spam', s1, 2) == ['all', 'last']
+    assert ev.emit('spam', s0, 3, single=True) == 's0'
+    assert ev.emit('eggs', s0, 4) == []
+
+    # Registering a callback after an emit() updates the callbacks of that event.
+    @ev.connect(sender=s1)
+    def on_spam(sender, arg):  # noqa
+        return 's1'
+
+    assert ev.emit('spam', s1, 5) == ['all', 's1', 'last']
+
+    ev.unconnect(s0)
+    assert ev.emit('spam', s0, 6) == ['all', 'last']
+
+    with ev.silent():
+        assert ev.emit('spam', s1, 7) is None
+
+    ev.reset()
+    assert ev.emit('spam', s1, 8) == []
+
+
+def test_event_emitter_weak():
+    ev = EventEmitter()
+    sender, receiver = _Sender(), _Receiver()
+    ev.connect(receiver.on_spam, sender=sender)
+    assert ev.emit('spam', sender, 1) == ['receiver']
+    assert receiver.received == [1]
+
+    # The callbacks are removed once their instance is garbage collected.
+    del receiver
+    gc.collect()
+    assert ev.emit('spam', sender, 2) == []
+    assert not ev._callbacks
+
+    # Same with the senders.
+    ev.connect(lambda sender, arg: arg, event='spam', sender=sender)
+    del sender
+    gc.collect()
+    assert ev.emit('spam', _Sender(), 3) == []
+    assert not ev._callbacks
+
+
+def test_event_emitter_closure():
+    ev = EventEmitter()
+
+    class View(object):
+        def __init__(self):
+            self.sender = _Sender()
+            self.received = []
+
+            @ev.connect(sender=self.sender)
+            def on_spam(sender, arg):
+                self.received.append(arg)
+
+        def close(self):
+            ev.unconnect(self.sender)
+
+    view = View()
+    ev.emit('spam', view.sender, 1)
+    assert view.received == [1]
+
+    # A closure keeps its view, and thus its sender, alive until it is unconnected.
+    ref = weakref.ref(view)
+    del view
+    gc.collect()
+    assert ref() is not None
+    ref().close()
+    gc.collect()
+    assert ref() is None
+    assert not ev._callbacks
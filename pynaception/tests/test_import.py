@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Test the import time of the package."""
+
+
+#------------------------------------------------------------------------------
+# Imports
+#------------------------------------------------------------------------------
+
+import json
+from pathlib import Path
+import subprocess
+import sys
+
+
+#------------------------------------------------------------------------------
+# Utils
+#------------------------------------------------------------------------------
+
+# Maximum time of `import pynaception` in a fresh interpreter, in seconds.
+IMPORT_TIME_BUDGET = .5
+
+# Modules that are only imported when the GUI or a view is created.
+LAZY_MODULES = (
+    'PyQt5.QtWidgets', 'PyQt5.QtWebEngineWidgets', 'OpenGL', 'matplotlib', 'pynapple',
+    'pynaception.gui', 'pynaception.controller', 'pynaception.plot.base')
+
+_IMPORT_CODE = '''
+import json, sys
+from timeit import default_timer
+before = set(sys.modules)
+t0 = default_timer()
+from pynaception import scope
+duration = default_timer() - t0
+print(json.dumps(dict(duration=duration, modules=sorted(set(sys.modules) - before))))
+'''
+
+
+def _import_pynaception():
+    out = subprocess.check_output(
+        [sys.executable, '-c', _IMPORT_CODE], cwd=str(Path(__file__).parents[2]))
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+#------------------------------------------------------------------------------
+# Tests
+#------------------------------------------------------------------------------
+
+def test_import_lazy():
+    modules = _import_pynaception()['modules']
+    for name in LAZY_MODULES:
+        assert name not in modules
+
+
+def test_import_time():
+    # Best of three, to ignore the cold disk cache.
+    duration = min(_import_pynaception()['duration'] for _ in range(3))
+    assert duration < IMPORT_TIME_BUDGET
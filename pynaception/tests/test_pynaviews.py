@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+
+"""Test the views."""
+
+
+#------------------------------------------------------------------------------
+# Imports
+#------------------------------------------------------------------------------
+
+import gc
+import threading
+import weakref
+
+import numpy as np
+from numpy.testing import assert_array_equal as ae
+from numpy.testing import assert_allclose as ac
+from phylib.utils import Bunch
+
+from ..datasource import ArraySource
+from ..event import _EVENT
+from ..pynaviews import TsdView, TsdFrameView, TsGroupView, TimeSync
+
+
+#------------------------------------------------------------------------------
+# Tests
+#------------------------------------------------------------------------------
+
+def _tsd_view(t0, t1, n=1000, **kwargs):
+    return TsdView(ArraySource(np.linspace(t0, t1, n), np.random.normal(size=n)), **kwargs)
+
+
+def _spikes(n_spikes=1000, n_clusters=5):
+    # Unsorted spike times.
+    rng = np.random.RandomState(0)
+    return rng.uniform(0, 10, n_spikes), rng.randint(0, n_clusters, n_spikes)
+
+
+def _tsgroup_view(spike_times, spike_clusters, **kwargs):
+    cluster_ids = np.unique(spike_clusters)
+    return TsGroupView(
+        spike_times.copy(), spike_clusters.copy(), cluster_ids, streaming=True, **kwargs)
+
+
+def test_tsd_view(qapp):
+    view = _tsd_view(0, 10)
+    view.plot()
+    # Compact layout with 2D positions.
+    assert view.visual.compact
+    assert view.visual.program['a_position'].shape == (view.visual.n_vertices, 2)
+
+    # The callbacks of the view are removed when it is closed.
+    panzoom = view.canvas.panzoom
+    assert id(panzoom) in _EVENT._callbacks['pan']
+    view.close()
+    assert id(panzoom) not in _EVENT._callbacks['pan']
+
+
+def test_views_released(qapp):
+    # The callbacks of the views, canvases and layouts do not keep them alive.
+    for make_view in (lambda: _tsd_view(0, 10), lambda: _tsgroup_view(*_spikes())):
+        view = make_view()
+        view.plot()
+        ref = weakref.ref(view)
+        del view
+        gc.collect()
+        assert ref() is None
+    _EVENT.emit('pan', None, 0)
+    assert not _EVENT._callbacks['pan']
+
+
+def test_tsdframe_view(qapp, qtbot):
+    t = np.linspace(0, 10, 1000)
+    view = TsdFrameView(ArraySource(t, np.random.normal(size=(1000, 10))), n_visible_channels=4)
+    ae(view.channels, [0, 1, 2, 3])
+    assert view.status == 'channels 0-3 / 10'
+
+    view.plot()
+    b = view._loaded
+    ae(b.channels, view.channels)
+    assert view.visual.n_vertices == 4 * len(b.x)
+    ae(np.asarray(view.visual.program['a_box_index']).ravel(), np.repeat(np.arange(4), len(b.x)))
+
+    view.scroll_channels(3)
+    assert view.status == 'channels 3-6 / 10'
+    view.scroll_channels(100)
+    ae(view.channels, [6, 7, 8, 9])
+    view.scroll_channels(-100)
+    assert view.channel_start == 0
+
+    view.set_channels(5, n_visible_channels=3)
+    ae(view.channels, [5, 6, 7])
+    assert view.canvas.stacked.n_boxes == 3
+    assert view.data_bounds.tolist() == [[0, 0, 10, 3]]
+    qtbot.waitUntil(lambda: view._worker is None)
+    ae(view._loaded.channels, [5, 6, 7])
+
+    # More visible channels than channels.
+    view.set_channels(2, n_visible_channels=20)
+    ae(view.channels, np.arange(10))
+    qtbot.waitUntil(lambda: view._worker is None)
+
+    view.load_window()
+    n = len(view._loaded.x)
+    ae(np.asarray(view.visual.program['a_box_index']).ravel(), np.repeat(np.arange(10), n))
+
+    # An empty window in lazy mode is only applied when the queue is flushed.
+    view.canvas.set_lazy(True)
+    view._upload_window(Bunch(x=np.zeros(0), y=np.zeros((0, 10)), channels=view.channels))
+    assert view.visual.n_vertices == 10 * n
+    view.canvas.set_lazy(False)
+    view.canvas.flush_update_queue()
+    assert view.visual.n_vertices == 0
+
+    view.close()
+
+
+def _block(f, n_calls=1):
+    """Make a method of a view block its calls in background threads after the first
+    `n_calls - 1`, until the returned `release` event is set. The `entered` event is set when a
+    call blocks."""
+    entered, release = threading.Event(), threading.Event()
+    calls = []
+
+    def wrapped(*args):
+        if threading.current_thread() is not threading.main_thread():
+            calls.append(args)
+            if len(calls) >= n_calls:
+                entered.set()
+                release.wait(5)
+        return f(*args)
+    return wrapped, entered, release
+
+
+def test_load_window_cancels(qapp, qtbot):
+    view = _tsd_view(0, 10, n=10000)
+    view._upload_window, entered, release = _block(view._upload_window)
+
+    # The window being uploaded in the background is cancelled by `load_window()`.
+    view.canvas.panzoom.set_pan_zoom(pan=np.array([-.5, 0.]), zoom=np.array([4., 1.]))
+    view.request_window()
+    assert entered.wait(5)
+    view.canvas.panzoom.set_pan_zoom(pan=np.zeros(2), zoom=np.ones(2))
+    threading.Timer(.2, release.set).start()
+    view.load_window()
+    loaded, n_vertices = view._loaded, view.visual.n_vertices
+    assert loaded.visible == view.get_time_window()
+
+    qtbot.waitUntil(lambda: view._worker is None)
+    assert view._loaded is loaded
+    assert view.visual.n_vertices == n_vertices
+    assert not view.visual.program._update_queue
+    view.close()
+
+
+def test_pending_window_flushed(qapp, qtbot):
+    view = _tsd_view(0, 10, n=10000)
+    view._fetch_window, entered, release = _block(view._fetch_window, n_calls=2)
+
+    view.canvas.panzoom.set_pan_zoom(pan=np.array([-.5, 0.]), zoom=np.array([4., 1.]))
+    view.request_window()
+    first = view.get_time_window()
+    view.canvas.panzoom.set_pan_zoom(pan=np.array([.5, 0.]), zoom=np.array([4., 1.]))
+    view.request_window()
+    assert view._pending
+
+    # The first window is applied before the pending request starts.
+    qtbot.waitUntil(entered.is_set)
+    assert view._loaded.visible == first
+    assert not view.visual.program._update_queue
+    assert view.visual.n_vertices > 0
+
+    release.set()
+    qtbot.waitUntil(lambda: view._worker is None and view._loaded.visible != first)
+    assert view._loaded.visible == view.get_time_window()
+    view.close()
+
+
+def test_tsgroup_window_indices(qapp):
+    spike_times, spike_clusters = _spikes()
+    view = _tsgroup_view(spike_times, spike_clusters)
+
+    i0, i1 = view._get_window_indices(2., 5.)
+    for k, cluster_id in enumerate(view.all_cluster_ids):
+        ae(view.spike_clusters[i0[k]:i1[k]], cluster_id)
+        sel = (spike_clusters == cluster_id) & (spike_times >= 2.) & (spike_times <= 5.)
+        ae(view.spike_times[i0[k]:i1[k]], np.sort(spike_times[sel]))
+    assert view._count_window(2., 5.) == np.sum((spike_times >= 2.) & (spike_times <= 5.))
+
+    # The rows follow the order of the clusters.
+    view.all_cluster_ids = view.all_cluster_ids[::-1]
+    view._update_segments()
+    i0, i1 = view._get_window_indices(2., 5.)
+    ae(view.spike_clusters[i0[0]:i1[0]], view.all_cluster_ids[0])
+
+    # Rows without spikes, and windows beyond the spikes.
+    view.all_cluster_ids = np.array([-1, 4, 7, 0, 2])
+    view._update_segments()
+    for t0, t1 in [(-5., -1.), (-1., 3.), (spike_times[10], spike_times[20]), (9., 20.)]:
+        i0, i1 = view._get_window_indices(t0, t1)
+        for k, cluster_id in enumerate(view.all_cluster_ids):
+            sel = (spike_clusters == cluster_id) & (spike_times >= t0) & (spike_times <= t1)
+            assert i1[k] - i0[k] == np.sum(sel)
+            ae(view.spike_clusters[i0[k]:i1[k]], cluster_id)
+
+    view.close()
+
+
+def test_tsgroup_clamp_window(qapp):
+    spike_times, spike_clusters = _spikes()
+    view = _tsgroup_view(spike_times, spike_clusters, max_vertices=100)
+
+    t0, t1 = view._clamp_window(0., 10., view._count_window)
+    assert view._count_window(t0, t1) <= 100
+    ac(.5 * (t0 + t1), 5.)
+    assert t1 - t0 > 0.5
+
+    b = view._fetch_window(0., 10., 'spikes')
+    assert (b.t0, b.t1) == (t0, t1)
+    assert len(b.x) <= 100
+    # The spikes are grouped by row.
+    assert np.all(np.diff(b.box_index) >= 0)
+    ae(view.spike_times[b.spike_ids], b.x)
+    ae(view.spike_clusters[b.spike_ids], view.all_cluster_ids[b.box_index])
+
+    # Under the budget, the window is not changed.
+    assert view._clamp_window(4., 4.1, view._count_window) == (4., 4.1)
+
+    view.close()
+
+
+def test_tsgroup_lazy_upload(qapp):
+    spike_times, spike_clusters = _spikes()
+    view = _tsgroup_view(spike_times, spike_clusters)
+    view.plot()
+    n = view.visual.n_vertices
+    assert n > 0
+
+    # The vertex count of a window uploaded in lazy mode only changes with the GPU data.
+    b = view._fetch_window(2., 3., 'spikes')
+    view.canvas.set_lazy(True)
+    view._upload_window(b)
+    assert view.visual.n_vertices == n
+    view.canvas.set_lazy(False)
+    view.canvas.flush_update_queue()
+    assert view.visual.n_vertices == len(b.x) < n
+    assert view.visual.program['a_box_index'].shape[0] == len(b.x)
+    view.close()
+
+
+def test_tsd_clamp_window(qapp):
+    view = _tsd_view(0, 10, n=10000, max_vertices=1000)
+    b = view._fetch_window(0., 10., 0)
+    assert len(b.x) <= 1000
+    ac(.5 * (b.t0 + b.t1), 5.)
+    view.close()
+
+
+def test_is_loaded(qapp):
+    spike_times, spike_clusters = _spikes()
+    view = _tsgroup_view(spike_times, spike_clusters)
+    assert not view._is_loaded(4., 6., 'spikes')
+
+    view._loaded = Bunch(t0=2., t1=8., key='spikes', visible=(4., 6.))
+    assert view._is_loaded(4., 6., 'spikes')
+    assert view._is_loaded(3., 7., 'spikes')
+    # Other decimation level or display mode.
+    assert not view._is_loaded(4., 6., ('density', 100, 0))
+    # Outside the loaded window.
+    assert not view._is_loaded(1., 3., 'spikes')
+    assert not view._is_loaded(7., 9., 'spikes')
+    # The loaded window is too long for the visible window, which is reloaded.
+    assert not view._is_loaded(5., 5. + 6. / (view.max_chunk_ratio + 1), 'spikes')
+
+    # A window clamped to the budget is loaded for the viewport it was fetched for.
+    view._loaded = Bunch(t0=4.5, t1=5.5, key='spikes', visible=(0., 10.))
+    assert view._is_loaded(0., 10., 'spikes')
+    assert not view._is_loaded(1., 9., 'spikes')
+
+    view.close()
+
+
+def test_time_sync(qapp, qtbot):
+    views = [_tsd_view(0, 10), _tsd_view(5, 25), _tsd_view(0, 100)]
+    ts = TimeSync(views[:2])
+
+    views[0].canvas.panzoom.set_range((-.5, -1, .5, 1))
+    assert ts.window == views[0].get_time_window()
+    ac(views[1].get_time_window(), (2.5, 7.5))
+    # The vertical range is kept.
+    ac(views[1].canvas.panzoom.get_range()[1::2], (-1, 1))
+
+    views[1].canvas.panzoom.set_range((-1, -1, 0, 1))
+    ac(views[0].get_time_window(), (5, 15))
+
+    # A new view shows the current time window.
+    ts.add_view(views[2])
+    ac(views[2].get_time_window(), (5, 15))
+
+    # A removed view is not synchronized anymore, in both directions.
+    n_callbacks = len(_EVENT._callbacks['pan'][id(views[2].canvas.panzoom)])
+    ts.remove_view(views[2])
+    assert len(_EVENT._callbacks['pan'][id(views[2].canvas.panzoom)]) == n_callbacks - 1
+    views[0].canvas.panzoom.set_range((-1, -1, 1, 1))
+    ac(views[1].get_time_window(), (0, 10))
+    ac(views[2].get_time_window(), (5, 15))
+    views[2].canvas.panzoom.set_range((-1, -1, 0, 1))
+    ac(views[0].get_time_window(), (0, 10))
+
+    for view in views:
+        view.close()
+    qtbot.wait(50)
+
+
+def test_time_sync_deferred(qapp, qtbot):
+    views = [_tsd_view(0, 10), _tsd_view(0, 10)]
+    ts = TimeSync(views)
+    synced = []
+    sync = ts.sync
+    ts.sync = lambda view: synced.append(view) or sync(view)
+
+    # The pan and zoom changes of a visible canvas are applied once, after the frame.
+    views[0].canvas.isExposed = lambda: True
+    views[0].canvas.panzoom.set_range((-.5, -1, .5, 1))
+    views[0].canvas.panzoom.set_range((0, -1, 1, 1))
+    assert not synced
+    ac(views[1].get_time_window(), (0, 10))
+
+    qtbot.waitUntil(lambda: len(synced) > 0)
+    qtbot.wait(10)
+    assert synced == [views[0]]
+    ac(views[1].get_time_window(), (5, 10))
+
+    for view in views:
+        qtbot.waitUntil(lambda: view._worker is None)
+        view.close()
+
+
+def test_tsgroup_density(qapp):
+    spike_times, spike_clusters = _spikes()
+    view = _tsgroup_view(spike_times, spike_clusters)
+    view.density_threshold = 100
+    view.plot()
+
+    # The whole recording is visible: more spikes than the threshold.
+    t0, t1 = view.get_time_window()
+    key = view._get_window_key(t0, t1)
+    assert key[0] == 'density'
+    assert view._loaded.key == key
+    n_bins = min(int(key[1] * (1 + 2 * view.margin)), view.max_density_bins)
+    assert view._loaded.image.shape == (view.n_clusters, n_bins, 4)
+    assert view.visual._hidden
+    assert not view.density_visual._hidden
+
+    # Zoom in until the spikes are shown.
+    view.canvas.panzoom.set_pan_zoom(pan=np.zeros(2), zoom=np.array([20., 1.]))
+    t0, t1 = view.get_time_window()
+    assert view._get_window_key(t0, t1) == 'spikes'
+    view.load_window()
+    assert view._loaded.key == 'spikes'
+    assert not view.visual._hidden
+    assert view.density_visual._hidden
+
+    view.close()
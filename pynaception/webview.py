@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Web widgets based on QtWebEngine.
+
+QtWebEngine is slow to load, so this module is only imported when a web widget is needed. Note
+that it must be imported before the Qt application is created.
+
+"""
+
+
+# -----------------------------------------------------------------------------
+# Imports
+# -----------------------------------------------------------------------------
+
+from functools import partial
+import logging
+from pathlib import Path
+
+from PyQt5.QtWebEngineWidgets import (QWebEngineView,  # noqa
+                                      QWebEnginePage,
+                                      # QWebSettings,
+                                      )
+from PyQt5.QtWebChannel import QWebChannel  # noqa
+
+from .qt import QUrl, QWidget
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------------------------------------------------------
+# Widgets
+# -----------------------------------------------------------------------------
+
+class WebPage(QWebEnginePage):
+    """A Qt web page widget."""
+    _raise_on_javascript_error = False
+
+    def javaScriptConsoleMessage(self, level, msg, line, source):
+        super(WebPage, self).javaScriptConsoleMessage(level, msg, line, source)
+        msg = "[JS:L%02d] %s" % (line, msg)
+        f = (partial(logger.log, 5), logger.warning, logger.error)[level]
+        if self._raise_on_javascript_error and level >= 2:
+            raise RuntimeError(msg)
+        f(msg)
+
+
+class WebView(QWebEngineView):
+    """A generic HTML widget."""
+
+    def __init__(self, *args):
+        super(WebView, self).__init__(*args)
+        self.html = None
+        assert isinstance(self.window(), QWidget)
+        self._page = WebPage(self)
+        self.setPage(self._page)
+        self.move(100, 100)
+        self.resize(400, 400)
+
+    def set_html(self, html, callback=None):
+        """Set the HTML code."""
+        self._callback = callback
+        self.loadFinished.connect(self._loadFinished)
+        static_dir = str(Path(__file__).parent / 'static') + '/'
+        base_url = QUrl().fromLocalFile(static_dir)
+        self.page().setHtml(html, base_url)
+
+    def _callable(self, data):
+        self.html = data
+        if self._callback:
+            self._callback(self.html)
+
+    def _loadFinished(self, result):
+        self.page().toHtml(self._callable)
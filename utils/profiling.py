@@ -7,10 +7,12 @@
 #------------------------------------------------------------------------------
 
 import builtins
+from collections import deque
 from contextlib import contextmanager
 from cProfile import Profile
 import functools
 from io import StringIO
+import json
 import logging
 import os
 from pathlib import Path
@@ -27,12 +29,20 @@ logger = logging.getLogger(__name__)
 #------------------------------------------------------------------------------
 
 @contextmanager
-def benchmark(name='', repeats=1):
-    """Contexts manager to benchmark an action."""
+def benchmark(name='', repeats=1, callback=None):
+    """Contexts manager to benchmark an action.
+
+    If `callback` is set, it is called with the name and the duration in milliseconds instead
+    of logging the duration.
+
+    """
     start = default_timer()
     yield
-    duration = (default_timer() - start) * 1000.
-    logger.info("%s took %.6fms.", name, duration / repeats)
+    duration = (default_timer() - start) * 1000. / repeats
+    if callback is not None:
+        callback(name, duration)
+    else:
+        logger.info("%s took %.6fms.", name, duration)
 
 
 class ContextualProfile(Profile):  # pragma: no cover
@@ -83,6 +93,162 @@ class ContextualProfile(Profile):  # pragma: no cover
         self.disable_by_count()
 
 
+def _percentile(values, q):
+    """Return the q-th percentile of a list of values (nearest-rank method)."""
+    if not values:
+        return 0.
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100. * (len(values) - 1))))]
+
+
+def _summary(values):
+    return {
+        'mean': sum(values) / len(values) if values else 0.,
+        'max': max(values) if values else 0.,
+        'p95': _percentile(values, 95),
+    }
+
+
+class FrameProfiler(object):
+    """Record rolling statistics about the frames drawn by an OpenGL canvas.
+
+    Each frame records the duration of named sections (in milliseconds), the number of bytes
+    set and uploaded to the GPU, and the number of vertices drawn by each visual. Only the
+    last `n_frames` frames are kept.
+
+    Constructor
+    -----------
+
+    n_frames : int
+        Number of frames in the rolling window.
+    cprofile : boolean
+        Whether to also run a `ContextualProfile` during the frames, in order to find out which
+        Python functions take the CPU time. The profile is in the `profile` attribute.
+
+    """
+
+    def __init__(self, n_frames=120, cprofile=False):
+        self.frames = deque(maxlen=n_frames)
+        self.profile = ContextualProfile() if cprofile else None
+        self._frame = self._new_frame()
+        self._start = None
+
+    def _new_frame(self):
+        # The data set between two frames is accounted in the next frame.
+        return {'time': 0., 'duration': 0., 'sections': {}, 'set': {}, 'uploads': {},
+                'vertices': {}}
+
+    def _add_section(self, name, duration):
+        sections = self._frame['sections']
+        sections[name] = sections.get(name, 0.) + duration
+
+    @contextmanager
+    def section(self, name):
+        """Context manager measuring the duration of a part of the current frame."""
+        with benchmark(name, callback=self._add_section):
+            yield
+
+    def _add_bytes(self, kind, name, nbytes, duration):
+        nbytes_duration = self._frame[kind].setdefault(name, [0, 0.])
+        nbytes_duration[0] += int(nbytes)
+        nbytes_duration[1] += duration * 1000.
+
+    def record_set(self, name, nbytes, duration=0.):
+        """Record data (of `nbytes` bytes) set to a program variable in the CPU memory.
+
+        The duration is in seconds.
+
+        """
+        self._add_bytes('set', name, nbytes, duration)
+
+    def record_upload(self, name, nbytes, duration=0.):
+        """Record an actual upload of `nbytes` bytes to the GPU.
+
+        The duration is in seconds.
+
+        """
+        self._add_bytes('uploads', name, nbytes, duration)
+
+    def record_visual(self, name, n_vertices):
+        """Record the number of vertices drawn by a visual."""
+        self._frame['vertices'][name] = int(n_vertices)
+
+    def start_frame(self):
+        """Start a new frame."""
+        self._start = default_timer()
+        if self.profile is not None:
+            self.profile.enable_by_count()
+
+    def end_frame(self):
+        """End the current frame and add it to the rolling window."""
+        if self._start is None:
+            return
+        if self.profile is not None:
+            self.profile.disable_by_count()
+        end = default_timer()
+        self._frame['time'] = end
+        self._frame['duration'] = (end - self._start) * 1000.
+        self.frames.append(self._frame)
+        self._frame = self._new_frame()
+        self._start = None
+
+    def clear(self):
+        """Remove all recorded frames."""
+        self.frames.clear()
+        self._frame = self._new_frame()
+        self._start = None
+
+    def stats(self):
+        """Return the statistics of the frames in the rolling window, as a dictionary.
+
+        Durations are in milliseconds, and bytes and vertices are averaged per frame.
+
+        """
+        frames = list(self.frames)
+        n = len(frames)
+        times = [f['time'] for f in frames]
+        elapsed = times[-1] - times[0] if n >= 2 else 0.
+
+        def _per_frame(kind):
+            out = {}
+            for f in frames:
+                for name, (nbytes, duration) in f[kind].items():
+                    acc = out.setdefault(name, {'bytes': 0., 'duration': 0.})
+                    acc['bytes'] += nbytes / n
+                    acc['duration'] += duration / n
+            return out
+
+        sections = {}
+        for f in frames:
+            for name in f['sections']:
+                sections[name] = None
+        vertices = {}
+        for f in frames:
+            vertices.update(f['vertices'])
+        return {
+            'n_frames': n,
+            'fps': (n - 1) / elapsed if elapsed > 0 else 0.,
+            'frame': _summary([f['duration'] for f in frames]),
+            'sections': {
+                name: _summary([f['sections'].get(name, 0.) for f in frames])
+                for name in sections},
+            'set': _per_frame('set'),
+            'uploads': _per_frame('uploads'),
+            'vertices': vertices,
+        }
+
+    def to_json(self, path=None):
+        """Export the statistics and the recorded frames to JSON.
+
+        Return the JSON string, and also save it to a file if a path is given.
+
+        """
+        out = json.dumps({'stats': self.stats(), 'frames': list(self.frames)}, indent=2)
+        if path is not None:
+            Path(path).write_text(out)
+        return out
+
+
 def _enable_profiler(line_by_line=False):  # pragma: no cover
     """Enable the profiler."""
     if 'profile' in builtins.__dict__:
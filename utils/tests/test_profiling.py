@@ -6,11 +6,12 @@
 # Imports
 #------------------------------------------------------------------------------
 
+import json
 import time
 
 from pytest import mark
 
-from ..profiling import benchmark, _enable_profiler, _profile
+from ..profiling import benchmark, FrameProfiler, _enable_profiler, _profile
 
 
 #------------------------------------------------------------------------------
@@ -21,6 +22,46 @@ def test_benchmark():
     with benchmark():
         time.sleep(.002)
 
+    durations = []
+    with benchmark('sleep', callback=lambda name, duration: durations.append((name, duration))):
+        time.sleep(.002)
+    assert durations[0][0] == 'sleep'
+    assert durations[0][1] >= 1.
+
+
+def test_frame_profiler(tmp_path):
+    prof = FrameProfiler(n_frames=3)
+    stats = prof.stats()
+    assert stats['n_frames'] == 0
+    assert stats['fps'] == 0
+
+    for i in range(5):
+        # Data set between two frames is accounted in the next frame.
+        prof.record_set('visual.a_position', 800, .001)
+        prof.start_frame()
+        with prof.section('draw'):
+            time.sleep(.001)
+        prof.record_upload('visual', 400)
+        prof.record_upload('visual', 400)
+        prof.record_visual('visual', 100)
+        prof.end_frame()
+
+    stats = prof.stats()
+    assert stats['n_frames'] == 3
+    assert stats['fps'] > 0
+    assert stats['frame']['mean'] >= stats['sections']['draw']['mean'] >= 1.
+    assert stats['set']['visual.a_position'] == {'bytes': 800, 'duration': 1.}
+    assert stats['uploads']['visual']['bytes'] == 800
+    assert stats['vertices'] == {'visual': 100}
+
+    path = tmp_path / 'frames.json'
+    data = json.loads(prof.to_json(path))
+    assert json.loads(path.read_text()) == data
+    assert len(data['frames']) == 3
+
+    prof.clear()
+    assert prof.stats()['n_frames'] == 0
+
 
 @mark.parametrize('line_by_line', [False, True])
 def test_profile(tempdir, line_by_line):